@@ -1,35 +1,113 @@
 import os
+import io
+import atexit
+import json
+import tarfile
+import zipfile
 import numpy as np
 import time
-import tensorflow as tf
+import threading
+import logging
+import functools
+import mimetypes
+from datetime import datetime, timezone
+from PIL import Image
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from flask import Flask, request, jsonify, render_template, redirect, url_for, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import Flask, Response, g, request, jsonify, render_template, redirect, url_for, send_from_directory, stream_with_context
 from flask_cors import CORS  # Add CORS support
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras import layers, models
-import h5py
-from flask_pymongo import PyMongo
-from twilio.rest import Client  # Twilio SMS Integration
 from dotenv import load_dotenv
+from batching import BATCH_SIZE_BUCKETS
+from calibration import apply_temperature, top_k
+from labels import LOW_CONFIDENCE_RESULT, metadata_path_for
+from model_registry import DirectorySource, FileSource, ModelRegistry
+from mongo_writer import BufferedWriter, cursor_filter, encode_cursor
+from observability import Registry, configure_logging, gauge_lines
+from precompressed import PrecompressedAsset
+from prediction_cache import create_prediction_cache
+from preprocessing import IMAGE_SIZE, LEGACY_RESIZE_FILTER, open_image, resize_into
+from static_assets import AssetManifest
+from sms_queue import SmsQueue, TwilioSender, normalize_phone
+from tta import MAX_VIEWS as MAX_TTA_VIEWS, average_views, make_views
+from upload_store import UploadStore
+from upload_validation import RejectionCounter, UploadRejected, probe_image
+
+PROCESS_START = time.perf_counter()
 
 # Load environment variables
 load_dotenv()
 
+# Leveled logging: LOG_LEVEL=WARNING keeps per-request logs off the hot path in production
+configure_logging(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+logger = logging.getLogger("dermasense")
+
+# Heavy imports (TensorFlow, PyMongo, Twilio) and model loading happen in warm_up();
+# "background" binds the web app immediately, "eager" finishes warm-up at import time,
+# "manual" skips it (tools like score_images.py import app only for labels and preprocessing)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+WARMUP_WAIT_SECONDS = float(os.getenv("WARMUP_WAIT_SECONDS", "60"))
+model_ready = threading.Event()
+startup_phases = {}
+startup_error = None
+
+def record_phase(name, started):
+    """Log and remember how long a startup phase took"""
+    elapsed = time.perf_counter() - started
+    startup_phases[name] = round(elapsed, 3)
+    logger.info(f"⏱️ Startup phase '{name}' took {elapsed:.3f}s")
+
 app = Flask(__name__, static_folder="static")
 CORS(app)  # Enable CORS for all routes
 
 # MongoDB Configuration - Use environment variable for production
 app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://localhost:27017/contactDB")
 
-# Initialize MongoDB only if URI is available
-try:
-    mongo = PyMongo(app)
-    print("✅ MongoDB connected successfully")
-except Exception as e:
-    print(f"⚠️ MongoDB connection failed: {e}")
-    mongo = None
+# Pool size and timeouts keep a slow or unreachable database from hanging request threads
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "10"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "2000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000"))
+# Contact submissions are buffered and written with insert_many in the background
+CONTACT_BATCH_SIZE = int(os.getenv("CONTACT_BATCH_SIZE", "100"))
+CONTACT_FLUSH_INTERVAL = float(os.getenv("CONTACT_FLUSH_INTERVAL", "1.0"))
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "50"))
+MESSAGES_MAX_PAGE_SIZE = 500
+
+mongo = None
+contact_writer = None
+
+def init_mongo():
+    """Initialize MongoDB only if URI is available"""
+    global mongo, contact_writer
+    try:
+        from flask_pymongo import PyMongo
+        mongo = PyMongo(
+            app,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_TIMEOUT_MS,
+            waitQueueTimeoutMS=MONGO_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        )
+        contact_writer = BufferedWriter(mongo.db.contacts, batch_size=CONTACT_BATCH_SIZE,
+                                        flush_interval=CONTACT_FLUSH_INTERVAL)
+        # Workers are recycled (max_requests) and redeployed; write buffered messages before exiting
+        atexit.register(contact_writer.close)
+        logger.info("✅ MongoDB connected successfully")
+    except Exception as e:
+        logger.warning(f"⚠️ MongoDB connection failed: {e}")
+        mongo = None
+        return
+
+    # Off the warm-up path: with the database down this waits for the server selection timeout
+    threading.Thread(target=ensure_mongo_indexes, daemon=True).start()
+
+def ensure_mongo_indexes():
+    """Index backing the newest-first cursor pagination of /messages"""
+    try:
+        mongo.db.contacts.create_index([("created_at", -1), ("_id", -1)])
+    except Exception as e:
+        logger.warning(f"⚠️ Could not create MongoDB index (database unreachable?): {e}")
 
 # Twilio Configuration - Use environment variables for production
 TWILIO_SID = os.getenv("TWILIO_SID", "YOUR_TWILIO_SID_HERE")
@@ -37,364 +115,693 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "YOUR_TWILIO_AUTH_TOKEN_HERE"
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER", "YOUR_TWILIO_PHONE_NUMBER_HERE")
 YOUR_PHONE_NUMBER = os.getenv("YOUR_PHONE_NUMBER", "YOUR_VERIFIED_PHONE_NUMBER_HERE")
 
-# Initialize Twilio client with error handling
-try:
-    client = Client(TWILIO_SID, TWILIO_AUTH_TOKEN)
-    print("✅ Twilio client initialized successfully")
-except Exception as e:
-    print(f"⚠️ Twilio initialization failed: {e}")
-    client = None
+# Outbound SMS go through a background queue so a slow Twilio round trip never holds a request thread
+TWILIO_API_BASE = os.getenv("TWILIO_API_BASE", "https://api.twilio.com")
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "2"))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "4"))
+SMS_RATE_PER_SEC = float(os.getenv("SMS_RATE_PER_SEC", "1"))
+SMS_TIMEOUT_SECONDS = float(os.getenv("SMS_TIMEOUT_SECONDS", "10"))
+# Job status files shared by all workers, so GET /send_sms/<job_id> works whichever worker it reaches
+SMS_STATUS_DIR = os.getenv("SMS_STATUS_DIR", ".cache/sms_jobs")
 
-def send_sms(message_body, to_phone=None):
-    """Sends an SMS using Twilio API"""
+sms_queue = None
+
+def init_twilio():
+    """Start the SMS sender pool with error handling"""
+    global sms_queue
     try:
-        if not client:
-            print("⚠️ Twilio client not initialized")
-            return "TWILIO_NOT_AVAILABLE"
-            
-        if not to_phone:
-            to_phone = YOUR_PHONE_NUMBER
-        
-        # Clean and format phone number
-        to_phone = to_phone.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-        
-        # Add country code if not present
-        if not to_phone.startswith("+"):
-            if to_phone.startswith("91") and len(to_phone) == 12:
-                to_phone = "+" + to_phone
-            elif len(to_phone) == 10:
-                to_phone = "+91" + to_phone
-            else:
-                to_phone = "+91" + to_phone
-        
-        print(f"📤 Sending SMS to {to_phone}")
-        print(f"📝 Message content: {message_body[:100]}...")
-        
-        # Check if using demo credentials
-        if TWILIO_SID.startswith("YOUR_ACTUAL"):
-            print("🧪 DEMO MODE: SMS would be sent with real Twilio credentials")
-            return "DEMO_SMS_SUCCESS"
-        
-        print(f"📱 Attempting to send SMS from {TWILIO_PHONE_NUMBER} to {to_phone}")
-        
-        message = client.messages.create(
-            body=message_body,
-            from_=TWILIO_PHONE_NUMBER,
-            to=to_phone
-        )
-        return message.sid
+        sender = TwilioSender(TWILIO_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER,
+                              api_base=TWILIO_API_BASE, timeout=SMS_TIMEOUT_SECONDS, pool_size=SMS_WORKERS)
+        sms_queue = SmsQueue(sender, workers=SMS_WORKERS, max_attempts=SMS_MAX_ATTEMPTS,
+                             rate_per_sec=SMS_RATE_PER_SEC, status_dir=SMS_STATUS_DIR or None)
+        logger.info("✅ Twilio SMS queue started")
     except Exception as e:
-        error_msg = str(e)
-        print(f"SMS sending failed: {error_msg}")
-        
-        # Check for specific Twilio errors
-        if "unverified" in error_msg.lower():
-            print("🔍 Issue: Phone number not verified. Please verify the number in Twilio Console.")
-            return "UNVERIFIED_NUMBER"
-        elif "authenticate" in error_msg.lower():
-            print("🔍 Issue: Invalid Twilio credentials.")
-            return "INVALID_CREDENTIALS"
-        else:
-            return "SMS_FAILED"
+        logger.warning(f"⚠️ Twilio initialization failed: {e}")
+        sms_queue = None
+
+def send_sms(message_body, to_phone=None):
+    """Queues an SMS for the Twilio sender pool; returns the job id"""
+    if not sms_queue:
+        logger.warning("⚠️ Twilio SMS queue not initialized")
+        return "TWILIO_NOT_AVAILABLE"
+
+    to_phone = normalize_phone(to_phone or YOUR_PHONE_NUMBER)
+    logger.debug("📤 Queueing SMS to %s: %.100s...", to_phone, message_body)
+    return sms_queue.enqueue(message_body, to_phone)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+# Upload limits: oversized or non-image uploads are refused before any decode
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 2**20)     # per image
+MAX_REQUEST_BYTES = int(float(os.getenv("MAX_REQUEST_MB", "64")) * 2**20)   # whole request / archive
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "40000000"))
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS  # Pillow's decompression-bomb guard
+upload_rejections = RejectionCounter()
+
+# Batch prediction limits
+PREDICT_BATCH_MAX_FILES = int(os.getenv("PREDICT_BATCH_MAX_FILES", "64"))
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", "8"))
+PREDICT_BATCH_STREAM_THRESHOLD = int(os.getenv("PREDICT_BATCH_STREAM_THRESHOLD", "16"))
 
 # Create upload directory
 UPLOAD_FOLDER = 'static/uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
-# Load trained model with custom options to handle version mismatch
-def load_model_safely(model_path):
-    """Load model with fallback for version incompatibility"""
+# Uploads are persisted off the request thread, and only when storage is enabled
+SAVE_UPLOADS = os.getenv("SAVE_UPLOADS", "true").lower() in ("1", "true", "yes")
+upload_store = UploadStore(
+    UPLOAD_FOLDER,
+    max_bytes=int(float(os.getenv("UPLOAD_STORE_MAX_MB", "800")) * 2**20),
+    thumbnail_size=int(os.getenv("UPLOAD_STORE_THUMBNAIL_SIZE", "0")),
+) if SAVE_UPLOADS else None
+
+# Fingerprinted copies of the static/ files the pages use (build_static.py), served under /assets/ and cached for good;
+# pages are rendered once with their static/... URLs pointing there (CACHE_PAGES=false while editing them)
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "build/static")
+static_manifest = AssetManifest.load(STATIC_BUILD_DIR)
+CACHE_PAGES = os.getenv("CACHE_PAGES", "true").lower() in ("1", "true", "yes")
+# Let the front proxy send file bodies: "x-accel" (nginx X-Accel-Redirect to STATIC_ACCEL_PREFIX,
+# an internal location aliased to the app directory) or "x-sendfile" (Apache/lighttpd); empty = Flask sends them
+STATIC_OFFLOAD = os.getenv("STATIC_OFFLOAD", "").lower()
+STATIC_ACCEL_PREFIX = os.getenv("STATIC_ACCEL_PREFIX", "/_internal").rstrip("/")
+app.config["USE_X_SENDFILE"] = STATIC_OFFLOAD == "x-sendfile"
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MODEL_PATH = os.getenv("MODEL_PATH", "model_checkpoint.h5")
+
+# Inference backend: keras (default), tflite or onnx - see export_model.py
+# SERVING_MODE=remote sends tensors to inference_server.py instead of loading a model per worker
+SERVING_MODE = os.getenv("SERVING_MODE", "local").lower()
+
+# Class names and disease details come from the artifact written next to the model by model.py;
+# every model version is checked against its label artifact before it serves traffic
+LABELS_PATH = os.getenv("LABELS_PATH") or metadata_path_for(MODEL_PATH)
+# Responses list the top-k classes; below ABSTAIN_THRESHOLD (% confidence) the answer is "Inconclusive"
+PREDICT_TOP_K = int(os.getenv("PREDICT_TOP_K", "3"))
+ABSTAIN_THRESHOLD = float(os.getenv("ABSTAIN_THRESHOLD", "0"))
+# Description/cause/treatment text in each result; without it (?details=0) clients look the class up in
+# GET /disease_info.json, which is served once per label artifact and cached by the browser
+PREDICT_DETAILS = os.getenv("PREDICT_DETAILS", "true").lower() in ("1", "true", "yes")
+# Test-time augmentation: views per /predict image (1 = off, ?tta= overrides), scored in one forward pass
+TTA_VIEWS = int(os.getenv("TTA_VIEWS", "1"))
+# The web UI shrinks photos in the browser before upload (GET /predict/config): longest side at most
+# CLIENT_UPLOAD_MAX_DIMENSION, and the server does the final resize with the model's filter. At or below
+# the model input size (224), the browser sends exactly 224x224 and the server's resize is skipped.
+CLIENT_UPLOAD_MAX_DIMENSION = int(os.getenv("CLIENT_UPLOAD_MAX_DIMENSION", "672"))
+CLIENT_UPLOAD_QUALITY = float(os.getenv("CLIENT_UPLOAD_QUALITY", "0.9"))
+
+# Micro-batching: concurrent /predict calls share one forward pass
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))
+
+# Model registry: versioned artifacts under MODEL_REGISTRY_DIR (or the single MODEL_PATH), polled every
+# MODEL_RELOAD_INTERVAL seconds; new versions must pass the golden-image check before they are swapped in
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "")
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+GOLDEN_SET_PATH = os.getenv("GOLDEN_SET_PATH", "golden_images.json")
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+
+registry = None
+
+def active_model():
+    """The model version currently serving traffic (None until warm-up loads one)"""
+    return registry.active if registry else None
+
+def load_inference_stack():
+    """Build the model registry and load (and validate) the active model version"""
+    global registry
+
+    window_ms = BATCH_WINDOW_MS
+    reload_interval = MODEL_RELOAD_INTERVAL
+    if SERVING_MODE == "remote":
+        from inference_server import RemoteBackend
+        load_backend = lambda artifact: RemoteBackend(connect_timeout=WARMUP_WAIT_SECONDS)
+        window_ms = 0  # no waiting here: the server batches across workers; queued requests still share an RPC
+        reload_interval = 0  # the inference server owns the model; restart it to deploy
+    else:
+        from inference_backends import create_backend_from_env
+        load_backend = lambda artifact: create_backend_from_env(
+            artifact.model_path, tflite_path=artifact.tflite_path, onnx_path=artifact.onnx_path,
+            labels_path=artifact.labels_path)
+
+    if MODEL_REGISTRY_DIR and SERVING_MODE != "remote":
+        source = DirectorySource(MODEL_REGISTRY_DIR, golden_path=GOLDEN_SET_PATH)
+    else:
+        source = FileSource(MODEL_PATH, LABELS_PATH, version=os.getenv("MODEL_VERSION"), golden_path=GOLDEN_SET_PATH)
+
+    # Softmax outputs are cached by image content (per version) so re-submitted photos skip inference
+    registry = ModelRegistry(source, load_backend, preprocess_image_bytes, create_prediction_cache,
+                             max_batch_size=BATCH_MAX_SIZE, window_ms=window_ms)
+    registry.reload()
+    registry.watch(reload_interval)
+
+def warm_up():
+    """Import heavy dependencies, load the model and run one dummy inference"""
+    global startup_error
     try:
-        # Try loading the full model with compile=False
-        loaded_model = load_model(model_path, compile=False)
-        loaded_model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        print("✅ Model loaded successfully with compile=False!")
-        return loaded_model
+        started = time.perf_counter()
+        init_mongo()
+        record_phase("mongo", started)
+
+        started = time.perf_counter()
+        init_twilio()
+        record_phase("twilio", started)
+
+        started = time.perf_counter()
+        load_inference_stack()
+        record_phase("model_load", started)
+
+        # Validation already ran the first forward pass, paying graph tracing / allocation before traffic
+        if active_model() is None:
+            startup_error = registry.last_error if registry else "No model could be loaded"
     except Exception as e:
-        print(f"⚠️ Error loading model directly: {e}")
-        
-        # Fallback: Rebuild the model architecture and load weights
-        print("🔄 Rebuilding model architecture and loading weights...")
-        try:
-            # Create a more robust model architecture
-            base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
-            base_model.trainable = False
-            
-            # Build model using Functional API for better compatibility
-            inputs = tf.keras.Input(shape=(224, 224, 3))
-            x = base_model(inputs, training=False)
-            x = layers.GlobalAveragePooling2D()(x)
-            x = layers.Dropout(0.3)(x)
-            x = layers.Dense(1024, activation='relu', name='dense_1')(x)
-            outputs = layers.Dense(24, activation='softmax', name='predictions')(x)
-            
-            rebuilt_model = tf.keras.Model(inputs, outputs)
-            rebuilt_model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-            
-            print("✅ Model architecture rebuilt successfully!")
-            return rebuilt_model
-            
-        except Exception as rebuild_error:
-            print(f"⚠️ Model rebuild failed: {rebuild_error}")
-            print("🎯 Creating minimal working model for deployment...")
-            
-            # Create a minimal model that will work
-            minimal_model = tf.keras.Sequential([
-                tf.keras.layers.Input(shape=(224, 224, 3)),
-                tf.keras.layers.GlobalAveragePooling2D(),
-                tf.keras.layers.Dense(128, activation='relu'),
-                tf.keras.layers.Dense(24, activation='softmax')
-            ])
-            
-            minimal_model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-            print("⚠️ Using minimal model - predictions will be random but app will work!")
-            return minimal_model
-
-model = load_model_safely("model_checkpoint.h5")
-
-# Disease Labels
-class_labels = {
-    0: 'Acne', 1: 'Actinic Keratosis', 2: 'Benign Tumors', 3: 'Bullous',
-    4: 'Candidiasis', 5: 'Drug Eruption', 6: 'Eczema', 7: 'Hives (Urticaria)',
-    8: 'Infestations Bites', 9: 'Lichen', 10: 'Lupus', 11: 'Melanoma',
-    12: 'Moles', 13: 'Psoriasis', 14: 'Rosacea', 15: 'Seborrh Keratoses',
-    16: 'Skin Cancer', 17: 'Sunlight Damage', 18: 'Tinea',
-    19: 'Unknown or No Disease', 20: 'Vascular Tumors', 21: 'Vasculitis',
-    22: 'Vitiligo', 23: 'Warts'
-}
+        startup_error = str(e)
+        logger.error(f"❌ Warm-up failed: {e}")
+    finally:
+        startup_phases["total_since_process_start"] = round(time.perf_counter() - PROCESS_START, 3)
+        model_ready.set()
+        logger.info(f"🚦 Warm-up finished, model ready: {active_model() is not None}")
 
-# Disease Information Dictionary
-disease_info = {
-    "Acne": {
-        "description": "A common skin condition that occurs when hair follicles become clogged with oil and dead skin cells, leading to pimples, blackheads, and whiteheads.",
-        "cause": "Hormonal changes, excessive oil production, bacteria, and inflammation.",
-        "treatment": "Use topical treatments (benzoyl peroxide, salicylic acid), oral medications, and maintain proper skincare."
-    },
-    "Actinic Keratosis": {
-        "description": "A rough, scaly patch on the skin caused by years of sun exposure, which may develop into skin cancer if untreated.",
-        "cause": "Long-term exposure to ultraviolet (UV) light from the sun or tanning beds.",
-        "treatment": "Cryotherapy, laser therapy, chemical peels, and topical medications."
-    },
-    "Benign Tumors": {
-        "description": "Non-cancerous growths on or under the skin, usually harmless but sometimes requiring removal.",
-        "cause": "Genetic factors, infections, or environmental exposure.",
-        "treatment": "Monitoring, surgical removal, or laser therapy if necessary."
-    },
-    "Bullous": {
-        "description": "A skin condition that causes large, fluid-filled blisters, often due to immune system disorders.",
-        "cause": "Autoimmune diseases, infections, or allergic reactions.",
-        "treatment": "Corticosteroids, immunosuppressants, and proper wound care."
-    },
-    "Candidiasis": {
-        "description": "A fungal infection caused by Candida yeast, often affecting warm, moist areas of the body.",
-        "cause": "Weakened immune system, diabetes, prolonged antibiotic use, and poor hygiene.",
-        "treatment": "Antifungal creams, oral antifungal medications, and maintaining proper hygiene."
-    },
-    "Drug Eruption": {
-        "description": "An adverse skin reaction caused by medications, leading to rashes, redness, or blisters.",
-        "cause": "Allergic reaction or sensitivity to certain drugs.",
-        "treatment": "Stopping the medication, antihistamines, corticosteroids, and hydration."
-    },
-    "Eczema": {
-        "description": "A condition that makes the skin red, inflamed, and itchy.",
-        "cause": "Genetics, allergens, irritants, and environmental triggers.",
-        "treatment": "Moisturizers, corticosteroids, and avoiding known triggers."
-    },
-    "Hives (Urticaria)": {
-        "description": "A skin reaction that causes itchy welts due to an allergic reaction or unknown triggers.",
-        "cause": "Allergens, stress, infections, or medications.",
-        "treatment": "Antihistamines, corticosteroids, and avoiding allergens."
-    },
-    "Infestations Bites": {
-        "description": "Skin irritation and rashes caused by insect bites or parasitic infections such as scabies or lice.",
-        "cause": "Bites from mosquitoes, fleas, ticks, mites, or lice infestations.",
-        "treatment": "Topical creams, antihistamines, and proper hygiene to prevent further infestations."
-    },
-    "Lichen": {
-        "description": "A skin condition characterized by thick, scaly patches that may be itchy or painful.",
-        "cause": "Autoimmune reactions, chronic inflammation, or unknown triggers.",
-        "treatment": "Corticosteroid creams, antihistamines, and phototherapy."
-    },
-    "Lupus": {
-        "description": "An autoimmune disease that affects the skin, causing rashes and sensitivity to sunlight.",
-        "cause": "Genetic predisposition, environmental factors, and immune system dysfunction.",
-        "treatment": "Anti-inflammatory drugs, immunosuppressants, and avoiding sunlight exposure."
-    },
-    "Melanoma": {
-        "description": "A serious and aggressive form of skin cancer that develops from melanocytes.",
-        "cause": "Excessive UV exposure, genetic mutations, and fair skin type.",
-        "treatment": "Surgical removal, chemotherapy, immunotherapy, and radiation therapy."
-    },
-    "Moles": {
-        "description": "Clusters of pigmented skin cells that appear as small, dark brown spots.",
-        "cause": "Genetic factors, sun exposure, and hormonal changes.",
-        "treatment": "Usually harmless, but removal is recommended if a mole changes in size, shape, or color."
-    },
-    "Psoriasis": {
-        "description": "A chronic autoimmune skin disease that speeds up the life cycle of skin cells, causing scaly patches.",
-        "cause": "Immune system dysfunction, genetic factors, and environmental triggers.",
-        "treatment": "Topical treatments, phototherapy, and systemic medications."
-    },
-    "Rosacea": {
-        "description": "A chronic skin condition causing redness, visible blood vessels, and bumps on the face.",
-        "cause": "Unknown, but triggers include sun exposure, stress, spicy foods, and alcohol.",
-        "treatment": "Topical treatments, antibiotics, laser therapy, and avoiding triggers."
-    },
-    "Seborrh Keratoses": {
-        "description": "Non-cancerous, wart-like growths that appear on the skin, often with age.",
-        "cause": "Genetics and aging.",
-        "treatment": "Cryotherapy, laser removal, or electrosurgery if necessary."
-    },
-    "Skin Cancer": {
-        "description": "Uncontrolled growth of abnormal skin cells, often due to sun exposure.",
-        "cause": "UV radiation, genetics, and weakened immune system.",
-        "treatment": "Surgery, chemotherapy, radiation therapy, and immunotherapy."
-    },
-    "Sunlight Damage": {
-        "description": "Skin damage caused by prolonged exposure to UV rays, leading to premature aging and increased cancer risk.",
-        "cause": "Excessive sun exposure, tanning beds, and lack of sunscreen use.",
-        "treatment": "Sunscreen, antioxidants, retinoids, and skin-repairing treatments."
-    },
-    "Tinea": {
-        "description": "A fungal infection affecting the skin, scalp, or nails, also known as ringworm.",
-        "cause": "Fungal overgrowth due to moisture, poor hygiene, or direct contact.",
-        "treatment": "Antifungal creams, oral antifungal medications, and maintaining dry skin."
-    },
-    "Unknown or No Disease": {
-        "description": "No recognizable skin disease detected.",
-        "cause": "N/A",
-        "treatment": "Consult a dermatologist if symptoms persist."
-    },
-    "Vascular Tumors": {
-        "description": "Abnormal growth of blood vessels in the skin, which may be benign or malignant.",
-        "cause": "Genetic mutations, environmental triggers, or unknown causes.",
-        "treatment": "Monitoring, laser therapy, or surgical removal if necessary."
-    },
-    "Vasculitis": {
-        "description": "Inflammation of blood vessels, leading to skin rashes, ulcers, or organ damage.",
-        "cause": "Autoimmune conditions, infections, or allergic reactions.",
-        "treatment": "Corticosteroids, immunosuppressants, and managing underlying conditions."
-    },
-    "Vitiligo": {
-        "description": "A condition where the skin loses its pigment cells, causing white patches.",
-        "cause": "Autoimmune disorder, genetic factors, and unknown triggers.",
-        "treatment": "Topical corticosteroids, light therapy, and skin grafting."
-    },
-    "Warts": {
-        "description": "Small, rough skin growths caused by the human papillomavirus (HPV).",
-        "cause": "Direct contact with HPV, weakened immune system.",
-        "treatment": "Cryotherapy, salicylic acid, and laser removal."
-    }
-}
+def wait_for_model():
+    """Block a request until warm-up finishes (bounded by WARMUP_WAIT_SECONDS)"""
+    return model_ready.wait(timeout=WARMUP_WAIT_SECONDS) and active_model() is not None
+
+# Prometheus metrics, exposed on /metrics
+metrics = Registry()
+REQUESTS = metrics.counter("http_requests_total", "HTTP requests by endpoint, method and status",
+                           ("endpoint", "method", "status"))
+REQUEST_LATENCY = metrics.histogram("http_request_duration_seconds", "End-to-end request latency", ("endpoint",))
+STAGE_LATENCY = metrics.histogram("predict_stage_duration_seconds",
+                                  "Time spent in each prediction stage", ("stage",))
+PREDICTIONS = metrics.counter("predictions_total", "Predictions served by class and source",
+                              ("disease", "source"))
+PREPROCESS_PATHS = metrics.counter("predict_preprocess_total",
+                                   "Decoded images by path: presized (already model input size, no resize) or resized",
+                                   ("path",))
+SHADOW_PREDICTIONS = metrics.counter("model_shadow_predictions_total",
+                                     "Candidate predictions in shadow mode by top-1 agreement with the active model",
+                                     ("candidate", "result"))
+
+@metrics.collector
+def inference_metrics():
+    """Scrape-time view of the model, batcher, caches, background writers/queues and rejections"""
+    model = active_model()
+    lines = gauge_lines("model_backend_info", "Active inference backend",
+                        [({"backend": model.name if model else "none", "serving_mode": SERVING_MODE}, 1)])
+    lines += gauge_lines("model_ready", "1 once warm-up finished with a model loaded",
+                         [({}, int(model_ready.is_set() and model is not None))])
+
+    if registry:
+        versions = [({"version": model.version, "role": "active"}, 1)] if model else []
+        candidate = registry.candidate
+        if candidate:
+            versions.append(({"version": candidate.version, "role": registry.candidate_mode}, 1))
+        lines += gauge_lines("model_version_info", "Loaded model versions and their role", versions)
+        lines += gauge_lines("model_swaps_total", "Hot swaps of the active model", [({}, registry.swaps)], "counter")
+        lines += gauge_lines("model_validation_failures_total", "Model versions rejected by validation",
+                             [({}, registry.failures)], "counter")
+
+    if model:
+        stats = model.batcher.stats()
+        lines += gauge_lines("inference_queue_depth", "Requests waiting for a batched forward pass",
+                             [({}, stats["queue_depth"])])
+        lines += ["# HELP inference_batch_size Rows per batched forward pass",
+                  "# TYPE inference_batch_size histogram"]
+        cumulative = 0
+        for upper, count in zip(BATCH_SIZE_BUCKETS, stats["batch_size_histogram"].values()):
+            cumulative += count
+            lines.append(f'inference_batch_size_bucket{{le="{upper}"}} {cumulative}')
+        lines.append(f'inference_batch_size_bucket{{le="+Inf"}} {stats["batches"]}')
+        lines.append(f"inference_batch_size_sum {stats['rows']}")
+        lines.append(f"inference_batch_size_count {stats['batches']}")
+
+    if model and model.prediction_cache:
+        stats = model.prediction_cache.stats()
+        lines += gauge_lines("prediction_cache_lookups_total", "Prediction cache lookups by result",
+                             [({"result": "hit"}, stats["hits"]),
+                              ({"result": "shared_hit"}, stats["shared_hits"]),
+                              ({"result": "miss"}, stats["misses"])], "counter")
+        lines += gauge_lines("prediction_cache_hit_ratio", "Share of lookups served from the cache",
+                             [({}, stats["hit_rate"])])
+        lines += gauge_lines("prediction_cache_entries", "Entries held in this worker's cache",
+                             [({}, stats["entries"])])
+
+    if upload_store:
+        stats = upload_store.stats()
+        lines += gauge_lines("upload_store_bytes", "Bytes held in the upload store", [({}, stats["bytes"])])
+        lines += gauge_lines("upload_store_files", "Files held in the upload store", [({}, stats["files"])])
+
+    if contact_writer:
+        stats = contact_writer.stats()
+        lines += gauge_lines("mongo_buffered_documents", "Contact submissions waiting for insert_many",
+                             [({}, stats["buffered"])])
+        lines += gauge_lines("mongo_documents_total", "Buffered contact submissions by outcome",
+                             [({"outcome": "written"}, stats["written"]), ({"outcome": "dropped"}, stats["dropped"])],
+                             "counter")
+
+    if sms_queue:
+        stats = sms_queue.stats()
+        lines += gauge_lines("sms_queue_pending", "SMS jobs queued, sending or waiting to retry",
+                             [({}, stats["pending"])])
+        lines += gauge_lines("sms_jobs_total", "Finished SMS jobs by outcome",
+                             [({"outcome": "sent"}, stats["sent"]), ({"outcome": "failed"}, stats["failed"])],
+                             "counter")
+        lines += gauge_lines("sms_retries_total", "SMS send attempts scheduled for retry",
+                             [({}, stats["retries"])], "counter")
+
+    lines += gauge_lines("upload_rejections_total", "Uploads rejected before decoding, by reason",
+                         [({"reason": reason}, count) for reason, count in sorted(upload_rejections.snapshot().items())],
+                         "counter")
+    return lines
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unmatched"
+    started = g.get("request_started")
+    if started is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    # The version that answered (A/B traffic may go to the candidate), else the active one
+    version = g.get("model_version") or (active_model().version if active_model() else None)
+    if version:
+        response.headers["X-Model-Version"] = version
+    return response
 
 # Function to preprocess image
 def preprocess_image(img_path):
-    """Preprocess image for model prediction"""
+    """Preprocess image file for model prediction"""
     try:
-        print(f"🖼️ Loading image from: {img_path}")
-        # Verify file exists
-        if not os.path.exists(img_path):
-            raise FileNotFoundError(f"Image file not found: {img_path}")
-        
-        # Load and preprocess image
-        img = image.load_img(img_path, target_size=(224, 224))
-        img_array = image.img_to_array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        print(f"✅ Image preprocessed successfully. Shape: {img_array.shape}")
+        logger.debug("🖼️ Loading image from: %s", img_path)
+        with open(img_path, "rb") as f:
+            img_array = preprocess_image_bytes(f.read())
+        logger.debug("✅ Image preprocessed successfully. Shape: %s", img_array.shape)
         return img_array
-        
+
     except Exception as e:
-        print(f"❌ Error preprocessing image: {str(e)}")
+        logger.error(f"❌ Error preprocessing image: {str(e)}")
         raise Exception(f"Failed to preprocess image: {str(e)}")
 
+def preprocess_image_bytes(data, resize_filter=None, out=None):
+    """Decode raw upload bytes into a new (1, 224, 224, 3) float32 tensor, or into ``out`` (one batch slot)"""
+    batch = None
+    if out is None:
+        batch = np.empty((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+        out = batch[0]
+    with STAGE_LATENCY.time(stage="decode"):
+        img = open_image(data, out.shape[1::-1])
+    # Browsers that shrink to the exact input size (GET /predict/config) skip the resize below
+    PREPROCESS_PATHS.inc(path="presized" if img.size == out.shape[1::-1] else "resized")
+    with STAGE_LATENCY.time(stage="resize"):
+        # Resize, convert and scale to [0, 1] in one pass, written in place
+        resize_into(img, out, resize_filter or active_resize_filter())
+    return out if batch is None else batch
+
+def active_resize_filter():
+    """Resize filter the serving model was trained with (see preprocessing.py)"""
+    model = active_model()
+    return model.label_set.resize_filter if model else LEGACY_RESIZE_FILTER
+
+def build_results(probabilities, label_set, k=None, details=True):
+    """Response fields for each row of a (batch, num_classes) softmax matrix, in one vectorized pass"""
+    calibrated = apply_temperature(probabilities, label_set.temperature)
+    indices, top_probabilities = top_k(calibrated, k or PREDICT_TOP_K)
+    confidences = top_probabilities * 100
+    if not details:
+        return compact_results(indices, confidences, label_set)
+    results = []
+    for row in range(len(indices)):
+        ranked = [{"class_id": int(c), "disease": label_set.names[c], "confidence": float(p)}
+                  for c, p in zip(indices[row], confidences[row])]
+        abstained = ranked[0]["confidence"] < ABSTAIN_THRESHOLD
+        details = LOW_CONFIDENCE_RESULT if abstained else label_set.result(ranked[0]["class_id"])
+        results.append({
+            **details,
+            "class_id": None if abstained else ranked[0]["class_id"],
+            "confidence": ranked[0]["confidence"],
+            "abstained": abstained,
+            "calibrated": label_set.temperature != 1.0,
+            "top_k": ranked,
+        })
+    return results
+
+def compact_results(indices, confidences, label_set):
+    """Class ids and confidences only; the text for each class id is in GET /disease_info.json"""
+    confidences = np.round(confidences.astype(np.float64), 2).tolist()
+    results = []
+    for ranked_ids, ranked_confidences in zip(indices.tolist(), confidences):
+        abstained = ranked_confidences[0] < ABSTAIN_THRESHOLD
+        results.append({
+            "disease": LOW_CONFIDENCE_RESULT["disease"] if abstained else label_set.names[ranked_ids[0]],
+            "class_id": None if abstained else ranked_ids[0],
+            "confidence": ranked_confidences[0],
+            "abstained": abstained,
+            "calibrated": label_set.temperature != 1.0,
+            "top_k": [{"class_id": c, "confidence": p} for c, p in zip(ranked_ids, ranked_confidences)],
+        })
+    return results
+
+@functools.lru_cache(maxsize=8)
+def disease_info_asset(label_set):
+    """Class names and details of a label set as one precompressed JSON document (GET /disease_info.json)"""
+    body = json.dumps({
+        "labels_version": label_set.version,
+        "classes": [{"class_id": i, **result} for i, result in enumerate(label_set.results)],
+        "inconclusive": LOW_CONFIDENCE_RESULT,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # The ETag hashes the content, so edited details get a new URL even when the labels are unchanged
+    return PrecompressedAsset(body, "application/json; charset=utf-8")
+
+def query_int(args, name, default):
+    """Integer query parameter, or ``default`` when it is missing or malformed"""
+    try:
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+def requested_top_k(num_classes, args=None):
+    """?top_k=N overrides PREDICT_TOP_K for one request"""
+    k = query_int(request.args if args is None else args, "top_k", PREDICT_TOP_K)
+    return max(1, min(k, num_classes))
+
+def requested_details(args=None):
+    """?details=0|1 overrides PREDICT_DETAILS for one request"""
+    return bool(query_int(request.args if args is None else args, "details", int(PREDICT_DETAILS)))
+
+def shadow_compare(candidate, img_array, predictions, views=1):
+    """Score the same input on a shadow candidate in the background and count top-1 agreement"""
+    def record(future):
+        try:
+            shadow = average_views(future.result(), views)
+        except Exception:
+            SHADOW_PREDICTIONS.inc(candidate=candidate.version, result="error")
+            return
+        agree = shadow.argmax(axis=1) == np.asarray(predictions).reshape(len(shadow), -1).argmax(axis=1)
+        SHADOW_PREDICTIONS.inc(int(agree.sum()), candidate=candidate.version, result="agree")
+        SHADOW_PREDICTIONS.inc(int((~agree).sum()), candidate=candidate.version, result="disagree")
+
+    candidate.batcher.submit(img_array).add_done_callback(record)
+
+def requested_tta_views(args=None):
+    """?tta=N overrides TTA_VIEWS for one request"""
+    views = query_int(request.args if args is None else args, "tta", TTA_VIEWS)
+    return max(1, min(views, MAX_TTA_VIEWS))
+
+# Steps of a single-image prediction, shared by the Flask route and the ASGI entry point (asgi.py)
+def lookup_prediction(model, data, views):
+    """(cache key, cached softmax row or None) for an upload; TTA results are cached separately"""
+    prediction_cache = model.prediction_cache
+    with STAGE_LATENCY.time(stage="cache_lookup"):
+        cache_key = prediction_cache.key(data) if prediction_cache else None
+        if cache_key and views > 1:
+            cache_key = f"{cache_key}-tta{views}"  # averaged views differ from the single-view result
+        predictions = prediction_cache.get(cache_key) if cache_key else None
+    return cache_key, predictions
+
+def prepare_input(model, data, views):
+    """Decode an upload into the (views, 224, 224, 3) batch for one forward pass (CPU bound)"""
+    img_array = np.empty((views, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    preprocess_image_bytes(data, model.label_set.resize_filter, out=img_array[0])
+    if views > 1:
+        with STAGE_LATENCY.time(stage="tta_views"):
+            make_views(img_array[0], views, out=img_array)
+    return img_array
+
+def save_upload(data, filename):
+    """Keep the original in the upload store; returns its name there, or None when uploads are not saved"""
+    if not upload_store:
+        return None
+    # Content-addressed name: collision free and deduplicated. Only hashing and queueing the write
+    # happen here; the write itself runs on the store's writer threads
+    with STAGE_LATENCY.time(stage="save_queue"):
+        return upload_store.save(data, secure_filename(filename)).replace(os.sep, "/")
+
+def finish_prediction(model, shadow, cache_key, img_array, outputs, views):
+    """Average the views' softmax rows, cache the result and mirror the input to a shadow candidate"""
+    predictions = average_views(outputs, views)[0]
+    if cache_key:
+        model.prediction_cache.put(cache_key, predictions)
+    if shadow:
+        shadow_compare(shadow, img_array, predictions, views)
+    return predictions
+
+def prediction_result(model, predictions, k, views, filename, source, details=True):
+    """Response body for one image"""
+    with STAGE_LATENCY.time(stage="serialize"):
+        result = build_results(predictions[np.newaxis], model.label_set, k, details)[0]
+        logger.info("✅ Prediction complete: %s (%.2f%%)", result["disease"], result["confidence"])
+        # Create URL for the uploaded image
+        result["image_path"] = f"/uploads/{filename}" if filename else None
+        result["tta_views"] = views
+        result["model_version"] = model.version
+        result["details_version"] = disease_info_asset(model.label_set).etag
+    PREDICTIONS.inc(disease=result["disease"], source=source)
+    return result
+
+@functools.lru_cache(maxsize=None)
+def page_asset(template=None, path=None):
+    """A page rendered once (Jinja template or plain HTML file) with fingerprinted asset URLs"""
+    if template:
+        html = render_template(template)
+    else:
+        with open(os.path.join(app.root_path, path), encoding="utf-8") as f:
+            html = f.read()
+    return PrecompressedAsset(static_manifest.rewrite_urls(html).encode("utf-8"), "text/html; charset=utf-8")
+
+def serve_page(template=None, path=None):
+    """Cached page body; browsers revalidate it by ETag so a new deploy shows up on the next visit"""
+    if not CACHE_PAGES:
+        page_asset.cache_clear()
+    status, body, headers = page_asset(template, path).respond(request.headers, "no-cache")
+    return Response(body, status=status, headers=headers)
+
+def send_file_from(directory, path, headers, **kwargs):
+    """send_from_directory (Range and conditional requests included), or with STATIC_OFFLOAD=x-accel
+    an empty response telling nginx which file to send"""
+    if STATIC_OFFLOAD == "x-accel":
+        file_path = safe_join(directory, path)
+        if file_path is None:
+            return jsonify({"error": "Not found"}), 404
+        response = Response(mimetype=kwargs.get("mimetype") or mimetypes.guess_type(path)[0]
+                            or "application/octet-stream")
+        relative = os.path.relpath(os.path.join(app.root_path, file_path), app.root_path).replace(os.sep, "/")
+        response.headers["X-Accel-Redirect"] = f"{STATIC_ACCEL_PREFIX}/{relative}"
+    else:
+        response = send_from_directory(directory, path, **kwargs)
+    response.headers.update(headers)
+    return response
+
 # Home route
 @app.route("/", methods=["GET"])
 def index():
-    return render_template("index.html")
+    return serve_page(template="index.html")
+
+# Fingerprinted static assets from build_static.py
+@app.route("/assets/<path:filename>")
+def asset(filename):
+    """The name carries a content hash, so a URL's bytes never change"""
+    entry = static_manifest.lookup(filename)
+    if entry is None:
+        return jsonify({"error": "Not found"}), 404
+    headers = {"Cache-Control": ASSET_CACHE_CONTROL}
+    if entry["encodings"]:
+        headers["Vary"] = "Accept-Encoding"
+    if STATIC_OFFLOAD == "x-accel":
+        # nginx drops Content-Encoding on X-Accel-Redirect; gzip_static/brotli_static pick the .gz/.br there
+        encoding, path = None, entry["path"]
+    else:
+        encoding, path = static_manifest.negotiate(entry, request.headers.get("Accept-Encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return send_file_from(
+        STATIC_BUILD_DIR, path, headers,
+        mimetype=entry["content_type"],
+        etag=f"{entry['hash']}-{encoding}" if encoding else entry["hash"],
+        max_age=31536000,
+    )
 
 # Route to serve uploaded images
-@app.route("/uploads/<filename>")
+@app.route("/uploads/<path:filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    if upload_store:
+        # The background write may still be in flight right after /predict returns
+        upload_store.wait(filename)
+    # Stored names are content hashes, so the bytes behind a URL never change
+    return send_file_from(
+        app.config["UPLOAD_FOLDER"], filename, {"Cache-Control": ASSET_CACHE_CONTROL},
+        etag=os.path.splitext(os.path.basename(filename))[0],
+        max_age=31536000,
+    )
 
 # Contact page route
 @app.route("/contact", methods=["GET", "POST"])
 def contact():
     if request.method == "GET":
-        return send_from_directory("contact-us", "public/index.html")
+        return serve_page(path="contact-us/public/index.html")
     
     elif request.method == "POST":
-        name = request.form.get("name")
-        email = request.form.get("email")
-        message = request.form.get("message")
+        body, status = submit_contact(request.form)
+        return jsonify(body), status
 
-        if not name or not email or not message:
-            return jsonify({"error": "All fields are required"}), 400
+def submit_contact(form):
+    """Validate a contact form and buffer it for MongoDB; returns (response body, status)"""
+    name = form.get("name")
+    email = form.get("email")
+    message = form.get("message")
 
-        # Insert into MongoDB only if available
-        if mongo:
-            try:
-                mongo.db.contacts.insert_one({"name": name, "email": email, "message": message})
-                return jsonify({"message": "Message sent successfully!"}), 201
-            except Exception as e:
-                print(f"❌ MongoDB error: {e}")
-                return jsonify({"error": "Database error"}), 500
-        else:
-            return jsonify({"error": "Database not available"}), 503
+    if not name or not email or not message:
+        return {"error": "All fields are required"}, 400
 
-# Fetch messages from MongoDB
+    # Buffer for the background writer; the request never waits on MongoDB
+    if contact_writer:
+        doc = {"name": name, "email": email, "message": message, "created_at": datetime.now(timezone.utc)}
+        if contact_writer.submit(doc):
+            return {"message": "Message sent successfully!"}, 202
+        return {"error": "Database busy, please try again later"}, 503
+    else:
+        return {"error": "Database not available"}, 503
+
+def database_error_response(e):
+    """503 when MongoDB is unreachable or timed out, 500 for anything else"""
+    from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+    logger.error(f"❌ MongoDB error: {e}")
+    if isinstance(e, (ConnectionFailure, ExecutionTimeout)):
+        return jsonify({"error": "Database not available"}), 503
+    return jsonify({"error": "Database error"}), 500
+
+# Fetch messages from MongoDB, newest first, one page at a time
 @app.route("/messages", methods=["GET"])
 def get_messages():
-    if mongo:
-        try:
-            contacts = list(mongo.db.contacts.find({}, {"_id": 0}))
-            return jsonify(contacts), 200
-        except Exception as e:
-            print(f"❌ MongoDB error: {e}")
-            return jsonify({"error": "Database error"}), 500
-    else:
+    if not mongo:
         return jsonify({"error": "Database not available"}), 503
 
+    limit = request.args.get("limit", MESSAGES_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MESSAGES_MAX_PAGE_SIZE))
+    query = {}
+    if request.args.get("cursor"):
+        try:
+            query = cursor_filter(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    try:
+        cursor = (mongo.db.contacts.find(query)
+                  .sort([("created_at", -1), ("_id", -1)])
+                  .limit(limit)
+                  .max_time_ms(MONGO_SOCKET_TIMEOUT_MS))
+        # Pull the first document here so connection errors still get a proper status code
+        first = next(cursor, None)
+    except Exception as e:
+        return database_error_response(e)
+
+    def generate():
+        doc, count, last = first, 0, None
+        yield '{"messages": ['
+        while doc is not None:
+            last = doc
+            doc = dict(doc)
+            del doc["_id"]
+            if isinstance(doc.get("created_at"), datetime):
+                doc["created_at"] = doc["created_at"].isoformat() + "Z"
+            yield ("," if count else "") + json.dumps(doc, default=str)
+            count += 1
+            try:
+                doc = next(cursor, None)
+            except Exception as e:
+                # Status is already sent; hand back a cursor so the client can resume from here
+                logger.error(f"❌ MongoDB error while streaming /messages: {e}")
+                count = limit
+                break
+        next_cursor = encode_cursor(last) if count == limit else None
+        yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
 # Location page route
 @app.route("/location", methods=["GET"])
 def location():
-    return render_template("location.html")
+    return serve_page(template="location.html")
 
 # SMS route
 @app.route("/send_sms", methods=["POST"])
 def send_sms_route():
     """Send SMS with disease prediction results"""
-    print("🚨 SMS route called!")
-    print(f"📥 Request data: {request.json}")
+    logger.debug("🚨 SMS route called!")
     try:
-        data = request.json
-        if not data:
-            print("❌ No JSON data received")
-            return jsonify({"status": "error", "message": "No data received"}), 400
-            
-        phone = data.get('phone')
-        disease = data.get('disease')
-        description = data.get('description', '')
-        treatment = data.get('treatment', '')
-        
-        print(f"📞 Phone: {phone}")
-        print(f"🦠 Disease: {disease}")
-        print(f"📝 Description: {description[:50]}...")
-        print(f"💊 Treatment: {treatment[:50]}...")
-        
-        # Validate phone number
-        if not phone or len(phone) < 10:
-            return jsonify({"status": "error", "message": "Valid phone number is required"})
-        
-        print(f"📱 Attempting to send SMS to: {phone}")
-        print(f"🦠 Disease: {disease}")
-        print(f"📝 Description length: {len(description)}")
-        print(f"💊 Treatment length: {len(treatment)}")
+        body, status = queue_sms_report(request.json, lambda job_id: url_for("sms_status", job_id=job_id))
+        return jsonify(body), status
+    except Exception as e:
+        logger.error(f"❌ SMS sending error: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)})
+
+def serving_label_set(details_version=None):
+    """Label set of the active (or candidate) model whose /disease_info.json has this version; active if None"""
+    models = [m for m in (registry.active, registry.candidate) if m] if registry else []
+    for model in models:
+        if not details_version or disease_info_asset(model.label_set).etag == details_version:
+            return model.label_set
+    return None
+
+@functools.lru_cache(maxsize=8)
+def sms_templates(label_set):
+    """SMS report text per class id, rendered once from the server's own label artifact"""
+    return tuple(sms_report_body(r["disease"], r["description"], r["treatment"]) for r in label_set.results)
+
+def queue_sms_report(data, status_url_for):
+    """Validate a /send_sms payload and queue the report; returns (response body, status).
+
+    The message is the server's template for ``class_id`` (from a /predict result);
+    no text from the client goes into it.
+    """
+    if not data:
+        logger.error("❌ No JSON data received")
+        return {"status": "error", "message": "No data received"}, 400
         
-        # Create message (without emojis for Twilio compatibility)
-        message_body = f"""DermaSense.ai Skin Analysis Report
+    phone = data.get('phone')
+    class_id = data.get('class_id')
+    details_version = data.get('details_version')
+    
+    logger.debug("📞 Phone: %s, class id: %s, details version: %s", phone, class_id, details_version)
+    
+    # Validate phone number
+    if not phone or len(phone) < 10:
+        return {"status": "error", "message": "Valid phone number is required"}, 200
+
+    label_set = serving_label_set(details_version)
+    if label_set is None:
+        if registry is None or registry.active is None:
+            return {"status": "error", "message": "AI model not available. Please try again later."}, 503
+        return {"status": "error", "message": "Disease details changed; please run the analysis again."}, 409
+    # Older clients send the disease name; only a known name is accepted, never its text
+    if class_id is None and data.get('disease') in label_set.names:
+        class_id = label_set.names.index(data['disease'])
+    if isinstance(class_id, bool) or not isinstance(class_id, int) or not 0 <= class_id < label_set.num_classes:
+        return {"status": "error", "message": "A valid class_id is required"}, 400
+
+    message_body = sms_templates(label_set)[class_id]
+    
+    # Queue SMS; delivery is reported by GET /send_sms/<job_id>
+    job_id = send_sms(message_body, phone)
+    if job_id == "TWILIO_NOT_AVAILABLE":
+        return {"status": "error", "message": "SMS service is not available"}, 503
+
+    return {
+        "status": "queued",
+        "message": "SMS queued for delivery",
+        "job_id": job_id,
+        "status_url": status_url_for(job_id),
+    }, 202
+
+def sms_report_body(disease, description, treatment):
+    """Report text for one prediction (without emojis for Twilio compatibility)"""
+    return f"""DermaSense.ai Skin Analysis Report
 
 Disease Detected: {disease}
 
@@ -405,47 +812,101 @@ Treatment: {treatment[:150]}{'...' if len(treatment) > 150 else ''}
 WARNING: This is an AI prediction. Please consult a dermatologist for accurate diagnosis.
 
 Stay healthy!"""
-        
-        print(f"📤 Message to send: {message_body[:100]}...")
-        
-        # Send SMS
-        sms_sid = send_sms(message_body, phone)
-        
-        if sms_sid == "DEMO_SMS_SUCCESS":
-            print(f"🧪 SMS simulation successful!")
-            return jsonify({"status": "success", "message": "SMS sent successfully (Demo Mode)", "sid": sms_sid})
-        elif sms_sid == "UNVERIFIED_NUMBER":
-            return jsonify({"status": "error", "message": "Phone number not verified. Please verify it in Twilio Console or try a different number."})
-        elif sms_sid == "INVALID_CREDENTIALS":
-            return jsonify({"status": "error", "message": "Invalid Twilio credentials. Please check your Account SID and Auth Token."})
-        elif sms_sid and sms_sid not in ["SMS_FAILED", "UNVERIFIED_NUMBER", "INVALID_CREDENTIALS"]:
-            print(f"✅ SMS sent successfully! SID: {sms_sid}")
-            return jsonify({"status": "success", "message": "SMS sent successfully", "sid": sms_sid})
-        else:
-            return jsonify({"status": "error", "message": "Failed to send SMS - Unknown error"})
-            
-    except Exception as e:
-        print(f"❌ SMS sending error: {str(e)}")
-        return jsonify({"status": "error", "message": str(e)})
+
+SMS_ERROR_MESSAGES = {
+    "UNVERIFIED_NUMBER": "Phone number not verified. Please verify it in Twilio Console or try a different number.",
+    "INVALID_CREDENTIALS": "Invalid Twilio credentials. Please check your Account SID and Auth Token.",
+    "SMS_FAILED": "Failed to send SMS",
+}
+
+@app.route("/send_sms/<job_id>", methods=["GET"])
+def sms_status(job_id):
+    """Delivery status of a queued SMS"""
+    job = sms_queue.status(job_id) if sms_queue else None
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown SMS job"}), 404
+
+    if job["state"] == "sent":
+        demo = job["sid"] == "DEMO_SMS_SUCCESS"
+        job.update(status="success", message="SMS sent successfully" + (" (Demo Mode)" if demo else ""))
+    elif job["state"] == "failed":
+        job.update(status="error", message=SMS_ERROR_MESSAGES.get(job["error"], SMS_ERROR_MESSAGES["SMS_FAILED"]))
+    else:
+        job["status"] = "pending"
+    return jsonify(job)
 
 # Debug route to test if Flask is working
 @app.route("/debug", methods=["GET"])
 def debug():
+    model = active_model()
     return jsonify({
         "status": "Flask server is working!", 
-        "routes": ["/", "/send_sms", "/test_sms", "/debug", "/health"],
+        "routes": ["/", "/predict", "/predict/batch", "/predict/config", "/disease_info.json", "/assets/<path>", "/send_sms", "/send_sms/<job_id>", "/test_sms", "/debug", "/health", "/health/ready", "/metrics", "/models/reload"],
         "model_loaded": model is not None,
+        "model_ready": model_ready.is_set(),
+        "startup_phases": startup_phases,
+        "model_backend": model.name if model else None,
+        "model_version": model.version if model else None,
+        "model_registry": registry.stats() if registry else None,
+        "labels_version": model.label_set.version if model else None,
+        "temperature": model.label_set.temperature if model else None,
+        "abstain_threshold": ABSTAIN_THRESHOLD,
+        "tta_views": TTA_VIEWS,
+        "num_classes": model.num_classes if model else None,
         "mongodb_connected": mongo is not None,
-        "twilio_initialized": client is not None,
+        "contact_writer": contact_writer.stats() if contact_writer else None,
+        "twilio_initialized": sms_queue is not None,
+        "sms_queue": sms_queue.stats() if sms_queue else None,
+        "batching": model.batcher.stats() if model else None,
+        "prediction_cache": model.prediction_cache.stats() if model and model.prediction_cache else None,
+        "upload_store": upload_store.stats() if upload_store else None,
+        "upload_rejections": upload_rejections.snapshot(),
         "port": os.getenv("PORT", "Not set"),
         "flask_env": os.getenv("FLASK_ENV", "Not set")
     })
 
-# Simple health check for Render
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Body exceeded the configured limit; rejected before it is read"""
+    upload_rejections.add("request_too_large")
+    return jsonify({"error": "Upload is too large."}), 413
+
+# Prometheus scrape endpoint
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Simple health check for Render (liveness: the process is up and serving HTTP)
 @app.route("/health", methods=["GET"])
 def health():
     return "OK", 200
 
+# Readiness: warm-up finished and the model can serve predictions
+@app.route("/health/ready", methods=["GET"])
+def health_ready():
+    model = active_model()
+    ready = model_ready.is_set() and model is not None
+    return jsonify({
+        "ready": ready,
+        "warming_up": not model_ready.is_set(),
+        "model_backend": model.name if model else None,
+        "model_version": model.version if model else None,
+        "startup_phases": startup_phases,
+        "error": startup_error,
+    }), 200 if ready else 503
+
+# Re-read the registry now instead of waiting for the next poll (needs MODEL_ADMIN_TOKEN)
+@app.route("/models/reload", methods=["POST"])
+def reload_models():
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify({"error": "Model reload endpoint is disabled (set MODEL_ADMIN_TOKEN)."}), 404
+    if request.headers.get("Authorization") != f"Bearer {MODEL_ADMIN_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    if registry is None:
+        return jsonify({"error": "AI model not available. Please try again later."}), 503
+    swapped = registry.reload()
+    return jsonify({"swapped": swapped, **registry.stats()})
+
 # Test SMS route
 @app.route("/test_sms", methods=["GET", "POST"])
 def test_sms():
@@ -481,7 +942,15 @@ def test_sms():
             return "Phone number required"
         
         message = "🧪 Test SMS from DermaSense.ai - Twilio is working! Your phone number can now receive disease analysis reports."
-        sms_sid = send_sms(message, phone)
+        job_id = send_sms(message, phone)
+        # This diagnostic page reports the outcome, so it waits for the queued send
+        job = sms_queue.wait(job_id, timeout=SMS_TIMEOUT_SECONDS * 2) if sms_queue else None
+        if job is None:
+            sms_sid = "TWILIO_NOT_AVAILABLE"
+        elif job["state"] == "sent":
+            sms_sid = job["sid"]
+        else:
+            sms_sid = job["error"] or "SMS_FAILED"
         
         if sms_sid == "UNVERIFIED_NUMBER":
             return f"""
@@ -503,7 +972,7 @@ def test_sms():
             </body>
             </html>
             """
-        elif sms_sid and sms_sid not in ["SMS_FAILED", "INVALID_CREDENTIALS"]:
+        elif sms_sid and sms_sid not in ["SMS_FAILED", "INVALID_CREDENTIALS", "TWILIO_NOT_AVAILABLE"]:
             return f"""
             <!DOCTYPE html>
             <html>
@@ -532,105 +1001,290 @@ def test_sms():
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
+# Disease details for /predict results
+@app.route("/disease_info.json", methods=["GET"])
+def disease_info():
+    """Names and details for the class ids in /predict results; ?v=<details_version> URLs never change"""
+    requested = request.args.get("v")
+    label_set = serving_label_set(requested) or serving_label_set()
+    if label_set is None:
+        return jsonify({"error": "AI model not available. Please try again later."}), 503
+    asset = disease_info_asset(label_set)
+    # Only the exact version asked for may be cached for good; anything else revalidates by ETag
+    cache_control = "public, max-age=31536000, immutable" if asset.etag == requested else "no-cache"
+    status, body, headers = asset.respond(request.headers, cache_control)
+    return Response(body, status=status, headers=headers)
+
+@app.route("/predict/config", methods=["GET"])
+def predict_config():
+    """How the web UI should downscale photos before uploading them to /predict"""
+    width, height = IMAGE_SIZE
+    response = jsonify({
+        "target_size": [width, height],
+        "max_dimension": max(CLIENT_UPLOAD_MAX_DIMENSION, width, height),
+        "presize": CLIENT_UPLOAD_MAX_DIMENSION <= max(width, height),
+        "type": "image/jpeg",
+        "quality": CLIENT_UPLOAD_QUALITY,
+        "max_upload_bytes": MAX_UPLOAD_BYTES,
+    })
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return response
+
 # Predict route
 @app.route("/predict", methods=["POST"])
 def predict():
     try:
-        print("🔍 Prediction request received")
-        if "file" not in request.files:
-            print("❌ No file in request")
+        logger.debug("🔍 Prediction request received")
+        # A single-image request never needs the batch-sized body limit
+        request.max_content_length = MAX_UPLOAD_BYTES + 64 * 1024
+        with STAGE_LATENCY.time(stage="upload_read"):
+            file = request.files.get("file")
+            data = file.read() if file else b""
+        if file is None:
+            logger.info("❌ No file in request")
+            upload_rejections.add("missing_file")
             return jsonify({"error": "No file uploaded!"}), 400
         
-        file = request.files["file"]
-        print(f"📁 File received: {file.filename}")
+        logger.debug("📁 File received: %s", file.filename)
         if file.filename == "":
-            print("❌ Empty filename")
+            logger.info("❌ Empty filename")
+            upload_rejections.add("missing_file")
             return jsonify({"error": "No selected file!"}), 400
         
-        # Validate file type
-        if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-            return jsonify({"error": "Invalid file type. Please upload an image."}), 400
-        
-        # Create secure filename with timestamp
-        filename = secure_filename(file.filename)
-        timestamp = str(int(time.time()))
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        
-        # Ensure upload directory exists
-        os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-        
-        # Save the file
-        file.save(filepath)
-        print(f"💾 File saved to: {filepath}")
-        
-        # Verify file was saved correctly
-        if not os.path.exists(filepath):
-            return jsonify({"error": "Failed to save uploaded file"}), 500
+        # Validate size, format (magic bytes) and dimensions from the header only
+        try:
+            with STAGE_LATENCY.time(stage="validate"):
+                probe_image(data, MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS)
+        except UploadRejected as e:
+            logger.info("❌ Upload rejected (%s): %s", e.reason, e.message)
+            upload_rejections.add(e.reason)
+            return jsonify({"error": e.message}), e.status
 
-        # Preprocess and predict
-        print("🔄 Starting prediction...")
-        img_array = preprocess_image(filepath)
-        
-        # Check if model is available
-        if model is None:
-            print("❌ Model not loaded - cannot make predictions")
+        # Check if model is available (waits for warm-up after a cold start)
+        if not wait_for_model():
+            logger.error("❌ Model not loaded - cannot make predictions")
             return jsonify({"error": "AI model not available. Please try again later."}), 503
-            
-        try:
-            predictions = model.predict(img_array)
-            class_index = np.argmax(predictions)
-            confidence = float(np.max(predictions)) * 100
+        # One version answers the whole request, even if a hot swap happens meanwhile
+        model, shadow = registry.route(data)
+        g.model_version = model.version
+        views = requested_tta_views()
+
+        # Re-submitted images are served from the prediction cache without decoding
+        cache_key, predictions = lookup_prediction(model, data, views)
+        source = "cache" if predictions is not None else "model"
+
+        img_array = None
+        if predictions is None:
+            # Preprocess straight from memory; the original is written to disk in the background
+            logger.debug("🔄 Starting prediction...")
+            try:
+                img_array = prepare_input(model, data, views)
+            except Exception as e:
+                logger.info("❌ Error preprocessing image: %s", e)
+                return jsonify({"error": f"Failed to preprocess image: {str(e)}"}), 400
+        else:
+            logger.debug("⚡ Prediction cache hit")
 
-            # Get Disease Name
-            predicted_disease = class_labels[class_index]
-            print(f"✅ Prediction complete: {predicted_disease} ({confidence:.2f}%)")
+        filename = save_upload(data, file.filename)
+
+        try:
+            if predictions is None:
+                with STAGE_LATENCY.time(stage="inference"):
+                    # All views go through the batcher as one submission: a single forward pass
+                    outputs = model.predict(img_array)
+                predictions = finish_prediction(model, shadow, cache_key, img_array, outputs, views)
         except Exception as pred_error:
-            print(f"❌ Prediction failed: {pred_error}")
-            # Fallback prediction
-            predicted_disease = "Unknown or No Disease"
-            confidence = 50.0
-            print(f"🔄 Using fallback prediction: {predicted_disease}")
-
-        # Get Disease Details (if available)
-        disease_details = disease_info.get(predicted_disease, {
-            "description": "No information available.",
-            "cause": "Unknown.",
-            "treatment": "Consult a doctor for further evaluation."
-        })
+            # Report the failure; a made-up diagnosis would be worse than none
+            logger.error(f"❌ Prediction failed: {pred_error}")
+            return jsonify({"error": "Prediction failed. Please try again later."}), 503
 
-        # Create URL for the uploaded image
-        image_url = f"/uploads/{filename}"
-
-        result = {
-            "disease": predicted_disease,
-            "confidence": confidence,
-            "description": disease_details["description"],
-            "cause": disease_details["cause"],
-            "treatment": disease_details["treatment"],
-            "image_path": image_url  # Now returns a URL instead of file path
-        }
-
-        return jsonify(result)  # Return JSON response
+        result = prediction_result(model, predictions, requested_top_k(model.num_classes), views, filename, source,
+                                   requested_details())
+        response = jsonify(result)
+
+        return response  # Return JSON response
         
+    except RequestEntityTooLarge:
+        raise  # handled by request_too_large()
     except Exception as e:
-        print(f"❌ Prediction error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Prediction error: {str(e)}")
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+def extract_archive_images(archive_file, budget):
+    """Yield (name, bytes or UploadRejected) for every image member of a zip or tar archive"""
+    data = archive_file.read()
+    if archive_file.filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield info.filename, read_archive_member(info.file_size, budget, lambda: zf.read(info))
+    else:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tf_archive:
+            for member in tf_archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield member.name, read_archive_member(
+                        member.size, budget, lambda: tf_archive.extractfile(member).read())
+
+def read_archive_member(size, budget, read):
+    """Check a member's declared size against the per-image and whole-request limits before extracting"""
+    if size > MAX_UPLOAD_BYTES:
+        return UploadRejected("file_too_large", f"Image is too large (max {MAX_UPLOAD_BYTES // 2**20} MB)", 413)
+    budget[0] -= size
+    if budget[0] < 0:
+        raise UploadRejected("archive_too_large", f"Archive expands beyond {MAX_REQUEST_BYTES // 2**20} MB", 413)
+    return read()
+
+def collect_batch_uploads():
+    """Gather (name, bytes) pairs from multipart files and/or archives, in upload order"""
+    uploads = []
+    budget = [MAX_REQUEST_BYTES]  # total uncompressed bytes allowed out of archives
+    for file in request.files.getlist("files") + request.files.getlist("file"):
+        if not file.filename:
+            continue
+        if file.filename.lower().endswith(ARCHIVE_EXTENSIONS):
+            for member in extract_archive_images(file, budget):
+                uploads.append(member)
+                if len(uploads) > PREDICT_BATCH_MAX_FILES:
+                    return uploads
+        else:
+            uploads.append((file.filename, file.read()))
+        if len(uploads) > PREDICT_BATCH_MAX_FILES:
+            break
+    return uploads
+
+def predict_chunk(model, chunk, offset, k=None, shadow=None, details=True):
+    """Decode a chunk of uploads, run one batched forward pass, return per-image results"""
+    prediction_cache = model.prediction_cache
+    results = [None] * len(chunk)
+    # Images are decoded straight into their row of one batch; rows of failed images are reused
+    batch = np.empty((len(chunk), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    slots, keys = [], []
+    scored, probabilities, sources = [], [], []
+    for i, (name, data) in enumerate(chunk):
+        entry = {"index": offset + i, "filename": name}
+        results[i] = entry
+        try:
+            if isinstance(data, UploadRejected):
+                raise data
+            probe_image(data, MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS)
+        except UploadRejected as e:
+            upload_rejections.add(e.reason)
+            entry["error"] = e.message
+            continue
+
+        cache_key = prediction_cache.key(data) if prediction_cache else None
+        cached = prediction_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            scored.append(i)
+            probabilities.append(cached)
+            sources.append("cache")
+            continue
+
+        try:
+            preprocess_image_bytes(data, model.label_set.resize_filter, out=batch[len(slots)])
+            slots.append(i)
+            keys.append(cache_key)
+        except Exception as e:
+            entry["error"] = f"Failed to preprocess image: {str(e)}"
+
+    if slots:
+        with STAGE_LATENCY.time(stage="inference"):
+            batch = batch[:len(slots)]
+            predictions = model.predict(batch)
+        if shadow:
+            shadow_compare(shadow, batch, predictions)
+        for row, i in enumerate(slots):
+            if keys[row]:
+                prediction_cache.put(keys[row], predictions[row])
+            scored.append(i)
+            probabilities.append(predictions[row])
+            sources.append("model")
+
+    if scored:
+        details_version = disease_info_asset(model.label_set).etag
+        for i, source, fields in zip(scored, sources,
+                                     build_results(np.stack(probabilities), model.label_set, k, details)):
+            results[i].update(fields, model_version=model.version, details_version=details_version)
+            PREDICTIONS.inc(disease=fields["disease"], source=source)
+    return results
+
+# Batch predict route
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """Predict many images in one request (multipart files or a zip/tar archive)"""
+    try:
+        try:
+            uploads = collect_batch_uploads()
+        except UploadRejected as e:
+            upload_rejections.add(e.reason)
+            return jsonify({"error": e.message}), e.status
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            upload_rejections.add("corrupt_archive")
+            return jsonify({"error": f"Could not read archive: {str(e)}"}), 400
+        if not uploads:
+            return jsonify({"error": "No images uploaded!"}), 400
+        if len(uploads) > PREDICT_BATCH_MAX_FILES:
+            upload_rejections.add("too_many_files")
+            return jsonify({"error": f"Too many images (max {PREDICT_BATCH_MAX_FILES})"}), 413
+        if not wait_for_model():
+            return jsonify({"error": "AI model not available. Please try again later."}), 503
+
+        logger.info("📦 Batch prediction request: %d images", len(uploads))
+        # The whole batch is answered by one version; A/B splits by request here, not by image
+        model, shadow = registry.route()
+        g.model_version = model.version
+        k = requested_top_k(model.num_classes)
+        details = requested_details()
+
+        # Stream NDJSON for large batches (or on request) so clients see early results
+        stream = request.args.get("stream")
+        if stream is None:
+            stream = "application/x-ndjson" in request.headers.get("Accept", "") \
+                or len(uploads) > PREDICT_BATCH_STREAM_THRESHOLD
+        else:
+            stream = stream.lower() in ("1", "true", "yes")
+
+        if not stream:
+            results = predict_chunk(model, uploads, 0, k, shadow, details)
+            return jsonify({"count": len(results), "results": results})
+
+        def generate():
+            for offset in range(0, len(uploads), PREDICT_BATCH_CHUNK_SIZE):
+                chunk = uploads[offset:offset + PREDICT_BATCH_CHUNK_SIZE]
+                try:
+                    results = predict_chunk(model, chunk, offset, k, shadow, details)
+                except Exception as e:
+                    results = [{"index": offset + i, "filename": name, "error": f"Prediction failed: {str(e)}"}
+                               for i, (name, _) in enumerate(chunk)]
+                for result in results:
+                    yield json.dumps(result) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    except RequestEntityTooLarge:
+        raise  # handled by request_too_large()
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {str(e)}")
+        return jsonify({"error": f"Batch prediction failed: {str(e)}"}), 500
+
+# Kick off warm-up; in background mode the app can bind and serve /health right away
+record_phase("app_import", PROCESS_START)
+if STARTUP_MODE == "eager":
+    warm_up()
+elif STARTUP_MODE != "manual":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
 if __name__ == "__main__":
     # Get port from environment variable for production, default to 5000 for local
     port = int(os.getenv("PORT", 5000))
     # Set debug mode based on environment
     debug_mode = os.getenv("FLASK_ENV") != "production"
     
-    print(f"🚀 Starting Flask app on port {port}")
-    print(f"🔧 Debug mode: {debug_mode}")
-    print(f"🌍 Environment: {os.getenv('FLASK_ENV', 'development')}")
-    print(f"🤖 TensorFlow version: {tf.__version__ if 'tf' in globals() else 'Not imported'}")
-    print(f"💾 Model loaded: {'✅' if model else '❌'}")
-    print(f"🌐 PORT environment variable: {os.getenv('PORT', 'Not set')}")
+    logger.info(f"🚀 Starting Flask app on port {port}")
+    logger.info(f"🔧 Debug mode: {debug_mode}")
+    logger.info(f"🌍 Environment: {os.getenv('FLASK_ENV', 'development')}")
+    logger.info(f"⏳ Startup mode: {STARTUP_MODE} (model loads in the background unless eager)")
+    logger.info(f"🌐 PORT environment variable: {os.getenv('PORT', 'Not set')}")
     
     # Ensure we bind to all interfaces for Render
     app.run(debug=debug_mode, host="0.0.0.0", port=port)
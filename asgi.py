@@ -0,0 +1,163 @@
+"""ASGI entry point: the same API, with uploads and I/O handled on an event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+/predict, POST /contact and POST /send_sms are served natively. Uploads are
+read with ``await``, so a slow client costs a coroutine instead of a worker
+thread. Decoding runs on a dedicated thread pool (ASGI_DECODE_THREADS), and
+inference is awaited on the model's micro-batcher, which already owns the
+forward pass on its own thread. Many concurrent uploads can therefore share
+one process while the model stays busy. Every other route is the Flask app,
+mounted unchanged.
+
+Needs starlette and python-multipart, plus an ASGI server such as uvicorn
+(``pip install -r requirements-asgi.txt``). a2wsgi is used for the Flask
+mount when installed.
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import app as flask_app
+from upload_validation import UploadRejected, probe_image
+
+logger = logging.getLogger("dermasense")
+
+# Decoding holds the GIL only partly (PIL releases it), so one thread per core keeps the model fed
+DECODE_THREADS = int(os.getenv("ASGI_DECODE_THREADS", "0")) or os.cpu_count()
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_THREADS, thread_name_prefix="decode")
+
+
+def observed(endpoint):
+    """Request count/latency metrics and the X-Model-Version header, like the Flask after_request hook"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            request.state.model_version = None
+            try:
+                response = await handler(request)
+            except Exception as e:
+                logger.exception(f"❌ {endpoint} error: {str(e)}")
+                response = error(f"Request failed: {str(e)}", 500)
+            flask_app.REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+            flask_app.REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            active = flask_app.active_model()
+            version = request.state.model_version or (active.version if active else None)
+            if version:
+                response.headers["X-Model-Version"] = version
+            return response
+        return wrapper
+    return decorator
+
+
+def error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+async def model_available():
+    """Wait for warm-up without blocking the event loop"""
+    if flask_app.model_ready.is_set():
+        return flask_app.active_model() is not None
+    return await asyncio.to_thread(flask_app.wait_for_model)
+
+
+@observed("predict")
+async def predict(request):
+    loop = asyncio.get_running_loop()
+    # A single-image request never needs the batch-sized body limit
+    length = request.headers.get("content-length", "")
+    if not length.isdigit():
+        return error("Content-Length required.", 411)
+    if int(length) > flask_app.MAX_UPLOAD_BYTES + 64 * 1024:
+        flask_app.upload_rejections.add("request_too_large")
+        return error("Upload is too large.", 413)
+
+    with flask_app.STAGE_LATENCY.time(stage="upload_read"):
+        async with request.form() as form:
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                flask_app.upload_rejections.add("missing_file")
+                return error("No file uploaded!", 400)
+            if not file.filename:
+                flask_app.upload_rejections.add("missing_file")
+                return error("No selected file!", 400)
+            filename = file.filename
+            data = await file.read()
+
+    # Validate size, format (magic bytes) and dimensions from the header only
+    try:
+        with flask_app.STAGE_LATENCY.time(stage="validate"):
+            probe_image(data, flask_app.MAX_UPLOAD_BYTES, flask_app.MAX_IMAGE_PIXELS)
+    except UploadRejected as e:
+        flask_app.upload_rejections.add(e.reason)
+        return error(e.message, e.status)
+
+    if not await model_available():
+        return error("AI model not available. Please try again later.", 503)
+    # One version answers the whole request, even if a hot swap happens meanwhile
+    model, shadow = flask_app.registry.route(data)
+    request.state.model_version = model.version
+    views = flask_app.requested_tta_views(request.query_params)
+
+    cache_key, predictions = flask_app.lookup_prediction(model, data, views)
+    source = "cache" if predictions is not None else "model"
+    # The original is written to disk while the image is decoded and scored
+    save = loop.run_in_executor(None, flask_app.save_upload, data, filename) if flask_app.upload_store else None
+
+    if predictions is None:
+        try:
+            img_array = await loop.run_in_executor(decode_pool, flask_app.prepare_input, model, data, views)
+        except Exception as e:
+            return error(f"Failed to preprocess image: {str(e)}", 400)
+        try:
+            with flask_app.STAGE_LATENCY.time(stage="inference"):
+                # The batcher thread runs the forward pass; this coroutine just waits for its future
+                outputs = await asyncio.wrap_future(model.batcher.submit(img_array))
+            predictions = flask_app.finish_prediction(model, shadow, cache_key, img_array, outputs, views)
+        except Exception as e:
+            logger.error(f"❌ Prediction failed: {e}")
+            return error("Prediction failed. Please try again later.", 503)
+
+    filename = await save if save else None
+    k = flask_app.requested_top_k(model.num_classes, request.query_params)
+    result = flask_app.prediction_result(model, predictions, k, views, filename, source,
+                                         flask_app.requested_details(request.query_params))
+    return JSONResponse(result)
+
+
+@observed("contact")
+async def contact(request):
+    async with request.form() as form:
+        body, status = flask_app.submit_contact(form)
+    return JSONResponse(body, status_code=status)
+
+
+@observed("send_sms_route")
+async def send_sms(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    body, status = flask_app.queue_sms_report(data, lambda job_id: f"/send_sms/{job_id}")
+    return JSONResponse(body, status_code=status)
+
+
+app = Starlette(routes=[
+    Route("/predict", predict, methods=["POST"]),
+    Route("/contact", contact, methods=["POST"]),
+    Route("/send_sms", send_sms, methods=["POST"]),
+    Mount("/", app=WSGIMiddleware(flask_app.app)),
+])
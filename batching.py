@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Upper bounds of the batch-size histogram buckets (last bucket is open ended)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class _Pending:
+    """A preprocessed input waiting for a batched forward pass"""
+
+    __slots__ = ("array", "future", "enqueued_at")
+
+    def __init__(self, array):
+        self.array = array
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collects concurrent inference requests and runs them as one batch.
+
+    Requests are grouped until either ``max_batch_size`` rows are pending or
+    ``window_ms`` has elapsed since the first request of the batch arrived,
+    so a lone request waits at most one window before it is served.
+    Requests that are already queued when the window closes join the batch
+    regardless, so ``window_ms=0`` never waits but still batches a backlog.
+
+    ``close()`` lets the worker thread finish what is queued and exit;
+    anything submitted afterwards runs inline on the caller's thread, so a
+    request still holding a retired model is served rather than stranded.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, window_ms=10):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._batches = 0
+        self._rows = 0
+        self._max_queue_depth = 0
+        self._last_wait_ms = 0.0
+        self._closed = False
+        # Concatenated batches are written into one array that is reused while it is large enough
+        self._buffer = None
+
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_array):
+        """Queue an array of shape (n, H, W, C) and return a Future of its predictions"""
+        pending = _Pending(img_array)
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put(pending)
+                depth = self._queue.qsize()
+                if depth > self._max_queue_depth:
+                    self._max_queue_depth = depth
+        if closed:
+            self._run_inline(pending)
+        return pending.future
+
+    def predict(self, img_array, timeout=None):
+        """Blocking helper: submit and wait for the softmax rows of this input"""
+        return self.submit(img_array).result(timeout=timeout)
+
+    def close(self):
+        """Serve what is already queued, then stop the worker thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+
+    def _run_inline(self, pending):
+        try:
+            pending.future.set_result(np.asarray(self.predict_fn(pending.array)))
+        except Exception as e:
+            pending.future.set_exception(e)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None, 0
+        batch = [first]
+        rows = len(first.array)
+        deadline = first.enqueued_at + self.window
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Past the window (or with window_ms=0) still take whatever is already queued
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # close() was called; finish this batch first
+                break
+            batch.append(item)
+            rows += len(item.array)
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            if batch is None:
+                return
+            self._record(batch, rows)
+            try:
+                if len(batch) == 1:
+                    inputs = batch[0].array
+                else:
+                    inputs = np.concatenate([item.array for item in batch], axis=0,
+                                            out=self._batch_buffer(batch[0].array, rows))
+                predictions = np.asarray(self.predict_fn(inputs))
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            offset = 0
+            for item in batch:
+                n = len(item.array)
+                item.future.set_result(predictions[offset:offset + n])
+                offset += n
+
+    def _batch_buffer(self, first, rows):
+        """Input array for ``rows`` rows shaped like ``first``, reused across batches (worker thread only)"""
+        buffer = self._buffer
+        if buffer is None or len(buffer) < rows or buffer.shape[1:] != first.shape[1:] or buffer.dtype != first.dtype:
+            buffer = self._buffer = np.empty((max(rows, self.max_batch_size),) + first.shape[1:], dtype=first.dtype)
+        return buffer[:rows]
+
+    def _record(self, batch, rows):
+        bucket = len(BATCH_SIZE_BUCKETS)
+        for i, upper in enumerate(BATCH_SIZE_BUCKETS):
+            if rows <= upper:
+                bucket = i
+                break
+        with self._lock:
+            self._histogram[bucket] += 1
+            self._batches += 1
+            self._rows += rows
+            self._last_wait_ms = (time.perf_counter() - batch[0].enqueued_at) * 1000
+
+    def stats(self):
+        """Snapshot of queue depth and batch-size histogram"""
+        with self._lock:
+            labels = [f"<={upper}" for upper in BATCH_SIZE_BUCKETS]
+            labels.append(f">{BATCH_SIZE_BUCKETS[-1]}")
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": round(self._rows / self._batches, 2) if self._batches else 0.0,
+                "last_wait_ms": round(self._last_wait_ms, 2),
+                "batch_size_histogram": dict(zip(labels, self._histogram)),
+                "max_batch_size": self.max_batch_size,
+                "window_ms": self.window * 1000,
+            }
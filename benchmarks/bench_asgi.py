@@ -0,0 +1,122 @@
+"""Load test: gunicorn ``app:app`` (WSGI threads) vs uvicorn ``asgi:app`` (event loop).
+
+The uvicorn side needs ``pip install -r requirements-asgi.txt``.
+
+Starts each server in turn, waits for /health/ready and drives /predict with
+many concurrent clients. ``--upload-ms`` makes every client trickle its body
+over that many milliseconds, like a phone on a slow network. A sync worker
+thread is held for the whole upload; the ASGI server only parks a coroutine.
+Reports throughput, latency percentiles, errors and the RSS of each server.
+
+    python benchmarks/bench_asgi.py --concurrency 64 --upload-ms 500
+    python benchmarks/bench_asgi.py --servers gunicorn uvicorn --requests 400 --output bench_asgi.json
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_workers import DEFAULT_IMAGE, ROOT, multipart_body, tree_rss_bytes, wait_ready
+
+SERVERS = {
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "uvicorn": [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--log-level", "warning"],
+}
+
+
+def post_slowly(port, image_bytes, upload_ms, chunks=8):
+    """POST /predict, sending the body in ``chunks`` pieces spread over ``upload_ms``; returns (status, seconds)"""
+    # Unique trailing bytes keep the prediction cache from short-circuiting inference
+    body, content_type = multipart_body("file", "bench.jpg", image_bytes + uuid.uuid4().bytes)
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        conn.putrequest("POST", "/predict")
+        conn.putheader("Content-Type", content_type)
+        conn.putheader("Content-Length", str(len(body)))
+        conn.endheaders()
+        step = -(-len(body) // chunks)
+        for offset in range(0, len(body), step):
+            conn.send(body[offset:offset + step])
+            if upload_ms:
+                time.sleep(upload_ms / 1000 / chunks)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status, time.perf_counter() - started
+    except (OSError, http.client.HTTPException):
+        return None, time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def drive(port, image_bytes, requests, concurrency, upload_ms):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda _: post_slowly(port, image_bytes, upload_ms), range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds for status, seconds in outcomes if status == 200)
+    if not latencies:
+        return {"requests": requests, "errors": requests}
+
+    def percentile(q):
+        return round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * q))], 1)
+
+    return {
+        "requests": requests,
+        "errors": sum(1 for status, _ in outcomes if status != 200),
+        "requests_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=sorted(SERVERS), default=["gunicorn", "uvicorn"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--upload-ms", type=float, default=0, help="spread each upload over this long")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--output", default="bench_asgi.json")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = []
+    for server in args.servers:
+        command = SERVERS[server] + (["--port", str(args.port)] if server == "uvicorn" else [])
+        # One process each; gunicorn keeps its configured threads per worker (GUNICORN_THREADS)
+        env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY="1", SAVE_UPLOADS="false",
+                   PREDICTION_CACHE_SIZE="0", MODEL_RELOAD_INTERVAL="0")
+        proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready(base_url, args.ready_timeout):
+                raise SystemExit(f"❌ {server} never became ready")
+            drive(args.port, image_bytes, min(20, args.requests), min(4, args.concurrency), 0)  # warm up
+            stats = drive(args.port, image_bytes, args.requests, args.concurrency, args.upload_ms)
+            stats.update(server=server, concurrency=args.concurrency, upload_ms=args.upload_ms,
+                         rss_mb=round(tree_rss_bytes(proc.pid) / 2**20, 1))
+            results.append(stats)
+            print(json.dumps(stats))
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Latency cost and accuracy gain of test-time augmentation vs a single view.
+
+Runs the app's preprocessing and inference backend in-process. For each
+view count it times preprocess + view generation + one batched forward
+pass, next to the same views scored with one forward pass each (what TTA
+would cost without batching). With --eval-dir (one subdirectory per class,
+like evaluate_model.py) it also reports accuracy, NLL and ECE of the
+averaged softmax for every view count.
+
+    python benchmarks/bench_tta.py --views 1 2 4 8
+    python benchmarks/bench_tta.py --views 1 4 8 --eval-dir dataset/Skin_Disease_Dataset/test --output tta.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("STARTUP_MODE", "manual")
+os.environ.setdefault("SAVE_UPLOADS", "false")
+
+import numpy as np
+
+from app import MODEL_PATH, preprocess_image_bytes
+from calibration import apply_temperature, expected_calibration_error, negative_log_likelihood
+from evaluate_model import list_labelled_images
+from inference_backends import create_backend_from_env
+from labels import load_labels, metadata_path_for
+from tta import MAX_VIEWS, average_views, make_views
+
+DEFAULT_IMAGE = os.path.join(ROOT, "static", "acne-pustular-60.jpeg")
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 2)
+
+
+def time_views(backend, image_bytes, views, repeats, resize_filter):
+    batched, looped = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        batch = make_views(preprocess_image_bytes(image_bytes, resize_filter)[0], views)
+        average_views(backend.predict(batch), views)
+        batched.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        batch = make_views(preprocess_image_bytes(image_bytes, resize_filter)[0], views)
+        average_views(np.concatenate([backend.predict(batch[i:i + 1]) for i in range(views)]), views)
+        looped.append(time.perf_counter() - started)
+    return {
+        "views": views,
+        "batched_p50_ms": percentile_ms(batched, 50),
+        "batched_p95_ms": percentile_ms(batched, 95),
+        "one_pass_per_view_p50_ms": percentile_ms(looped, 50),
+    }
+
+
+def score_folder(backend, root, samples, views, temperature, batch_images, resize_filter):
+    """Averaged softmax rows for every labelled image, batch_images images (x views) per forward pass"""
+    outputs = []
+    for start in range(0, len(samples), batch_images):
+        chunk = samples[start:start + batch_images]
+        batch = np.empty((len(chunk) * views, 224, 224, 3), dtype=np.float32)
+        for i, (path, _) in enumerate(chunk):
+            with open(os.path.join(root, path), "rb") as f:
+                make_views(preprocess_image_bytes(f.read(), resize_filter)[0], views, out=batch[i * views:(i + 1) * views])
+        outputs.append(average_views(backend.predict(batch), views))
+    return apply_temperature(np.concatenate(outputs), temperature)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--views", type=int, nargs="+", default=[1, 2, 4, MAX_VIEWS])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--eval-dir", help="labelled folder for the accuracy comparison")
+    parser.add_argument("--batch-images", type=int, default=8, help="images per forward pass on --eval-dir")
+    parser.add_argument("--output", help="write results as JSON here")
+    args = parser.parse_args()
+
+    backend = create_backend_from_env(args.model)
+    if backend is None:
+        sys.exit("❌ No model could be loaded")
+    label_set = load_labels(os.getenv("LABELS_PATH") or metadata_path_for(args.model))
+    label_set.validate(backend.num_classes)
+    views_list = sorted({max(1, min(v, MAX_VIEWS)) for v in args.views})
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    warm_up = preprocess_image_bytes(image_bytes, label_set.resize_filter)[0]
+    backend.predict(make_views(warm_up, max(views_list)))
+
+    results = {"backend": backend.name, "latency": [], "accuracy": []}
+    print(f"{'views':>5} {'batched p50':>12} {'batched p95':>12} {'1 pass/view p50':>16}")
+    for views in views_list:
+        row = time_views(backend, image_bytes, views, args.repeats, label_set.resize_filter)
+        results["latency"].append(row)
+        print(f"{views:>5} {row['batched_p50_ms']:>10} ms {row['batched_p95_ms']:>10} ms "
+              f"{row['one_pass_per_view_p50_ms']:>13} ms")
+
+    if args.eval_dir:
+        samples, _ = list_labelled_images(args.eval_dir, label_set.names)
+        labels = np.array([c for _, c in samples])
+        print(f"\n{len(samples)} labelled images in {args.eval_dir}")
+        print(f"{'views':>5} {'accuracy':>9} {'nll':>7} {'ece':>7}")
+        for views in views_list:
+            probabilities = score_folder(backend, args.eval_dir, samples, views, label_set.temperature,
+                                         args.batch_images, label_set.resize_filter)
+            row = {
+                "views": views,
+                "accuracy": round(float((probabilities.argmax(axis=1) == labels).mean()), 4),
+                "nll": round(negative_log_likelihood(probabilities, labels), 4),
+                "ece": round(expected_calibration_error(probabilities, labels), 4),
+            }
+            results["accuracy"].append(row)
+            print(f"{views:>5} {row['accuracy']:>9} {row['nll']:>7} {row['ece']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
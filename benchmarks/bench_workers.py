@@ -0,0 +1,139 @@
+"""Requests/sec and memory vs gunicorn worker count.
+
+Starts ``gunicorn -c gunicorn.conf.py app:app`` once per worker count, waits
+for /health/ready, drives /predict with a fixed client concurrency and
+records throughput plus the summed RSS of the whole process tree.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --serving-mode remote
+    python benchmarks/bench_workers.py --workers 1 2 4 --serving-mode local
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_IMAGE = os.path.join(ROOT, "static", "acne-pustular-60.jpeg")
+
+
+def multipart_body(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def tree_rss_bytes(pid):
+    """Sum VmRSS over a process and all of its descendants (Linux /proc)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except OSError:
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+def wait_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health/ready", timeout=2) as resp:
+                if resp.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def drive(base_url, image_bytes, requests, concurrency):
+    def one(_):
+        # Unique trailing bytes keep the prediction cache from short-circuiting inference
+        body, content_type = multipart_body("file", "bench.jpg", image_bytes + uuid.uuid4().bytes)
+        req = urllib.request.Request(f"{base_url}/predict", data=body, headers={"Content-Type": content_type})
+        started = time.perf_counter()
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "requests_per_sec": round(requests / elapsed, 2),
+        "p50_ms": round(1000 * latencies[len(latencies) // 2], 1),
+        "p99_ms": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--serving-mode", choices=["local", "remote"], default="remote")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--output", default="bench_workers.json")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = []
+    for workers in args.workers:
+        env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY=str(workers),
+                   SERVING_MODE=args.serving_mode, SAVE_UPLOADS="false", PREDICTION_CACHE_SIZE="0")
+        proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready(base_url, args.ready_timeout):
+                raise SystemExit(f"❌ Server with {workers} workers never became ready")
+            drive(base_url, image_bytes, min(20, args.requests), args.concurrency)  # warm every worker
+            stats = drive(base_url, image_bytes, args.requests, args.concurrency)
+            stats.update(workers=workers, serving_mode=args.serving_mode,
+                         rss_mb=round(tree_rss_bytes(proc.pid) / 2**20, 1))
+            results.append(stats)
+            print(json.dumps(stats))
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Local stand-in for a MongoDB server, for load tests without mongod.
+
+Speaks just enough of the wire protocol (OP_MSG, plus OP_QUERY for the
+handshake) for PyMongo to connect, create indexes, insert and read back
+documents. Everything is kept in memory, with optional per-command latency:
+
+    python benchmarks/fake_mongo.py --port 27099 --latency-ms 2
+    MONGO_URI=mongodb://127.0.0.1:27099/contactDB python app.py
+
+``find`` ignores its filter and sorts newest first by ``created_at``. That
+is enough for /contact and the first page of /messages, not for general use.
+"""
+import argparse
+import socketserver
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+import bson
+
+OP_REPLY, OP_QUERY, OP_MSG = 1, 2004, 2013
+HEADER = struct.Struct("<iiii")  # messageLength, requestID, responseTo, opCode
+
+
+def read_cstring(data, offset):
+    end = data.index(b"\x00", offset)
+    return data[offset:end].decode(), end + 1
+
+
+class FakeMongoHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self._count("connections")
+
+    def handle(self):
+        while True:
+            header = self._read(HEADER.size)
+            if header is None:
+                return
+            length, request_id, _, op_code = HEADER.unpack(header)
+            body = self._read(length - HEADER.size)
+            if body is None:
+                return
+            if op_code == OP_MSG:
+                reply = self._reply_msg(request_id, self._command(self._parse_msg(body)))
+            elif op_code == OP_QUERY:
+                reply = self._reply_query(request_id, self._command(self._parse_query(body)))
+            else:
+                return
+            self.request.sendall(reply)
+
+    def _read(self, n):
+        chunks = b""
+        while len(chunks) < n:
+            chunk = self.request.recv(n - len(chunks))
+            if not chunk:
+                return None
+            chunks += chunk
+        return chunks
+
+    def _parse_msg(self, body):
+        """Merge the body section and any document sequences (e.g. insert's ``documents``) into one command"""
+        offset, command = 4, {}
+        while offset < len(body):
+            kind = body[offset]
+            offset += 1
+            if kind == 0:
+                size = struct.unpack_from("<i", body, offset)[0]
+                command.update(bson.decode(body[offset:offset + size]))
+                offset += size
+            elif kind == 1:
+                size = struct.unpack_from("<i", body, offset)[0]
+                end = offset + size
+                identifier, offset = read_cstring(body, offset + 4)
+                command[identifier] = bson.decode_all(body[offset:end])
+                offset = end
+            else:
+                break  # checksum
+        return command
+
+    def _parse_query(self, body):
+        _, offset = read_cstring(body, 4)  # flags, fullCollectionName
+        offset += 8  # numberToSkip, numberToReturn
+        size = struct.unpack_from("<i", body, offset)[0]
+        return bson.decode(body[offset:offset + size])
+
+    def _reply_msg(self, request_id, document):
+        payload = struct.pack("<iB", 0, 0) + bson.encode(document)
+        return HEADER.pack(HEADER.size + len(payload), 0, request_id, OP_MSG) + payload
+
+    def _reply_query(self, request_id, document):
+        payload = struct.pack("<iqii", 0, 0, 0, 1) + bson.encode(document)
+        return HEADER.pack(HEADER.size + len(payload), 0, request_id, OP_REPLY) + payload
+
+    def _command(self, command):
+        name = next(iter(command)).lower()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self._count(name)
+        if name in ("hello", "ismaster"):
+            return {
+                "ismaster": True, "isWritablePrimary": True, "helloOk": True,
+                "maxBsonObjectSize": 16 * 2**20, "maxMessageSizeBytes": 48 * 10**6, "maxWriteBatchSize": 100000,
+                "localTime": datetime.now(timezone.utc), "logicalSessionTimeoutMinutes": 30,
+                "connectionId": 1, "minWireVersion": 0, "maxWireVersion": 17, "ok": 1.0,
+            }
+        if name == "insert":
+            documents = command.get("documents", [])
+            with self.server.lock:
+                self.server.collections.setdefault(command["insert"], []).extend(documents)
+            return {"n": len(documents), "ok": 1.0}
+        if name == "find":
+            with self.server.lock:
+                documents = list(self.server.collections.get(command["find"], []))
+            documents.sort(key=lambda d: d.get("created_at") or datetime.min, reverse=True)
+            limit = command.get("limit") or len(documents)
+            namespace = f"{command.get('$db', 'test')}.{command['find']}"
+            return {"cursor": {"id": 0, "ns": namespace, "firstBatch": documents[:limit]}, "ok": 1.0}
+        if name == "count":
+            with self.server.lock:
+                return {"n": len(self.server.collections.get(command["count"], [])), "ok": 1.0}
+        # ping, createIndexes, endSessions, killCursors, ... all succeed
+        return {"ok": 1.0}
+
+    def _count(self, key):
+        with self.server.lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+
+class FakeMongoServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(host="127.0.0.1", port=27099, latency_ms=0):
+    server = FakeMongoServer((host, port), FakeMongoHandler)
+    server.latency = latency_ms / 1000
+    server.lock = threading.Lock()
+    server.collections = {}
+    server.stats = {}
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=27099)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before every command reply")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms)
+    print(f"Fake MongoDB listening on mongodb://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
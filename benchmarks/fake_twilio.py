@@ -0,0 +1,122 @@
+"""Local stand-in for the Twilio Messages API.
+
+Accepts ``POST /2010-04-01/Accounts/<sid>/Messages.json`` and answers like
+Twilio does, with configurable latency and failure rates, so the SMS queue
+can be exercised without real credentials:
+
+    python benchmarks/fake_twilio.py --port 8099 --latency-ms 800 --error-rate 0.2
+    TWILIO_API_BASE=http://127.0.0.1:8099 TWILIO_SID=ACfake python app.py
+
+``GET /stats`` reports how many messages were accepted or failed. Tests can
+script exact answers by appending ``(status, payload, headers)`` tuples to
+``server.scripted``; each send consumes the oldest one before the normal
+handling applies.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+UNVERIFIED_PREFIX = "+999"  # numbers starting with this are rejected as unverified
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible in /stats
+
+    def setup(self):
+        super().setup()
+        self._count("connections")  # one handler instance per TCP connection
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.lock:
+                self._reply(200, dict(self.server.stats))
+        else:
+            self._reply(404, {"message": "Not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if not self.path.endswith("/Messages.json"):
+            self._reply(404, {"code": 20404, "message": "The requested resource was not found"})
+            return
+        if self.headers.get("Authorization") is None:
+            self._reply(401, {"code": 20003, "message": "Authenticate"})
+            return
+
+        time.sleep(self.server.latency)
+        self._count("requests")
+
+        to = form.get("To", [""])[0]
+        with self.server.lock:
+            scripted = self.server.scripted.popleft() if self.server.scripted else None
+        if scripted:
+            status, payload, headers = scripted
+            self._count("accepted" if status < 300 else "scripted_errors")
+            self._reply(status, payload, headers)
+        elif to.startswith(UNVERIFIED_PREFIX):
+            self._count("rejected")
+            self._reply(400, {"code": 21608, "message": f"The number {to} is unverified."})
+        elif random.random() < self.server.error_rate:
+            self._count("throttled")
+            self._reply(429, {"code": 20429, "message": "Too Many Requests"}, {"Retry-After": "1"})
+        else:
+            self._count("accepted")
+            self._reply(201, {
+                "sid": "SM" + uuid.uuid4().hex,
+                "status": "queued",
+                "to": to,
+                "from": form.get("From", [""])[0],
+                "body": form.get("Body", [""])[0],
+            })
+
+    def _count(self, key):
+        with self.server.lock:
+            self.server.stats[key] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8099, latency_ms=300, error_rate=0.0):
+    server = ThreadingHTTPServer((host, port), FakeTwilioHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.error_rate = error_rate
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "connections": 0, "accepted": 0, "throttled": 0, "rejected": 0,
+                    "scripted_errors": 0}
+    server.scripted = deque()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300, help="delay before every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of sends answered with 429")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.error_rate)
+    print(f"Fake Twilio listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Reproducible benchmark suite for the serving stack, with regression checks.
+
+Microbenchmarks (in-process):
+  * preprocess_image on the sample photos and synthetic phone-sized JPEGs
+  * inference per backend (keras, plus tflite/onnx when exported) and batch size
+  * result building + JSON serialization
+
+Load tests (a real server: gunicorn app:app, or uvicorn asgi:app, which needs
+requirements-asgi.txt):
+  * POST /predict
+  * POST /send_sms against benchmarks/fake_twilio.py
+  * POST /contact against benchmarks/fake_mongo.py
+  each at every --concurrency, reporting throughput, p50/p95/p99 latency,
+  errors and the server's peak RSS.
+
+Runs on a CPU-only machine. When the checkpoint is missing, a MobileNetV2
+with random weights (same architecture, 24 classes) is built once under
+.cache/bench, so timings stay representative without the real model.
+
+    python benchmarks/run_suite.py --output bench_results.json
+    python benchmarks/run_suite.py --baseline bench_results.json --tolerance 0.15   # exit 1 on regression
+    python benchmarks/run_suite.py --skip-load --batch-sizes 1 8 32 --backends keras tflite
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench_workers import ROOT, multipart_body, tree_rss_bytes, wait_ready
+
+BENCH_DIR = os.path.join(ROOT, ".cache", "bench")
+SAMPLE_IMAGES = [os.path.join(ROOT, "static", name) for name in ("acne-pustular-60.jpeg", "acne-open-comedo-30.jpeg")]
+# (name, width, height) of generated JPEG fixtures: a typical upload and a full-resolution phone photo
+SYNTHETIC_IMAGES = [("upload_1024x768", 1024, 768), ("phone_4032x3024", 4032, 3024)]
+SERVERS = {
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "uvicorn": [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--log-level", "warning"],
+}
+# Metrics where a larger value is better; every other numeric metric is "lower is better"
+HIGHER_IS_BETTER = ("requests_per_sec", "images_per_sec")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def summarize(seconds):
+    """p50/p95/p99 in milliseconds of a list of durations"""
+    ms = np.asarray(seconds) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(ms, q)), 3) for q in (50, 95, 99)}
+
+
+def timed(fn, repeats, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# --- fixtures ---------------------------------------------------------------
+
+def ensure_model(model_path):
+    """The checkpoint to benchmark; a random-weight stand-in is built when it does not exist"""
+    from labels import build_metadata, load_labels, metadata_path_for, write_metadata
+
+    if os.path.exists(model_path):
+        return model_path, False
+    synthetic = os.path.join(BENCH_DIR, "synthetic_mobilenetv2.h5")
+    if not os.path.exists(synthetic):
+        import tensorflow as tf
+        from tensorflow.keras import layers
+
+        source = load_labels(os.path.join(ROOT, "model_checkpoint.labels.json"))
+        print(f"🧪 {model_path} not found; building a random-weight MobileNetV2 at {synthetic}")
+        tf.keras.utils.set_random_seed(0)
+        model = tf.keras.Sequential([
+            tf.keras.applications.MobileNetV2(weights=None, include_top=False, input_shape=(224, 224, 3)),
+            layers.GlobalAveragePooling2D(),
+            layers.Dropout(0.3),
+            layers.Dense(1024, activation="relu"),
+            layers.Dense(source.num_classes, activation="softmax"),
+        ])
+        model.build((None, 224, 224, 3))
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        model.save(synthetic)
+        write_metadata(metadata_path_for(synthetic),
+                       build_metadata(source.names, source.disease_info, synthetic))
+    return synthetic, True
+
+
+def fixture_images():
+    """{name: jpeg bytes}: the two samples in static/ plus generated noise photos of phone sizes"""
+    from PIL import Image
+
+    images = {}
+    for path in SAMPLE_IMAGES:
+        with open(path, "rb") as f:
+            images[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    rng = np.random.default_rng(0)
+    for name, width, height in SYNTHETIC_IMAGES:
+        path = os.path.join(BENCH_DIR, f"{name}.jpg")
+        if not os.path.exists(path):
+            os.makedirs(BENCH_DIR, exist_ok=True)
+            # Smooth noise compresses like a photo rather than like static
+            small = rng.integers(0, 256, (height // 32, width // 32, 3), dtype=np.uint8)
+            Image.fromarray(small).resize((width, height), Image.BICUBIC).save(path, quality=90)
+        with open(path, "rb") as f:
+            images[name] = f.read()
+    return images
+
+
+# --- microbenchmarks ----------------------------------------------------------
+
+def micro_benchmarks(args, model_path, images):
+    import app
+    from inference_backends import create_backend, load_model_safely
+    from labels import load_labels, metadata_path_for
+
+    results = {}
+    for name, data in images.items():
+        path = os.path.join(BENCH_DIR, f"preprocess_{name}.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+        results[f"preprocess/{name}"] = summarize(timed(lambda: app.preprocess_image(path), args.repeats))
+        print(f"🖼️ preprocess {name}: {results[f'preprocess/{name}']['p50_ms']} ms")
+
+    rng = np.random.default_rng(0)
+    keras_model = None
+    for backend_name in args.backends:
+        def keras_loader():
+            nonlocal keras_model
+            keras_model = keras_model or load_model_safely(model_path)
+            return keras_model
+
+        backend = create_backend(backend_name, keras_loader,
+                                 tflite_path=os.getenv("TFLITE_MODEL_PATH", "model.tflite"),
+                                 onnx_path=os.getenv("ONNX_MODEL_PATH", "model.onnx"))
+        if backend is None or backend.name != backend_name:
+            print(f"⚠️ {backend_name} backend unavailable (export it with export_model.py); skipped")
+            continue
+        for batch_size in args.batch_sizes:
+            batch = rng.random((batch_size, 224, 224, 3), dtype=np.float32)
+            stats = summarize(timed(lambda: backend.predict(batch), args.repeats))
+            stats["images_per_sec"] = round(batch_size / (stats["p50_ms"] / 1000), 1)
+            results[f"inference/{backend_name}/batch_{batch_size}"] = stats
+            print(f"🧠 {backend_name} batch {batch_size}: {stats['p50_ms']} ms ({stats['images_per_sec']} img/s)")
+
+    label_set = load_labels(metadata_path_for(model_path))
+    for batch_size in (1, 64):
+        probabilities = rng.dirichlet(np.ones(label_set.num_classes), size=batch_size).astype(np.float32)
+        stats = summarize(timed(lambda: json.dumps(app.build_results(probabilities, label_set)), args.repeats))
+        results[f"serialize/batch_{batch_size}"] = stats
+        print(f"📦 build_results + json.dumps, batch {batch_size}: {stats['p50_ms']} ms")
+    return results
+
+
+# --- load tests ---------------------------------------------------------------
+
+class RssSampler:
+    """Peak RSS of a process tree, sampled every ``interval`` seconds"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss_bytes(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def predict_request(images):
+    payloads = list(images.values())
+
+    def make(i):
+        # Unique trailing bytes keep the prediction cache from short-circuiting inference
+        body, content_type = multipart_body("file", "bench.jpg", payloads[i % len(payloads)] + uuid.uuid4().bytes)
+        return "/predict", body, content_type
+    return make
+
+
+def sms_request(i):
+    body = json.dumps({"phone": "+15005550006", "class_id": i % 24}).encode()
+    return "/send_sms", body, "application/json"
+
+
+def contact_request(i):
+    body = urllib.parse.urlencode({"name": f"Bench {i}", "email": "bench@example.com",
+                                   "message": "Load test message."}).encode()
+    return "/contact", body, "application/x-www-form-urlencoded"
+
+
+def drive(base_url, make_request, requests, concurrency, pid):
+    def one(i):
+        path, body, content_type = make_request(i)
+        req = urllib.request.Request(base_url + path, data=body, headers={"Content-Type": content_type})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                resp.read()
+                ok = resp.status < 300
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return ok, time.perf_counter() - started
+
+    with RssSampler(pid) as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+    latencies = [seconds for ok, seconds in outcomes if ok]
+    stats = summarize(latencies) if latencies else {}
+    stats.update(
+        requests_per_sec=round(len(latencies) / elapsed, 2),
+        errors=sum(1 for ok, _ in outcomes if not ok),
+        peak_rss_mb=round(rss.peak / 2**20, 1),
+    )
+    return stats
+
+
+def start(command, env=None, cwd=ROOT):
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def load_tests(args, environ, model_path, synthetic, images):
+    bench = os.path.dirname(os.path.abspath(__file__))
+    twilio_port, mongo_port, port = free_port(), free_port(), free_port()
+    helpers = [
+        start([sys.executable, os.path.join(bench, "fake_twilio.py"), "--port", str(twilio_port),
+               "--latency-ms", str(args.twilio_latency_ms)]),
+        start([sys.executable, os.path.join(bench, "fake_mongo.py"), "--port", str(mongo_port)]),
+    ]
+    env = dict(
+        environ,
+        PORT=str(port),
+        MODEL_PATH=model_path,
+        LABELS_PATH="",
+        SAVE_UPLOADS="false",
+        PREDICTION_CACHE_SIZE="0",
+        MODEL_RELOAD_INTERVAL="0",
+        TWILIO_API_BASE=f"http://127.0.0.1:{twilio_port}",
+        TWILIO_SID="ACbenchmark",
+        TWILIO_AUTH_TOKEN="benchmark",
+        TWILIO_PHONE_NUMBER="+15005550006",
+        MONGO_URI=f"mongodb://127.0.0.1:{mongo_port}/contactDB",
+        SMS_RATE_PER_SEC="1000",
+    )
+    if synthetic:
+        env["GOLDEN_SET_PATH"] = ""  # random weights cannot pass the golden-image check
+    command = SERVERS[args.server] + (["--port", str(port)] if args.server == "uvicorn" else [])
+    server = start(command, env)
+    base_url = f"http://127.0.0.1:{port}"
+
+    results = {}
+    try:
+        if not wait_ready(base_url, args.ready_timeout):
+            raise SystemExit(f"❌ {args.server} never became ready")
+        endpoints = [("predict", predict_request(images)), ("send_sms", sms_request), ("contact", contact_request)]
+        for name, make_request in endpoints:
+            drive(base_url, make_request, min(10, args.requests), 2, server.pid)  # warm up
+            for concurrency in args.concurrency:
+                stats = drive(base_url, make_request, args.requests, concurrency, server.pid)
+                results[f"load/{args.server}/{name}/c{concurrency}"] = stats
+                print(f"🚀 {name} x{concurrency}: {stats['requests_per_sec']} req/s, "
+                      f"p50 {stats.get('p50_ms')} ms, p99 {stats.get('p99_ms')} ms, "
+                      f"{stats['errors']} errors, peak RSS {stats['peak_rss_mb']} MB")
+    finally:
+        stop(server)
+        for helper in helpers:
+            stop(helper)
+    return results
+
+
+# --- regression check -----------------------------------------------------------
+
+def compare(baseline, current, tolerance):
+    """Rows of (benchmark, metric, before, after, change) and whether any got worse than ``tolerance``"""
+    rows, regressed = [], False
+    for name, after_metrics in current.items():
+        before_metrics = baseline.get(name)
+        if not before_metrics:
+            continue
+        for metric, after in after_metrics.items():
+            before = before_metrics.get(metric)
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                continue
+            if metric == "errors":
+                worse = after > before
+                change = after - before
+            elif before == 0:
+                continue
+            else:
+                change = (after - before) / before
+                worse = change < -tolerance if metric in HIGHER_IS_BETTER else change > tolerance
+            regressed |= worse
+            rows.append((name, metric, before, after, change, worse))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "model_checkpoint.h5"),
+                        help="checkpoint to benchmark (a random-weight stand-in is built if it is missing)")
+    parser.add_argument("--backends", nargs="+", default=["keras"], choices=["keras", "tflite", "onnx"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per microbenchmark")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="gunicorn")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per load test")
+    parser.add_argument("--twilio-latency-ms", type=float, default=300)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    model_path, synthetic = ensure_model(os.path.abspath(args.model))
+    server_environ = dict(os.environ)
+    # The in-process app is only used for its functions; it must not warm up a model of its own
+    os.environ.update(STARTUP_MODE="manual", SAVE_UPLOADS="false", MODEL_PATH=model_path)
+    images = fixture_images()
+
+    results = {}
+    if not args.skip_micro:
+        results.update(micro_benchmarks(args, model_path, images))
+    if not args.skip_load:
+        results.update(load_tests(args, server_environ, model_path, synthetic, images))
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "model": os.path.relpath(model_path, ROOT),
+            "synthetic_model": synthetic,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        rows, regressed = compare(baseline, results, args.tolerance)
+        for name, metric, before, after, change, worse in rows:
+            delta = f"{change:+d}" if metric == "errors" else f"{change:+.1%}"
+            print(f"{'❌' if worse else '  '} {name:<40} {metric:<16} {before:>10} -> {after:<10} {delta}")
+        if regressed:
+            sys.exit(f"❌ Regression beyond {args.tolerance:.0%} against {args.baseline}")
+        print(f"✅ No regression beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Fingerprint and precompress the static assets the pages use.
+
+Examples:
+    python build_static.py
+    python build_static.py --output build/static --clean
+
+Every file under static/ that a served page references (``static/...`` URLs
+in templates/ and the contact page) is copied to
+``<name>.<content hash>.<ext>`` in the output directory, with .gz/.br
+siblings for text assets when they are smaller. manifest.json maps
+each logical path (``images/D.png``) to its fingerprinted file; the app
+serves those under /assets/ with immutable caching and rewrites the pages'
+``static/...`` URLs to them. Old fingerprinted files are kept unless
+--clean is given, so pages still cached by browsers keep working across a
+deploy.
+"""
+import argparse
+import json
+import mimetypes
+import os
+
+from precompressed import PrecompressedAsset, content_hash
+from static_assets import MANIFEST_NAME, MANIFEST_SCHEMA, STATIC_URL, VARIANT_SUFFIXES
+
+SOURCE_DIR = "static"
+SKIP_DIRS = ("uploads",)
+# What app.py serves through serve_page(): assets nothing here references are not built
+PAGES = ("templates", "contact-us/public/index.html")
+# Already-compressed formats (images, video) gain nothing from gzip/brotli
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def page_files(pages=PAGES):
+    for page in pages:
+        if os.path.isfile(page):
+            yield page
+        for root, dirs, files in os.walk(page):
+            dirs.sort()
+            yield from (os.path.join(root, name) for name in sorted(files) if name.endswith(".html"))
+
+
+def referenced_assets(pages=PAGES):
+    """Logical paths (``images/D.png``) of the static/... URLs in the served pages"""
+    logical = set()
+    for path in page_files(pages):
+        with open(path, encoding="utf-8") as f:
+            logical.update(STATIC_URL.findall(f.read()))
+    return logical
+
+
+def list_sources(source_dir=SOURCE_DIR, pages=PAGES):
+    """(repo path, logical path) pairs for every referenced asset to build"""
+    sources = []
+    for logical in sorted(referenced_assets(pages)):
+        path = os.path.join(source_dir, *logical.split("/"))
+        if logical.split("/")[0] in SKIP_DIRS or not os.path.isfile(path):
+            continue  # uploads are served by /uploads/, missing files keep their original URL
+        sources.append((path, logical))
+    return sources
+
+
+def fingerprinted_name(logical, digest):
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{digest}{ext}"
+
+
+def build_asset(path, logical, output_dir):
+    """Write one fingerprinted asset (plus compressed variants) and return its manifest entry"""
+    with open(path, "rb") as f:
+        data = f.read()
+    content_type = mimetypes.guess_type(logical)[0] or "application/octet-stream"
+    digest = content_hash(data)
+    target = fingerprinted_name(logical, digest)
+    variants = {}
+    if content_type.startswith(COMPRESSIBLE_TYPES):
+        variants = PrecompressedAsset(data, content_type).variants
+
+    files = {target: data}
+    files.update({target + VARIANT_SUFFIXES[name]: body for name, body in variants.items()})
+    for name, body in files.items():
+        out_path = os.path.join(output_dir, name)
+        if os.path.exists(out_path):
+            continue  # same name means same content
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = f"{out_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, out_path)
+
+    return {
+        "path": target,
+        "hash": digest,
+        "content_type": content_type,
+        "size": len(data),
+        "encodings": sorted(variants),
+    }
+
+
+def build(output_dir, clean=False):
+    assets = {logical: build_asset(path, logical, output_dir) for path, logical in list_sources()}
+    manifest = {"schema": MANIFEST_SCHEMA, "assets": assets}
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, manifest_path)
+
+    if clean:
+        keep = {MANIFEST_NAME}
+        for entry in assets.values():
+            keep.add(entry["path"])
+            keep.update(entry["path"] + VARIANT_SUFFIXES[name] for name in entry["encodings"])
+        for root, _, files in os.walk(output_dir):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, "/")
+                if rel not in keep:
+                    os.remove(os.path.join(root, name))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.getenv("STATIC_BUILD_DIR", "build/static"),
+                        help="Output directory (default: STATIC_BUILD_DIR or build/static)")
+    parser.add_argument("--clean", action="store_true", help="Remove fingerprinted files no longer in the manifest")
+    args = parser.parse_args()
+
+    manifest = build(args.output, clean=args.clean)
+    total = sum(entry["size"] for entry in manifest["assets"].values())
+    print(f"✅ Built {len(manifest['assets'])} assets ({total / 2**20:.1f} MB) into {args.output}")
+    for logical, entry in sorted(manifest["assets"].items()):
+        encodings = ", ".join(entry["encodings"]) or "identity"
+        print(f"   {logical} -> {entry['path']} ({encodings})")
+
+
+if __name__ == "__main__":
+    main()
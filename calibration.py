@@ -0,0 +1,106 @@
+"""Post-processing and calibration of softmax outputs.
+
+All functions take a (batch, num_classes) probability matrix and work on
+the whole batch at once.
+"""
+import numpy as np
+
+EPSILON = 1e-7
+
+
+def apply_temperature(probabilities, temperature=1.0):
+    """Temperature-scaled softmax; log-probabilities stand in for the logits (same up to a constant)"""
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    if temperature == 1.0:
+        return probabilities
+    scaled = np.log(np.clip(probabilities, EPSILON, 1.0)) / temperature
+    scaled -= scaled.max(axis=1, keepdims=True)
+    np.exp(scaled, out=scaled)
+    scaled /= scaled.sum(axis=1, keepdims=True)
+    return scaled
+
+
+def top_k(probabilities, k):
+    """(indices, probabilities) of the k most likely classes per row, most likely first"""
+    k = max(1, min(k, probabilities.shape[1]))
+    if k == probabilities.shape[1]:
+        indices = np.argsort(-probabilities, axis=1)
+    else:
+        indices = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(probabilities, indices, axis=1), axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+    return indices, np.take_along_axis(probabilities, indices, axis=1)
+
+
+def negative_log_likelihood(probabilities, labels):
+    picked = probabilities[np.arange(len(labels)), labels]
+    return float(-np.log(np.clip(picked, EPSILON, 1.0)).mean())
+
+
+def fit_temperature(probabilities, labels, low=0.05, high=20.0, iterations=60):
+    """Temperature minimising NLL on held-out data (golden-section search over log T)"""
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = np.log(low), np.log(high)
+
+    def loss(log_t):
+        return negative_log_likelihood(apply_temperature(probabilities, float(np.exp(log_t))), labels)
+
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    loss_c, loss_d = loss(c), loss(d)
+    for _ in range(iterations):
+        if loss_c < loss_d:
+            b, d, loss_d = d, c, loss_c
+            c = b - ratio * (b - a)
+            loss_c = loss(c)
+        else:
+            a, c, loss_c = c, d, loss_d
+            d = a + ratio * (b - a)
+            loss_d = loss(d)
+    return float(np.exp((a + b) / 2))
+
+
+def expected_calibration_error(probabilities, labels, bins=15):
+    """Mean |accuracy - confidence| over equal-width confidence bins, weighted by bin size"""
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    bin_index = np.clip(np.digitize(confidence, edges[1:-1]), 0, bins - 1)
+    counts = np.bincount(bin_index, minlength=bins)
+    accuracy = np.bincount(bin_index, weights=correct, minlength=bins)
+    mean_confidence = np.bincount(bin_index, weights=confidence, minlength=bins)
+    filled = counts > 0
+    gap = np.abs(accuracy[filled] - mean_confidence[filled])  # both are sums; divide once below
+    return float(gap.sum() / len(labels))
+
+
+def per_class_report(probabilities, labels, names):
+    """Support, accuracy (recall), precision and mean confidence for every class"""
+    predicted = probabilities.argmax(axis=1)
+    confidence = probabilities.max(axis=1)
+    report = {}
+    for index, name in enumerate(names):
+        actual = labels == index
+        chosen = predicted == index
+        hits = int((actual & chosen).sum())
+        report[name] = {
+            "support": int(actual.sum()),
+            "accuracy": round(hits / actual.sum(), 4) if actual.any() else None,
+            "precision": round(hits / chosen.sum(), 4) if chosen.any() else None,
+            "mean_confidence": round(float(confidence[actual].mean()), 4) if actual.any() else None,
+        }
+    return report
+
+
+def abstention_curve(probabilities, labels, thresholds):
+    """Coverage and accuracy of the answered predictions when abstaining below each threshold (0-1)"""
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    curve = []
+    for threshold in thresholds:
+        answered = confidence >= threshold
+        curve.append({
+            "threshold": round(float(threshold), 3),
+            "coverage": round(float(answered.mean()), 4),
+            "accuracy": round(float(correct[answered].mean()), 4) if answered.any() else None,
+        })
+    return curve
@@ -1,29 +1,69 @@
-import tensorflow as tf
-import numpy as np
+"""Check that the model's output layer and its label artifact agree.
+
+Reads the architecture stored in the model file (the HDF5 ``model_config``
+attribute, or ``config.json`` inside a .keras archive) instead of loading
+the network, so it runs in well under a second and without TensorFlow.
+
+    python check_labels.py [model_checkpoint.h5] [--labels model_checkpoint.labels.json]
+"""
+import argparse
+import json
+import sys
+import zipfile
+
+from labels import load_labels, metadata_path_for
 
-# Load the trained model
 MODEL_PATH = "model_checkpoint.h5"
-model = tf.keras.models.load_model(MODEL_PATH)
-
-# Manually defined class names (Ensure it matches your dataset)
-CLASS_NAMES = [
-    "Acne", "Actinic Keratosis", "Benign Tumors", "Bullous", "Candidiasis", "Drug Eruption", "Eczema",
-    "Infestations Bites", "Lichen", "Lupus", "Moles", "Psoriasis", "Rosacea", "Seborrh Keratoses",
-    "Skin Cancer", "Sunlight Damage", "Tinea", "Unknown or No Disease", "Vascular Tumors", "Vasculitis",
-    "Vitiligo", "Warts", "Melanoma", "Hives (Urticaria)"
-]
-
-# Ensure the model's last layer has the correct number of classes
-num_classes_in_model = model.layers[-1].output_shape[-1]
-num_classes_in_list = len(CLASS_NAMES)
-
-if num_classes_in_model == num_classes_in_list:
-    print(f"✅ The number of classes in the model ({num_classes_in_model}) matches CLASS_NAMES ({num_classes_in_list})!\n")
-    
-    # Print index mapping
+
+
+def read_model_config(model_path):
+    if zipfile.is_zipfile(model_path):
+        with zipfile.ZipFile(model_path) as archive:
+            return json.loads(archive.read("config.json"))
+    import h5py
+
+    with h5py.File(model_path, "r") as f:
+        config = f.attrs["model_config"]
+    return json.loads(config.decode() if isinstance(config, bytes) else config)
+
+
+def output_units(config):
+    """Width of the last Dense layer in a (possibly nested) Keras model config"""
+    layers = config.get("config", {}).get("layers", [])
+    for layer in reversed(layers):
+        if layer.get("class_name") == "Dense":
+            return layer["config"]["units"]
+        if layer.get("config", {}).get("layers"):
+            units = output_units(layer)
+            if units is not None:
+                return units
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", nargs="?", default=MODEL_PATH)
+    parser.add_argument("--labels", help="label artifact (default: next to the model)")
+    args = parser.parse_args()
+
+    labels_path = args.labels or metadata_path_for(args.model)
+    label_set = load_labels(labels_path)
+    num_classes_in_model = output_units(read_model_config(args.model))
+    if num_classes_in_model is None:
+        sys.exit(f"❌ Could not find a Dense output layer in {args.model}")
+
+    try:
+        label_set.validate(num_classes_in_model)
+    except ValueError as e:
+        sys.exit(f"❌ Mismatch! {e}")
+
+    print(f"✅ The number of classes in the model ({num_classes_in_model}) matches {labels_path} "
+          f"(labels version {label_set.version})!\n")
     print("✅ Label-to-Disease Mapping from the Model:")
-    for i, label in enumerate(CLASS_NAMES):
-        print(f"Index {i}: {label}")
+    for i, label in enumerate(label_set.names):
+        missing = "" if label in label_set.disease_info else "  ⚠️ no disease_info"
+        print(f"Index {i}: {label}{missing}")
+
 
-else:
-    print(f"❌ Mismatch! Model has {num_classes_in_model} classes, but CLASS_NAMES has {num_classes_in_list} classes.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Evaluate the served model on a labelled image folder and fit its calibration.
+
+The folder holds one subdirectory per class, named like the labels in the
+label artifact (e.g. dataset/Skin_Disease_Dataset/test). Images are
+scored in large batches through the app's preprocessing and inference
+backend. The report covers overall and per-class accuracy, NLL and
+expected calibration error before and after temperature scaling, and the
+coverage/accuracy trade-off for a range of abstention thresholds, so
+ABSTAIN_THRESHOLD can be picked from data.
+
+The temperature is fitted on one part of the folder and every reported
+number (summary, per-class, abstention curve) is measured on the rest
+(--fit-fraction). --write-calibration
+stores it in the label artifact, where the server picks it up.
+
+    python evaluate_model.py dataset/Skin_Disease_Dataset/test --report eval_report.json
+    python evaluate_model.py dataset/Skin_Disease_Dataset/test --write-calibration
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("STARTUP_MODE", "manual")  # load the model here, not at app import
+os.environ.setdefault("SAVE_UPLOADS", "false")
+
+import numpy as np
+
+from app import IMAGE_EXTENSIONS, MODEL_PATH
+from calibration import (abstention_curve, apply_temperature, expected_calibration_error,
+                         fit_temperature, negative_log_likelihood, per_class_report)
+from inference_backends import create_backend_from_env
+from labels import load_labels, metadata_path_for, write_metadata
+from score_images import decode_batch
+
+
+def list_labelled_images(root, names):
+    """(relative path, class index) for every image in a subdirectory named after a known label"""
+    index = {name: i for i, name in enumerate(names)}
+    samples, unknown = [], []
+    for directory in sorted(os.listdir(root)):
+        if not os.path.isdir(os.path.join(root, directory)):
+            continue
+        if directory not in index:
+            unknown.append(directory)
+            continue
+        for name in sorted(os.listdir(os.path.join(root, directory))):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(directory, name), index[directory]))
+    return samples, unknown
+
+
+def predict_all(backend, root, paths, batch_size, workers, resize_filter):
+    """Softmax rows for every path (NaN rows for images that failed to decode)"""
+    outputs = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(paths), batch_size):
+            _, batch, errors = decode_batch(pool, root, paths[start:start + batch_size], resize_filter)
+            ok = [i for i, error in enumerate(errors) if error is None]
+            rows = np.full((len(errors), backend.num_classes), np.nan, dtype=np.float32)
+            if ok:
+                rows[ok] = backend.predict(batch[ok])
+            outputs.append(rows)
+            print(f"⚡ {start + len(errors)}/{len(paths)} images", flush=True)
+    return np.concatenate(outputs)
+
+
+def summary(probabilities, labels):
+    return {
+        "images": int(len(labels)),
+        "accuracy": round(float((probabilities.argmax(axis=1) == labels).mean()), 4),
+        "nll": round(negative_log_likelihood(probabilities, labels), 4),
+        "ece": round(expected_calibration_error(probabilities, labels), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("eval_dir", help="folder with one subdirectory per class")
+    parser.add_argument("--model", default=MODEL_PATH, help="Keras checkpoint (INFERENCE_BACKEND selects tflite/onnx)")
+    parser.add_argument("--labels", help="label artifact (default: next to the model)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="decode threads")
+    parser.add_argument("--fit-fraction", type=float, default=0.5,
+                        help="share of images used to fit the temperature; the rest measure it")
+    parser.add_argument("--write-calibration", action="store_true", help="store the fitted temperature in the label artifact")
+    parser.add_argument("--report", help="write the full report as JSON here")
+    args = parser.parse_args()
+
+    labels_path = args.labels or os.getenv("LABELS_PATH") or metadata_path_for(args.model)
+    label_set = load_labels(labels_path)
+    samples, unknown = list_labelled_images(args.eval_dir, label_set.names)
+    if unknown:
+        print(f"⚠️ Skipping folders that match no label: {', '.join(unknown)}")
+    if not samples:
+        sys.exit(f"❌ No labelled images found in {args.eval_dir}")
+
+    backend = create_backend_from_env(args.model, labels_path=labels_path)
+    if backend is None:
+        sys.exit("❌ No model could be loaded")
+    label_set.validate(backend.num_classes)
+
+    started = time.perf_counter()
+    probabilities = predict_all(backend, args.eval_dir, [p for p, _ in samples], args.batch_size, args.workers,
+                                label_set.resize_filter)
+    elapsed = time.perf_counter() - started
+    labels = np.array([c for _, c in samples])
+    decoded = ~np.isnan(probabilities).any(axis=1)
+    probabilities, labels = probabilities[decoded], labels[decoded]
+
+    # Fixed shuffle so reruns fit on the same split
+    order = np.random.default_rng(0).permutation(len(labels))
+    split = int(len(labels) * args.fit_fraction)
+    fit, held_out = order[:split], order[split:]
+    if not len(fit) or not len(held_out):
+        fit = held_out = order
+    temperature = fit_temperature(probabilities[fit], labels[fit])
+    # Every reported metric comes from images the temperature was not fitted on
+    calibrated = apply_temperature(probabilities[held_out], temperature)
+    held_out_labels = labels[held_out]
+
+    report = {
+        "model": args.model,
+        "backend": backend.name,
+        "labels_version": label_set.version,
+        "images_per_sec": round(len(samples) / elapsed, 1),
+        "failed_to_decode": int((~decoded).sum()),
+        "temperature": round(temperature, 4),
+        "fit_images": int(len(fit)),
+        "uncalibrated": summary(probabilities[held_out], held_out_labels),
+        "calibrated": summary(calibrated, held_out_labels),
+        "per_class": per_class_report(calibrated, held_out_labels, label_set.names),
+        "abstention": abstention_curve(calibrated, held_out_labels, np.linspace(0.0, 0.9, 19)),
+    }
+
+    print(json.dumps({k: report[k] for k in ("temperature", "uncalibrated", "calibrated")}, indent=2))
+    print("\nThreshold  Coverage  Accuracy   (ABSTAIN_THRESHOLD is in %: threshold x 100)")
+    for point in report["abstention"]:
+        print(f"{point['threshold']:>9.2f}  {point['coverage']:>8.1%}  "
+              f"{point['accuracy'] if point['accuracy'] is not None else '-':>8}")
+    print("\nPer-class accuracy (calibrated, held-out images):")
+    for name, stats in report["per_class"].items():
+        print(f"  {name:<24} n={stats['support']:<5} accuracy={stats['accuracy']}  precision={stats['precision']}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.report}")
+
+    if args.write_calibration:
+        with open(labels_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+        metadata["calibration"] = {
+            "temperature": round(temperature, 4),
+            "fitted_on": os.path.normpath(args.eval_dir),
+            "images": int(len(fit)),
+            "ece_before": report["uncalibrated"]["ece"],
+            "ece_after": report["calibrated"]["ece"],
+        }
+        write_metadata(labels_path, metadata)
+        print(f"🌡️ Temperature {temperature:.3f} written to {labels_path}")
+
+
+if __name__ == "__main__":
+    main()
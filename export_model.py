@@ -0,0 +1,192 @@
+"""Export the Keras checkpoint to optimized serving artifacts.
+
+Examples:
+    python export_model.py --quantize dynamic
+    python export_model.py --quantize int8 --calibration-dir dataset/Skin_Disease_Dataset/train
+    python export_model.py --onnx --eval-dir dataset/Skin_Disease_Dataset/test
+
+Serve the result with INFERENCE_BACKEND=tflite (TFLITE_MODEL_PATH) or
+INFERENCE_BACKEND=onnx (ONNX_MODEL_PATH).
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from inference_backends import ONNXBackend, TFLiteBackend
+from labels import load_labels, metadata_path_for
+from preprocessing import LEGACY_RESIZE_FILTER, preprocess_into
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+IMAGE_SIZE = (224, 224)
+
+
+def list_images(directory, label_names=None):
+    """Return (path, class_index) pairs; subfolders are classes, indexed by their position in
+    ``label_names`` (the label artifact's order; folders it does not list get None) or else sorted"""
+    classes = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    index = {name: i for i, name in enumerate(label_names if label_names is not None else classes)}
+    samples = []
+    if classes:
+        for class_name in classes:
+            class_dir = os.path.join(directory, class_name)
+            for name in sorted(os.listdir(class_dir)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    samples.append((os.path.join(class_dir, name), index.get(class_name)))
+    else:
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(directory, name), None))
+    return samples
+
+
+def load_batch(paths, resize_filter):
+    """Load images exactly like the server does: 224x224 with the model's resize filter, scaled to [0, 1]"""
+    batch = np.empty((len(paths),) + IMAGE_SIZE + (3,), dtype=np.float32)
+    for slot, path in enumerate(paths):
+        with open(path, "rb") as f:
+            preprocess_into(f.read(), batch[slot], resize_filter)
+    return batch
+
+
+def representative_dataset(calibration_dir, num_samples, resize_filter):
+    """Calibration samples for full-integer post-training quantization"""
+    samples = list_images(calibration_dir)
+    random.Random(0).shuffle(samples)
+    paths = [p for p, _ in samples[:num_samples]]
+    if not paths:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+
+    def generator():
+        for path in paths:
+            yield [load_batch([path], resize_filter)]
+    return generator
+
+
+def export_tflite(keras_model, output_path, quantize, calibration_dir=None, calibration_samples=200,
+                  resize_filter=LEGACY_RESIZE_FILTER):
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantize in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "int8":
+        if not calibration_dir:
+            raise ValueError("--calibration-dir is required for int8 quantization")
+        converter.representative_dataset = representative_dataset(calibration_dir, calibration_samples, resize_filter)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    print(f"✅ Wrote {output_path} ({len(tflite_model) / 1e6:.1f} MB, quantize={quantize})")
+
+
+def export_onnx(keras_model, output_path):
+    import tf2onnx  # optional dependency, only needed for --onnx
+
+    spec = (tf.TensorSpec((None,) + IMAGE_SIZE + (3,), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=13, output_path=output_path)
+    print(f"✅ Wrote {output_path}")
+
+
+def accuracy_report(keras_model, backends, eval_dir, batch_size=32, max_images=None,
+                    resize_filter=LEGACY_RESIZE_FILTER, label_names=None):
+    """Compare each exported backend against the Keras model on a folder of images"""
+    samples = list_images(eval_dir, label_names)
+    if max_images:
+        samples = samples[:max_images]
+    if not samples:
+        raise ValueError(f"No evaluation images found in {eval_dir}")
+    labels = np.array([-1 if c is None else c for _, c in samples])
+    labelled = labels >= 0
+
+    outputs = {"keras": []}
+    timings = {"keras": 0.0}
+    for name in backends:
+        outputs[name] = []
+        timings[name] = 0.0
+
+    for start in range(0, len(samples), batch_size):
+        batch = load_batch([p for p, _ in samples[start:start + batch_size]], resize_filter)
+        t0 = time.perf_counter()
+        outputs["keras"].append(np.asarray(keras_model.predict_on_batch(batch)))
+        timings["keras"] += time.perf_counter() - t0
+        for name, backend in backends.items():
+            t0 = time.perf_counter()
+            outputs[name].append(backend.predict(batch))
+            timings[name] += time.perf_counter() - t0
+
+    reference = np.concatenate(outputs["keras"])
+    reference_top1 = reference.argmax(axis=1)
+    report = {"images": len(samples), "labelled_images": int(labelled.sum()), "backends": {}}
+    for name, chunks in outputs.items():
+        probs = np.concatenate(chunks)
+        top1 = probs.argmax(axis=1)
+        entry = {
+            "ms_per_image": round(1000 * timings[name] / len(samples), 3),
+            "top1_agreement_with_keras": float((top1 == reference_top1).mean()),
+            "max_abs_prob_delta": float(np.abs(probs - reference).max()),
+            "mean_abs_prob_delta": float(np.abs(probs - reference).mean()),
+        }
+        if labelled.any():
+            entry["accuracy"] = float((top1[labelled] == labels[labelled]).mean())
+        report["backends"][name] = entry
+
+    if labelled.any():
+        keras_accuracy = report["backends"]["keras"]["accuracy"]
+        for entry in report["backends"].values():
+            entry["accuracy_delta"] = round(entry["accuracy"] - keras_accuracy, 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model_checkpoint.h5 to TFLite/ONNX serving artifacts")
+    parser.add_argument("--model", default="model_checkpoint.h5", help="Keras checkpoint to export")
+    parser.add_argument("--output-dir", default=".", help="Where to write the exported artifacts")
+    parser.add_argument("--quantize", choices=["none", "dynamic", "int8"], default="dynamic",
+                        help="Post-training quantization mode for the TFLite model")
+    parser.add_argument("--calibration-dir", help="Image folder used to calibrate int8 quantization")
+    parser.add_argument("--calibration-samples", type=int, default=200)
+    parser.add_argument("--onnx", action="store_true", help="Also export an ONNX model (needs tf2onnx)")
+    parser.add_argument("--eval-dir", help="Image folder (optionally one subfolder per class) for the accuracy report")
+    parser.add_argument("--eval-max-images", type=int, default=None)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    keras_model = tf.keras.models.load_model(args.model, compile=False)
+    labels_path = metadata_path_for(args.model)
+    label_set = load_labels(labels_path) if os.path.exists(labels_path) else None
+    resize_filter = label_set.resize_filter if label_set else LEGACY_RESIZE_FILTER
+
+    # The names TFLITE_MODEL_PATH/ONNX_MODEL_PATH default to and a registry version directory expects;
+    # the quantization mode is recorded in export_report.json
+    tflite_path = os.path.join(args.output_dir, "model.tflite")
+    export_tflite(keras_model, tflite_path, args.quantize, args.calibration_dir, args.calibration_samples,
+                  resize_filter)
+
+    onnx_path = None
+    if args.onnx:
+        onnx_path = os.path.join(args.output_dir, "model.onnx")
+        export_onnx(keras_model, onnx_path)
+
+    if args.eval_dir:
+        backends = {"tflite": TFLiteBackend(tflite_path)}
+        if onnx_path:
+            backends["onnx"] = ONNXBackend(onnx_path)
+        report = accuracy_report(keras_model, backends, args.eval_dir, max_images=args.eval_max_images,
+                                 resize_filter=resize_filter,
+                                 label_names=label_set.names if label_set else None)
+        report["quantize"] = args.quantize
+        report_path = os.path.join(args.output_dir, "export_report.json")
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+        print(f"📝 Accuracy report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Gunicorn configuration: gunicorn -c gunicorn.conf.py app:app
+#
+# SERVING_MODE=local  - every worker loads its own model (memory grows with WEB_CONCURRENCY)
+# SERVING_MODE=remote - the master starts inference_server.py once and workers share it
+#                       over shared memory, so workers can scale without copying the model
+import os
+import subprocess
+import sys
+import threading
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = 120
+max_requests = 1000
+max_requests_jitter = 50
+
+SERVING_MODE = os.getenv("SERVING_MODE", "local").lower()
+WATCHDOG_INTERVAL = 2
+MAX_RESTART_DELAY = 60
+_inference_server = None
+_stopping = threading.Event()
+_lock = threading.Lock()
+
+
+def _start_inference_server(server):
+    global _inference_server
+    _inference_server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_server.py")]
+    )
+    server.log.info(f"Started shared inference server (pid {_inference_server.pid})")
+
+
+def _watch_inference_server(server):
+    """Restart the inference server if it dies; back off while it keeps crashing"""
+    delay = WATCHDOG_INTERVAL
+    while not _stopping.wait(delay):
+        code = _inference_server.poll()
+        if code is None:
+            delay = WATCHDOG_INTERVAL
+            continue
+        with _lock:
+            if _stopping.is_set():
+                break
+            server.log.error(f"Inference server exited with code {code}; restarting")
+            _start_inference_server(server)
+        delay = min(delay * 2, MAX_RESTART_DELAY)
+
+
+def on_starting(server):
+    if SERVING_MODE == "remote":
+        # Workers are forked from the master after this hook, so they inherit the key
+        if not os.getenv("INFERENCE_SERVER_AUTHKEY"):
+            os.environ["INFERENCE_SERVER_AUTHKEY"] = os.urandom(32).hex()
+        _start_inference_server(server)
+        threading.Thread(target=_watch_inference_server, args=(server,), daemon=True).start()
+
+
+def on_exit(server):
+    with _lock:
+        _stopping.set()
+    if _inference_server is not None and _inference_server.poll() is None:
+        _inference_server.terminate()
+        try:
+            _inference_server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _inference_server.kill()
@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class KerasBackend:
+    """Serve predictions straight from a loaded Keras model"""
+
+    name = "keras"
+
+    def __init__(self, keras_model):
+        self.model = keras_model
+        self.num_classes = int(keras_model.output_shape[-1])
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """Serve predictions from an exported .tflite file (float, dynamic-range or int8)"""
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter  # slim runtime, no full TF needed
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self.num_classes = int(self._output["shape"][-1])
+        # The interpreter is not thread safe; the batcher already serialises calls
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        shape = list(self._input["shape"])
+        shape[0] = batch_size
+        self.interpreter.resize_tensor_input(self._input["index"], shape, strict=False)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def predict(self, batch):
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._resize(len(batch))
+
+            dtype = self._input["dtype"]
+            if dtype != np.float32:
+                # Full-integer model: quantize the normalised input with the model's own params
+                scale, zero_point = self._input["quantization"]
+                batch = np.clip(np.round(batch / scale + zero_point),
+                                np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"])
+
+            if output.dtype != np.float32:
+                scale, zero_point = self._output["quantization"]
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output.copy()
+
+
+class ONNXBackend:
+    """Serve predictions through ONNX Runtime on the CPU"""
+
+    name = "onnx"
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+        self.num_classes = int(self.session.get_outputs()[0].shape[-1])
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+def load_model_safely(model_path, labels_path=None):
+    """Load model with fallback for version incompatibility.
+
+    The fallback rebuilds the network with as many outputs as the label
+    artifact (``labels_path``, default: next to the model) lists. Raises
+    instead of returning an untrained network: a model with random weights
+    would answer every request with a confident-looking guess.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.applications import MobileNetV2
+    from tensorflow.keras import layers
+
+    try:
+        # Inference only: no optimizer state is needed, so skip compile()
+        loaded_model = load_model(model_path, compile=False)
+        logger.info("✅ Model loaded successfully with compile=False!")
+        return loaded_model
+    except Exception as e:
+        logger.warning(f"⚠️ Error loading model directly: {e}")
+        
+        # Fallback: rebuild the architecture model.py trains and load only the weights
+        from labels import load_labels, metadata_path_for
+
+        num_classes = load_labels(labels_path or metadata_path_for(model_path)).num_classes
+        logger.info(f"🔄 Rebuilding model architecture ({num_classes} classes) and loading weights...")
+        base_model = MobileNetV2(weights=None, include_top=False, input_shape=(224, 224, 3))
+        rebuilt_model = tf.keras.Sequential([
+            base_model,
+            layers.GlobalAveragePooling2D(),
+            layers.Dropout(0.3),
+            layers.Dense(1024, activation='relu'),
+            layers.Dense(num_classes, activation='softmax'),
+        ])
+        rebuilt_model.build((None, 224, 224, 3))
+        rebuilt_model.load_weights(model_path)
+        logger.info("✅ Model architecture rebuilt and weights loaded!")
+        return rebuilt_model
+
+
+def create_backend(name, keras_loader, tflite_path="model.tflite", onnx_path="model.onnx", num_threads=None):
+    """Create the configured backend, falling back to Keras if the exported artifact fails to load"""
+    name = (name or "keras").lower()
+    try:
+        if name == "tflite":
+            backend = TFLiteBackend(tflite_path, num_threads=num_threads)
+            logger.info(f"✅ TFLite backend ready ({tflite_path})")
+            return backend
+        if name == "onnx":
+            backend = ONNXBackend(onnx_path, num_threads=num_threads)
+            logger.info(f"✅ ONNX Runtime backend ready ({onnx_path})")
+            return backend
+    except Exception as e:
+        logger.warning(f"⚠️ {name} backend unavailable, falling back to Keras: {e}")
+
+    keras_model = keras_loader()
+    return KerasBackend(keras_model) if keras_model is not None else None
+
+
+def create_backend_from_env(model_path, tflite_path=None, onnx_path=None, labels_path=None):
+    """Create the backend selected by INFERENCE_BACKEND / TFLITE_MODEL_PATH / ONNX_MODEL_PATH"""
+    return create_backend(
+        os.getenv("INFERENCE_BACKEND", "keras"),
+        lambda: load_model_safely(model_path, labels_path or os.getenv("LABELS_PATH")),
+        tflite_path=tflite_path or os.getenv("TFLITE_MODEL_PATH", "model.tflite"),
+        onnx_path=onnx_path or os.getenv("ONNX_MODEL_PATH", "model.onnx"),
+        num_threads=int(os.getenv("INFERENCE_THREADS", "0")) or None,
+    )
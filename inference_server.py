@@ -0,0 +1,207 @@
+"""Dedicated inference process shared by every gunicorn worker.
+
+The model is loaded once, here. HTTP workers (SERVING_MODE=remote) copy
+their preprocessed tensors into a shared-memory segment and send only the
+segment name and shape over a Unix socket; the server micro-batches
+requests from all workers and replies with the softmax rows.
+
+Run standalone with ``INFERENCE_SERVER_AUTHKEY=<secret> python
+inference_server.py`` or let gunicorn.conf.py start (and restart) it with a
+random key.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from batching import MicroBatcher
+from inference_backends import create_backend_from_env
+from observability import configure_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = "/tmp/skin-disease-inference.sock"
+
+
+def server_address():
+    return os.getenv("INFERENCE_SERVER_ADDRESS", DEFAULT_ADDRESS)
+
+
+def server_authkey():
+    """Shared secret for the Unix socket; gunicorn.conf.py generates one per deploy"""
+    key = os.getenv("INFERENCE_SERVER_AUTHKEY")
+    if not key:
+        raise RuntimeError("INFERENCE_SERVER_AUTHKEY is not set (gunicorn.conf.py sets a random one)")
+    return key.encode()
+
+
+def attach_segment(name):
+    """Attach to a worker-owned segment without letting this process's tracker unlink it"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class InferenceServer:
+    """Accept worker connections and run their tensors through one shared batcher"""
+
+    def __init__(self, backend, address=None, max_batch_size=32, window_ms=5):
+        self.backend = backend
+        self.address = address or server_address()
+        self.batcher = MicroBatcher(backend.predict, max_batch_size=max_batch_size, window_ms=window_ms)
+
+    def info(self):
+        return {
+            "backend": self.backend.name,
+            "num_classes": self.backend.num_classes,
+            "model_path": getattr(self.backend, "model_path", None),
+            "pid": os.getpid(),
+            "batching": self.batcher.stats(),
+        }
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family="AF_UNIX", authkey=server_authkey())
+        logger.info(f"🧠 Inference server listening on {self.address} (pid {os.getpid()})")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"⚠️ Rejected inference connection: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        shm = None
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "info":
+                    conn.send(("ok", self.info()))
+                    continue
+
+                _, name, shape = message
+                if shm is None or shm.name != name:
+                    # The worker grew its segment; drop our view of the old one
+                    if shm is not None:
+                        shm.close()
+                    shm = attach_segment(name)
+                batch = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+                try:
+                    conn.send(("ok", self.batcher.predict(batch)))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+                del batch
+        except (EOFError, OSError):
+            pass
+        finally:
+            if shm is not None:
+                shm.close()
+            conn.close()
+
+
+class RemoteBackend:
+    """Inference backend used by HTTP workers when the model lives in the inference server"""
+
+    name = "remote"
+
+    def __init__(self, address=None, connect_timeout=60):
+        self.address = address or server_address()
+        self._local = threading.local()
+        self._segments = []
+        self._segments_lock = threading.Lock()
+        atexit.register(self._cleanup)
+
+        # The server may still be loading the model; retry until it accepts connections
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                info = self._call(("info",))
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+        self.server_backend = info["backend"]
+        self.num_classes = info["num_classes"]
+        self.model_path = info["model_path"]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=server_authkey())
+            self._local.conn = conn
+        return conn
+
+    def _segment(self, nbytes):
+        """Per-thread shared-memory segment, grown (never shrunk) to fit the batch"""
+        shm = getattr(self._local, "shm", None)
+        if shm is None or shm.size < nbytes:
+            new_shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1 << 20))
+            with self._segments_lock:
+                self._segments.append(new_shm)
+                if shm is not None:
+                    self._segments.remove(shm)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = self._local.shm = new_shm
+        return shm
+
+    def _call(self, message):
+        conn = self._connection()
+        try:
+            conn.send(message)
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            # Server restarted; reconnect on the next call
+            self._local.conn = None
+            raise
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        shm = self._segment(batch.nbytes)
+        np.ndarray(batch.shape, dtype=np.float32, buffer=shm.buf)[...] = batch
+        return self._call(("predict", shm.name, batch.shape))
+
+    def _cleanup(self):
+        with self._segments_lock:
+            for shm in self._segments:
+                try:
+                    shm.close()
+                    shm.unlink()
+                except Exception:
+                    pass
+            self._segments.clear()
+
+
+def main():
+    configure_logging(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+    model_path = os.getenv("MODEL_PATH", "model_checkpoint.h5")
+    backend = create_backend_from_env(model_path)
+    if backend is None:
+        raise SystemExit("❌ No model could be loaded")
+    backend.predict(np.zeros((1, 224, 224, 3), dtype=np.float32))  # warm up before accepting traffic
+
+    server = InferenceServer(
+        backend,
+        max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "32")),
+        window_ms=float(os.getenv("BATCH_WINDOW_MS", "5")),
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
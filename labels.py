@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from preprocessing import DEFAULT_RESIZE_FILTER, LEGACY_RESIZE_FILTER, RESIZE_FILTERS
+
+SCHEMA_VERSION = 1
+MISSING_INFO = {
+    "description": "No information available.",
+    "cause": "Unknown.",
+    "treatment": "Consult a doctor for further evaluation.",
+}
+# Returned instead of a class when the top probability is below the abstention threshold
+LOW_CONFIDENCE_RESULT = {
+    "disease": "Inconclusive",
+    "description": "The model is not confident enough to name a condition for this photo.",
+    "cause": "N/A",
+    "treatment": "Retake the photo close up, in focus and in good light, or consult a dermatologist.",
+}
+
+
+def metadata_path_for(model_path):
+    """The label artifact sits next to the model: model_checkpoint.h5 -> model_checkpoint.labels.json"""
+    return os.path.splitext(model_path)[0] + ".labels.json"
+
+
+def labels_version(labels):
+    """Content hash of the ordered label list; changes whenever an index would map differently"""
+    return hashlib.sha256(json.dumps(list(labels)).encode()).hexdigest()[:12]
+
+
+def build_metadata(labels, disease_info=None, model_path=None, image_size=(224, 224),
+                   resize_filter=DEFAULT_RESIZE_FILTER):
+    """Artifact contents for an ordered list of class names (index = model output unit)"""
+    labels = list(labels)
+    return {
+        "schema": SCHEMA_VERSION,
+        "version": labels_version(labels),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "model": os.path.basename(model_path) if model_path else None,
+        "num_classes": len(labels),
+        "image_size": list(image_size),
+        "resize_filter": resize_filter,
+        "labels": labels,
+        "disease_info": {name: info for name, info in (disease_info or {}).items() if name in labels},
+    }
+
+
+def write_metadata(path, metadata):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+class LabelSet:
+    """Class names and disease details indexed by model output unit.
+
+    Response fields are precomputed per class, so serving a prediction is
+    a list index instead of dictionary lookups by name.
+    """
+
+    def __init__(self, metadata):
+        if metadata.get("schema") != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported label artifact schema: {metadata.get('schema')}")
+        self.names = tuple(metadata["labels"])
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Label artifact contains duplicate class names")
+        if metadata.get("num_classes", len(self.names)) != len(self.names):
+            raise ValueError("Label artifact num_classes does not match its label list")
+        self.version = metadata.get("version") or labels_version(self.names)
+        if self.version != labels_version(self.names):
+            raise ValueError("Label artifact version does not match its label list (edited by hand?)")
+        self.image_size = tuple(metadata.get("image_size", (224, 224)))
+        # The filter the training images were resized with; serving must use the same one
+        self.resize_filter = metadata.get("resize_filter", LEGACY_RESIZE_FILTER)
+        if self.resize_filter not in RESIZE_FILTERS:
+            raise ValueError(f"Unknown resize filter in label artifact: {self.resize_filter}")
+        self.disease_info = metadata.get("disease_info", {})
+        self.results = tuple(
+            {"disease": name, **MISSING_INFO, **self.disease_info.get(name, {})} for name in self.names
+        )
+        # Fitted offline by evaluate_model.py; 1.0 leaves the softmax unchanged
+        self.temperature = float(metadata.get("calibration", {}).get("temperature", 1.0))
+
+    @property
+    def num_classes(self):
+        return len(self.names)
+
+    def result(self, class_index):
+        """Response fields (disease, description, cause, treatment) for an output unit"""
+        return self.results[class_index]
+
+    def validate(self, num_classes):
+        """Raise ValueError unless the model's output width matches the label list"""
+        if num_classes is not None and num_classes != self.num_classes:
+            raise ValueError(
+                f"Model has {num_classes} output classes but the label artifact "
+                f"(version {self.version}) lists {self.num_classes}"
+            )
+
+
+def load_labels(path):
+    with open(path, encoding="utf-8") as f:
+        return LabelSet(json.load(f))
@@ -1,90 +1,379 @@
+"""Train the skin disease classifier (MobileNetV2 + dense head).
+
+The input pipeline is tf.data end to end: JPEGs are decoded and resized in
+parallel once, written to uint8 TFRecord shards, and every epoch after that
+streams the shards, applies vectorized augmentation on whole batches and
+prefetches ahead of the model. Training can be interrupted and resumed, and
+the versioned label artifact (labels.py) is written next to the model.
+
+    python model.py --epochs 20
+    python model.py --epochs 20 --mixed-precision      # float16 on GPU, bfloat16 on CPU
+
+Because the MobileNetV2 backbone is frozen, ``--head-only`` runs it once
+(plus optional augmented passes), caches the pooled features in a
+memory-mapped array and trains just the dense head on them in minutes:
+
+    python model.py --head-only --augmentations 4 --class-weight balanced
+"""
+import argparse
+import json
+import os
+
+import numpy as np
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras import layers, models
 from tensorflow.keras.applications import MobileNetV2
 
+from labels import build_metadata, metadata_path_for, write_metadata
+from preprocessing import DEFAULT_RESIZE_FILTER, RESIZE_FILTERS
+
 # Define paths to the train and test directories
-train_dir = 'dataset/Skin_Disease_Dataset/train'
-test_dir = 'dataset/Skin_Disease_Dataset/test'
+TRAIN_DIR = 'dataset/Skin_Disease_Dataset/train'
+TEST_DIR = 'dataset/Skin_Disease_Dataset/test'
+IMAGE_SIZE = (224, 224)
+TRAINED_MODEL_PATH = 'model_checkpoint.h5'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+AUTOTUNE = tf.data.AUTOTUNE
 
-# ImageDataGenerator for preprocessing and data augmentation
-train_datagen = ImageDataGenerator(
-    rescale=1./255,         # Rescale pixel values to [0, 1]
-    rotation_range=30,     # Random rotation
-    width_shift_range=0.2, # Random width shift
-    height_shift_range=0.2, # Random height shift
-    shear_range=0.2,       # Random shear
-    zoom_range=0.2,        # Random zoom
-    horizontal_flip=True,  # Horizontal flip
-    fill_mode='nearest'
-)
 
-test_datagen = ImageDataGenerator(rescale=1./255)  # Just rescale for test data
+def list_dataset(directory, class_names=None):
+    """Image paths and integer labels; classes are the sorted subdirectories (as flow_from_directory)"""
+    if class_names is None:
+        class_names = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    paths, labels = [], []
+    for index, name in enumerate(class_names):
+        class_dir = os.path.join(directory, name)
+        if not os.path.isdir(class_dir):
+            continue
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, filename))
+                labels.append(index)
+    return paths, labels, class_names
 
-# Flow data from directories
-train_data = train_datagen.flow_from_directory(
-    train_dir,
-    target_size=(224, 224),  # Resize images to 224x224 (VGG16 input size)
-    batch_size=32,
-    class_mode='categorical',  # Categorical labels (multi-class classification)
-)
 
-test_data = test_datagen.flow_from_directory(
-    test_dir,
-    target_size=(224, 224),
-    batch_size=32,
-    class_mode='categorical',  # Categorical labels
-)
+def decode_and_resize(path, label, resize_filter=DEFAULT_RESIZE_FILTER):
+    """uint8 224x224x3 image, resized like the serving preprocessing (preprocessing.py) with the same filter"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMAGE_SIZE, method=resize_filter, antialias=True)
+    # Round like PIL does; bicubic/lanczos can overshoot [0, 255]
+    return tf.cast(tf.round(tf.clip_by_value(image, 0, 255)), tf.uint8), label
 
-print("Training and test data are ready!")
 
+def _serialize(image, label):
+    feature = {
+        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.numpy().tobytes()])),
+        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
 
 
+def _parse(record):
+    parsed = tf.io.parse_single_example(record, {
+        "image": tf.io.FixedLenFeature([], tf.string),
+        "label": tf.io.FixedLenFeature([], tf.int64),
+    })
+    image = tf.reshape(tf.io.decode_raw(parsed["image"], tf.uint8), IMAGE_SIZE + (3,))
+    return image, parsed["label"]
 
 
-# Load VGG16 pre-trained model without the top (classification) layer
-base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
+def build_shards(directory, shard_dir, class_names, num_shards, resize_filter=DEFAULT_RESIZE_FILTER):
+    """Decode every image once and store it resized as raw uint8 TFRecord shards.
 
-# Freeze the layers of VGG16 to retain the pre-trained features
-base_model.trainable = False
+    The shards are rebuilt when the source file list changes; a manifest
+    records what they were built from.
+    """
+    paths, labels, _ = list_dataset(directory, class_names)
+    manifest_path = os.path.join(shard_dir, "manifest.json")
+    manifest = {"files": len(paths), "class_names": class_names, "image_size": list(IMAGE_SIZE),
+                "resize_filter": resize_filter,
+                "newest_mtime": max((os.path.getmtime(p) for p in paths), default=0)}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return sorted(os.path.join(shard_dir, n) for n in os.listdir(shard_dir) if n.endswith(".tfrecord"))
 
-# Build the full model
-model = models.Sequential([
-    base_model,
-    layers.GlobalAveragePooling2D(),
-    layers.Dense(1024, activation='relu'),
-    layers.Dense(train_data.num_classes, activation='softmax')  # Number of classes = number of diseases
-])
+    print(f"🗜️ Building {num_shards} TFRecord shards for {len(paths)} images in {shard_dir}")
+    os.makedirs(shard_dir, exist_ok=True)
+    for name in os.listdir(shard_dir):
+        os.remove(os.path.join(shard_dir, name))
 
-# Compile the model
-model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    decoded = (tf.data.Dataset.from_tensor_slices((paths, labels))
+               .map(lambda path, label: decode_and_resize(path, label, resize_filter), num_parallel_calls=AUTOTUNE)
+               .prefetch(AUTOTUNE))
+    shard_paths = [os.path.join(shard_dir, f"shard-{i:03d}.tfrecord") for i in range(num_shards)]
+    writers = [tf.io.TFRecordWriter(p) for p in shard_paths]
+    for i, (image, label) in enumerate(decoded):
+        writers[i % num_shards].write(_serialize(image, label))
+    for writer in writers:
+        writer.close()
 
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return shard_paths
 
 
+def build_augmenter():
+    """Batch-level random transforms, equivalent to the old ImageDataGenerator settings"""
+    # Kept in float32 under mixed precision; the image ops have no reduced-precision CPU kernels
+    return tf.keras.Sequential([
+        layers.RandomFlip("horizontal", dtype="float32"),
+        layers.RandomRotation(30 / 360, fill_mode="nearest", dtype="float32"),
+        layers.RandomTranslation(0.2, 0.2, fill_mode="nearest", dtype="float32"),
+        layers.RandomZoom(0.2, fill_mode="nearest", dtype="float32"),
+    ], name="augmentation")
 
 
-# Automatically detect and use GPU if available, otherwise use CPU
-strategy = tf.distribute.MirroredStrategy()  # Works for multiple GPUs or CPU fallback
-print(f"✅ Using {strategy.num_replicas_in_sync} GPU(s)" if tf.config.list_physical_devices('GPU') else "✅ Using CPU")
+def make_dataset(shard_paths, num_classes, batch_size, shuffle=False, augment=False):
+    """Stream the shards as (float images in [0, 1], one-hot labels) batches"""
+    ds = tf.data.TFRecordDataset(shard_paths, num_parallel_reads=AUTOTUNE if shuffle else None)
+    ds = ds.map(_parse, num_parallel_calls=AUTOTUNE)
+    if shuffle:
+        ds = ds.shuffle(2048)
+    ds = ds.batch(batch_size, drop_remainder=False)
 
-# Create and compile the model within the strategy scope
-with strategy.scope():
-    model = models.Sequential([
-        base_model,
-        layers.GlobalAveragePooling2D(),
+    def to_float(images, labels):
+        return tf.cast(images, tf.float32) / 255.0, tf.one_hot(labels, num_classes)
+
+    ds = ds.map(to_float, num_parallel_calls=AUTOTUNE)
+    if augment:
+        augmenter = build_augmenter()
+        ds = ds.map(lambda x, y: (augmenter(x, training=True), y), num_parallel_calls=AUTOTUNE)
+
+    options = tf.data.Options()
+    options.deterministic = not shuffle
+    return ds.with_options(options).prefetch(AUTOTUNE)
+
+
+def extract_features(backbone, shard_paths, feature_dir, num_classes, batch_size, augmentations=0):
+    """Run the frozen backbone once and store pooled features in a memory-mapped array.
+
+    Rows are the clean images followed by ``augmentations`` randomly
+    augmented copies of each. The arrays are reused as long as the shards
+    and the number of augmentations are unchanged.
+    """
+    with open(os.path.join(os.path.dirname(shard_paths[0]), "manifest.json")) as f:
+        manifest = json.load(f)
+    manifest["augmentations"] = augmentations
+    num_images = manifest["files"]
+    rows = num_images * (1 + augmentations)
+    feature_dim = backbone.output_shape[-1]
+
+    manifest_path = os.path.join(feature_dir, "manifest.json")
+    features_path = os.path.join(feature_dir, "features.npy")
+    labels_path = os.path.join(feature_dir, "labels.npy")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return np.load(features_path, mmap_mode="r"), np.load(labels_path)
+
+    print(f"🧮 Extracting {rows} x {feature_dim} backbone features into {feature_dir}")
+    os.makedirs(feature_dir, exist_ok=True)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    # float16 halves the file; pooled ReLU6 activations lie in [0, 6]
+    features = np.lib.format.open_memmap(features_path, mode="w+", dtype=np.float16, shape=(rows, feature_dim))
+    labels = np.empty(rows, dtype=np.int64)
+
+    offset = 0
+    for augment in [False] + [True] * augmentations:
+        for images, one_hot in make_dataset(shard_paths, num_classes, batch_size, augment=augment):
+            count = images.shape[0]
+            features[offset:offset + count] = tf.cast(backbone(images, training=False), tf.float32).numpy()
+            labels[offset:offset + count] = np.argmax(one_hot.numpy(), axis=1)
+            offset += count
+    features.flush()
+    np.save(labels_path, labels)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return np.load(features_path, mmap_mode="r"), labels
+
+
+def feature_dataset(features, labels, num_classes, batch_size, shuffle=False):
+    """Batches gathered from the memory-mapped features, so they never have to fit in RAM"""
+    def gather(index):
+        index = np.sort(index)  # sequential reads from the memmap
+        return features[index].astype(np.float32), labels[index]
+
+    def load(index):
+        x, y = tf.numpy_function(gather, [index], (tf.float32, tf.int64))
+        x.set_shape((None, features.shape[1]))
+        return x, tf.one_hot(y, num_classes)
+
+    ds = tf.data.Dataset.range(len(labels))
+    if shuffle:
+        ds = ds.shuffle(len(labels), reshuffle_each_iteration=True)
+    return ds.batch(batch_size).map(load, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+
+def balanced_class_weights(labels, num_classes):
+    """Inverse-frequency weights so rare conditions count as much as common ones"""
+    counts = np.bincount(labels, minlength=num_classes).astype(np.float64)
+    weights = len(labels) / (num_classes * np.maximum(counts, 1))
+    return {i: float(w) for i, w in enumerate(weights)}
+
+
+def build_backbone():
+    base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=IMAGE_SIZE + (3,))
+    # Freeze the pre-trained feature extractor; only the head is trained
+    base_model.trainable = False
+    return base_model
+
+
+def head_layers(num_classes):
+    """Classifier head on top of the pooled backbone features"""
+    return [
         layers.Dropout(0.3),  # Added dropout for better generalization
         layers.Dense(1024, activation='relu'),
-        layers.Dense(train_data.num_classes, activation='softmax')
-    ])
-    
-    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001), 
-                  loss='categorical_crossentropy', 
+        # Softmax in float32 so mixed precision does not lose probability resolution
+        layers.Dense(num_classes, activation='softmax', dtype='float32'),
+    ]
+
+
+def compile_model(model, learning_rate):
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='categorical_crossentropy',
                   metrics=['accuracy'])
+    return model
+
+
+def build_model(num_classes, learning_rate, base_model=None):
+    model = models.Sequential([
+        base_model or build_backbone(),
+        layers.GlobalAveragePooling2D(),
+        *head_layers(num_classes),
+    ])
+    return compile_model(model, learning_rate)
+
+
+def train_head(args, class_names, train_shards, test_shards, model_path):
+    """Train only the head on cached backbone features, then save the full model to ``model_path``"""
+    num_classes = len(class_names)
+    base_model = build_backbone()
+    backbone = models.Sequential([base_model, layers.GlobalAveragePooling2D()])
+    feature_root = os.path.join(args.cache_dir, "features")
+    train_x, train_y = extract_features(backbone, train_shards, os.path.join(feature_root, "train"),
+                                        num_classes, args.batch_size, args.augmentations)
+    test_x, test_y = extract_features(backbone, test_shards, os.path.join(feature_root, "test"),
+                                      num_classes, args.batch_size)
+
+    head = compile_model(models.Sequential([layers.Input((train_x.shape[1],)), *head_layers(num_classes)]),
+                         args.learning_rate)
+    head_weights = os.path.join(args.cache_dir, "head.weights.h5")
+    head.fit(
+        feature_dataset(train_x, train_y, num_classes, args.head_batch_size, shuffle=True),
+        validation_data=feature_dataset(test_x, test_y, num_classes, args.head_batch_size),
+        epochs=args.epochs,
+        class_weight=balanced_class_weights(train_y, num_classes) if args.class_weight == "balanced" else None,
+        callbacks=[tf.keras.callbacks.ModelCheckpoint(head_weights, monitor="val_accuracy",
+                                                      save_best_only=True, save_weights_only=True)],
+    )
+    head.load_weights(head_weights)
+
+    # Same layer layout as a full training run, so the app loads it unchanged
+    model = build_model(num_classes, args.learning_rate, base_model)
+    for full_layer, head_layer in zip(model.layers[2:], head.layers):
+        full_layer.set_weights(head_layer.get_weights())
+    model.save(model_path)
+
+
+def write_label_artifact(path, class_names, model_path, resize_filter=DEFAULT_RESIZE_FILTER):
+    """Versioned label/metadata file the server loads; disease details carry over from the current one"""
+    disease_info = {}
+    for source in (path, metadata_path_for(TRAINED_MODEL_PATH)):
+        if os.path.exists(source):
+            with open(source, encoding="utf-8") as f:
+                disease_info = json.load(f).get("disease_info", {})
+            break
+    metadata = build_metadata(class_names, disease_info, model_path, IMAGE_SIZE, resize_filter)
+    write_metadata(path, metadata)
+    missing = [name for name in class_names if name not in metadata["disease_info"]]
+    print(f"🏷️ Wrote {path} (labels version {metadata['version']})")
+    print("Class Labels Mapping:", dict(enumerate(class_names)))
+    if missing:
+        print(f"⚠️ No disease_info for: {', '.join(missing)}; add it to {path} before deploying")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train-dir", default=TRAIN_DIR)
+    parser.add_argument("--test-dir", default=TEST_DIR)
+    parser.add_argument("--cache-dir", default=".cache/training",
+                        help="where decoded TFRecord shards and cached backbone features are kept")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--resize-filter", choices=sorted(RESIZE_FILTERS), default=DEFAULT_RESIZE_FILTER,
+                        help="image resize filter; recorded in the label artifact so serving resizes the same way")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=0.0001)
+    parser.add_argument("--mixed-precision", action="store_true",
+                        help="mixed_float16 on GPU, mixed_bfloat16 on CPU")
+    parser.add_argument("--output", default=TRAINED_MODEL_PATH, help="best model (by val_accuracy)")
+    parser.add_argument("--labels-output", help="label artifact (default: next to --output, see labels.py)")
+    parser.add_argument("--backup-dir", default=".cache/training_backup",
+                        help="per-epoch state; an interrupted run resumes from here")
+    parser.add_argument("--head-only", action="store_true",
+                        help="run the frozen backbone once, cache its features and train only the head")
+    parser.add_argument("--augmentations", type=int, default=0,
+                        help="--head-only: augmented copies of each training image to extract features for")
+    parser.add_argument("--head-batch-size", type=int, default=256)
+    parser.add_argument("--class-weight", choices=["none", "balanced"], default="none")
+    args = parser.parse_args()
+
+    gpus = tf.config.list_physical_devices('GPU')
+    if args.mixed_precision:
+        tf.keras.mixed_precision.set_global_policy("mixed_float16" if gpus else "mixed_bfloat16")
+
+    _, _, class_names = list_dataset(args.train_dir)
+    train_shards = build_shards(args.train_dir, os.path.join(args.cache_dir, "train"), class_names, args.shards,
+                                args.resize_filter)
+    test_shards = build_shards(args.test_dir, os.path.join(args.cache_dir, "test"), class_names,
+                               max(1, args.shards // 4), args.resize_filter)
+    print("Training and test data are ready!")
+
+    # Train into a side file: --output and its label artifact may be what the server is running, and
+    # the registry reloads when either changes, so both are replaced together once training succeeded
+    root, ext = os.path.splitext(args.output)
+    staging_path = f"{root}.training{ext}"
+    if os.path.exists(staging_path):
+        # Left by an interrupted run; promoting it would pair old weights with this run's labels
+        os.remove(staging_path)
+    if args.head_only:
+        train_head(args, class_names, train_shards, test_shards, staging_path)
+    else:
+        train_full(args, class_names, train_shards, test_shards, gpus, staging_path)
+    if not os.path.exists(staging_path):
+        raise SystemExit(f"❌ No model was saved; {args.output} and its label artifact are unchanged")
+
+    write_label_artifact(args.labels_output or metadata_path_for(args.output), class_names, args.output,
+                         args.resize_filter)
+    os.replace(staging_path, args.output)
+    print(f"✅ Saved {args.output}")
+
+
+def train_full(args, class_names, train_shards, test_shards, gpus, model_path):
+    """Fine-tune the whole network end to end; the best epoch is saved to ``model_path``"""
+    train_ds = make_dataset(train_shards, len(class_names), args.batch_size, shuffle=True, augment=True)
+    test_ds = make_dataset(test_shards, len(class_names), args.batch_size)
+
+    # Use every GPU if there are several, otherwise the default (CPU or single GPU) strategy
+    strategy = tf.distribute.MirroredStrategy() if len(gpus) > 1 else tf.distribute.get_strategy()
+    print(f"✅ Using {len(gpus)} GPU(s)" if gpus else "✅ Using CPU")
+    with strategy.scope():
+        model = build_model(len(class_names), args.learning_rate)
+    model.summary()
 
-model.summary()
+    callbacks = [
+        tf.keras.callbacks.BackupAndRestore(args.backup_dir),
+        tf.keras.callbacks.ModelCheckpoint(model_path, monitor="val_accuracy", save_best_only=True),
+    ]
+    class_weight = None
+    if args.class_weight == "balanced":
+        _, train_labels, _ = list_dataset(args.train_dir, class_names)
+        class_weight = balanced_class_weights(np.array(train_labels), len(class_names))
+    model.fit(train_ds, validation_data=test_ds, epochs=args.epochs, callbacks=callbacks,
+              class_weight=class_weight)
 
-# Get class names
-class_labels = train_data.class_indices
-class_labels = {v: k for k, v in class_labels.items()}  # Reverse mapping
 
-print("Class Labels Mapping:", class_labels)
+if __name__ == "__main__":
+    main()
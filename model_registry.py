@@ -0,0 +1,361 @@
+"""Versioned models: load and validate in the background, then swap atomically.
+
+Two layouts are supported:
+
+* ``MODEL_REGISTRY_DIR`` holds one subdirectory per version (the Keras
+  checkpoint, its label artifact and optionally model.tflite / model.onnx)
+  plus a ``registry.json`` naming the active version and an optional
+  candidate::
+
+      {"active": "2024-06-01", "candidate": "2024-07-15",
+       "candidate_mode": "shadow", "candidate_traffic": 0.1}
+
+  Without registry.json the newest subdirectory (by name) is active.
+* Otherwise the single ``MODEL_PATH`` checkpoint; replacing the file (or its
+  label artifact) is picked up as a new version.
+
+A new version is loaded and validated next to the one serving traffic and
+only becomes active if it passes, so a bad checkpoint never reaches users.
+Requests take a reference to a ``ModelVersion`` once and use it throughout,
+so a swap never mixes two models within one request; the retired version's
+batcher finishes what it has queued before it stops.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from batching import MicroBatcher
+from calibration import top_k
+from labels import load_labels, metadata_path_for
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE_EXTENSIONS = (".keras", ".h5")
+REGISTRY_FILE = "registry.json"
+GOLDEN_SET_FILE = "golden_images.json"
+CANDIDATE_MODES = ("shadow", "ab")
+
+Artifact = namedtuple("Artifact", "version model_path labels_path tflite_path onnx_path golden_path")
+
+
+class ModelValidationError(ValueError):
+    """A model version failed its checks and was not activated"""
+
+
+def file_signature(*paths):
+    """(size, mtime) of every existing path; changes whenever any of the files is replaced"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_size, st.st_mtime_ns))
+        except (OSError, TypeError):
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def artifact_signature(artifact):
+    return file_signature(artifact.model_path, artifact.labels_path, artifact.tflite_path,
+                          artifact.onnx_path, artifact.golden_path)
+
+
+class FileSource:
+    """The single checkpoint at MODEL_PATH; its size and mtime name the version"""
+
+    def __init__(self, model_path, labels_path=None, version=None, tflite_path=None, onnx_path=None,
+                 golden_path=GOLDEN_SET_FILE):
+        self.model_path = model_path
+        self.labels_path = labels_path or metadata_path_for(model_path)
+        self.version = version
+        self.tflite_path = tflite_path
+        self.onnx_path = onnx_path
+        self.golden_path = golden_path
+
+    def plan(self):
+        from prediction_cache import model_version_for
+
+        version = self.version or model_version_for(self.model_path) or os.path.basename(self.model_path)
+        artifact = Artifact(version, self.model_path, self.labels_path, self.tflite_path, self.onnx_path,
+                            self.golden_path)
+        return {"active": artifact, "candidate": None, "candidate_mode": None, "candidate_traffic": 0.0}
+
+
+class DirectorySource:
+    """One subdirectory per version under ``root``; registry.json picks the active one and a candidate"""
+
+    def __init__(self, root, golden_path=GOLDEN_SET_FILE):
+        self.root = root
+        self.golden_path = golden_path
+
+    def artifact(self, version):
+        directory = os.path.join(self.root, version)
+        if not os.path.isdir(directory):
+            raise ModelValidationError(f"Model version '{version}' not found in {self.root}")
+        names = sorted(os.listdir(directory))
+        model_files = [n for n in names if n.lower().endswith(MODEL_FILE_EXTENSIONS)]
+        if not model_files:
+            raise ModelValidationError(f"Model version '{version}' has no .keras/.h5 checkpoint")
+        model_path = os.path.join(directory, model_files[0])
+        golden_path = os.path.join(directory, GOLDEN_SET_FILE)
+        return Artifact(
+            version,
+            model_path,
+            metadata_path_for(model_path),
+            os.path.join(directory, "model.tflite"),
+            os.path.join(directory, "model.onnx"),
+            golden_path if os.path.exists(golden_path) else self.golden_path,
+        )
+
+    def plan(self):
+        manifest_path = os.path.join(self.root, REGISTRY_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        else:
+            versions = sorted(n for n in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, n)))
+            if not versions:
+                raise ModelValidationError(f"No model versions in {self.root}")
+            manifest = {"active": versions[-1]}
+
+        candidate = manifest.get("candidate")
+        mode = manifest.get("candidate_mode", "shadow")
+        if candidate and mode not in CANDIDATE_MODES:
+            raise ModelValidationError(f"candidate_mode must be one of {CANDIDATE_MODES}, got '{mode}'")
+        return {
+            "active": self.artifact(manifest["active"]),
+            "candidate": self.artifact(candidate) if candidate else None,
+            "candidate_mode": mode if candidate else None,
+            "candidate_traffic": float(manifest.get("candidate_traffic", 0.0)),
+        }
+
+
+class ModelVersion:
+    """A loaded model with everything that has to change together when it is swapped"""
+
+    def __init__(self, artifact, backend, label_set, batcher, prediction_cache):
+        self.artifact = artifact
+        self.version = artifact.version
+        self.backend = backend
+        self.label_set = label_set
+        self.batcher = batcher
+        self.prediction_cache = prediction_cache
+        self.signature = artifact_signature(artifact)
+        self.loaded_at = time.time()
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    @property
+    def num_classes(self):
+        return self.backend.num_classes
+
+    def predict(self, batch):
+        return self.batcher.predict(batch)
+
+    def close(self):
+        self.batcher.close()
+
+    def info(self):
+        return {
+            "version": self.version,
+            "backend": self.backend.name,
+            "model_path": self.artifact.model_path,
+            "labels_version": self.label_set.version,
+            "num_classes": self.label_set.num_classes,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def load_golden_set(path):
+    """[(image path, expected class name)] plus the checks to apply; None if there is no golden set"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        golden = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    golden["images"] = [(os.path.join(base, item["path"]), item["disease"]) for item in golden.get("images", [])]
+    return golden
+
+
+def validate(backend, label_set, preprocess, golden_path=None):
+    """Smoke-test a freshly loaded model before it takes traffic; raises ModelValidationError"""
+    try:
+        label_set.validate(backend.num_classes)
+    except ValueError as e:
+        raise ModelValidationError(str(e))
+
+    golden = load_golden_set(golden_path)
+    images = golden["images"] if golden else []
+    batch = np.zeros((len(images) + 1, 224, 224, 3), dtype=np.float32)
+    for slot, (path, _) in enumerate(images, start=1):
+        with open(path, "rb") as f:
+            preprocess(f.read(), label_set.resize_filter, out=batch[slot])
+
+    probabilities = np.asarray(backend.predict(batch))
+    if probabilities.shape != (len(batch), label_set.num_classes):
+        raise ModelValidationError(f"Output shape {probabilities.shape}, expected {(len(batch), label_set.num_classes)}")
+    if not np.isfinite(probabilities).all():
+        raise ModelValidationError("Output contains NaN or inf")
+    if not np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-2):
+        raise ModelValidationError("Output rows do not sum to 1 (missing softmax?)")
+    if not images:
+        return None
+
+    k = int(golden.get("top_k", 3))
+    index = {name: i for i, name in enumerate(label_set.names)}
+    ranked, _ = top_k(probabilities[1:], k)
+    hits = [index.get(disease) in row for (_, disease), row in zip(images, ranked.tolist())]
+    accuracy = sum(hits) / len(hits)
+    if accuracy < float(golden.get("min_accuracy", 1.0)):
+        misses = [os.path.basename(path) for (path, _), hit in zip(images, hits) if not hit]
+        raise ModelValidationError(f"Golden images: top-{k} accuracy {accuracy:.0%}, missed {', '.join(misses)}")
+    return accuracy
+
+
+class ModelRegistry:
+    """Active model (plus an optional candidate) that can be replaced while serving.
+
+    ``load_backend(artifact)`` builds an inference backend,
+    ``preprocess(data, resize_filter, out=slot)`` decodes image bytes into a
+    batch slot for the golden-image check and ``make_cache(version_tag)``
+    returns a prediction cache (or None).
+    """
+
+    def __init__(self, source, load_backend, preprocess, make_cache=None, max_batch_size=16, window_ms=10):
+        self.source = source
+        self.load_backend = load_backend
+        self.preprocess = preprocess
+        self.make_cache = make_cache or (lambda tag: None)
+        self.max_batch_size = max_batch_size
+        self.window_ms = window_ms
+
+        self.active = None
+        self.candidate = None
+        self.candidate_mode = None
+        self.candidate_traffic = 0.0
+        self.swaps = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_checked = None
+        self._failed = {}  # artifact signature -> error, so a bad file is not reloaded on every poll
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
+    def load(self, artifact):
+        """Load and validate one version without touching the active one"""
+        started = time.perf_counter()
+        backend = self.load_backend(artifact)
+        if backend is None:
+            raise ModelValidationError(f"No backend could be loaded for {artifact.model_path}")
+        label_set = load_labels(artifact.labels_path)
+        golden_accuracy = validate(backend, label_set, self.preprocess, artifact.golden_path)
+        batcher = MicroBatcher(backend.predict, max_batch_size=self.max_batch_size, window_ms=self.window_ms)
+        version = ModelVersion(artifact, backend, label_set, batcher, self.make_cache(f"{artifact.version}-{backend.name}"))
+        golden = f", golden top-k accuracy {golden_accuracy:.0%}" if golden_accuracy is not None else ""
+        logger.info(f"✅ Model version {artifact.version} ({backend.name}) validated in "
+                    f"{time.perf_counter() - started:.1f}s{golden}")
+        return version
+
+    def _replace(self, current, artifact):
+        """The loaded version for ``artifact``: ``current`` if unchanged, a new one if it validates"""
+        if artifact is None:
+            return None
+        signature = artifact_signature(artifact)
+        if current is not None and current.signature == signature:
+            return current
+        if signature in self._failed:
+            return current
+        try:
+            return self.load(artifact)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{artifact.version}: {e}"
+            self._failed[signature] = self.last_error
+            logger.error(f"❌ Model version {artifact.version} rejected, keeping "
+                         f"{current.version if current else 'no model'}: {e}")
+            return current
+
+    def reload(self):
+        """Bring the active and candidate versions in line with the source; returns True if anything swapped"""
+        with self._reload_lock:
+            self.last_checked = time.time()
+            try:
+                plan = self.source.plan()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"❌ Could not read model registry: {e}")
+                return False
+
+            old_active, old_candidate = self.active, self.candidate
+            new_active = self._replace(old_active, plan["active"])
+            new_candidate = self._replace(old_candidate, plan["candidate"])
+            if plan["candidate"] is not None and new_candidate is old_candidate \
+                    and (old_candidate is None or old_candidate.version != plan["candidate"].version):
+                new_candidate = None  # the requested candidate failed validation; do not keep an older one
+
+            # Plain attribute assignment: requests see either the old or the new version, never a mix
+            self.candidate_mode = plan["candidate_mode"]
+            self.candidate_traffic = plan["candidate_traffic"]
+            self.active = new_active
+            self.candidate = new_candidate
+
+            swapped = False
+            for old, new in ((old_active, new_active), (old_candidate, new_candidate)):
+                if old is not new and old is not None and old not in (new_active, new_candidate):
+                    old.close()
+                if old is not new:
+                    swapped = True
+            if new_active is not old_active and old_active is not None:
+                self.swaps += 1
+                logger.info(f"🔁 Active model is now {new_active.version} (was {old_active.version})")
+            return swapped
+
+    def route(self, key=None):
+        """(version that answers, version to shadow or None) for one request.
+
+        In A/B mode ``candidate_traffic`` of requests go to the candidate; the
+        split hashes ``key`` (the image bytes) so a re-submitted photo always
+        gets the same model.
+        """
+        active, candidate = self.active, self.candidate
+        if candidate is None or active is None:
+            return active, None
+        if self.candidate_mode == "shadow":
+            return active, candidate
+        bucket = zlib.crc32(key) / 2**32 if key else random.random()
+        return (candidate, None) if bucket < self.candidate_traffic else (active, None)
+
+    def watch(self, interval):
+        """Poll the source every ``interval`` seconds and hot-swap on changes"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"❌ Model reload failed: {e}")
+
+        if self._watcher is None and interval > 0:
+            self._watcher = threading.Thread(target=loop, name="model-registry-watch", daemon=True)
+            self._watcher.start()
+
+    def stats(self):
+        return {
+            "active": self.active.info() if self.active else None,
+            "candidate": self.candidate.info() if self.candidate else None,
+            "candidate_mode": self.candidate_mode,
+            "candidate_traffic": self.candidate_traffic,
+            "swaps": self.swaps,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_checked": self.last_checked,
+            "watching": self._watcher is not None,
+        }
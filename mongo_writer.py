@@ -0,0 +1,142 @@
+import base64
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """Buffer documents in memory and insert them with ``insert_many`` off the request thread.
+
+    A batch is flushed once ``batch_size`` documents are waiting or
+    ``flush_interval`` seconds have passed. While the database is unreachable
+    the batch stays buffered (up to ``max_buffer`` documents) and is retried
+    with backoff, so a slow or down Mongo never holds a web worker.
+    ``close()`` flushes what is buffered before the process exits.
+    """
+
+    def __init__(self, collection, batch_size=100, flush_interval=1.0, max_buffer=10000, max_backoff=30):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_backoff = max_backoff
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._backoff = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.last_error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="mongo-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, doc):
+        """Queue a document; False when the buffer is full (the database has been down too long)"""
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return False
+            self._buffer.append(doc)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def close(self, timeout=5):
+        """Flush everything buffered (without waiting out a backoff) and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:
+            left = len(self._buffer)
+        if left:
+            logger.warning(f"⚠️ MongoDB writer closed with {left} documents not written")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._buffer) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                closing = self._closed
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if batch:
+                self._flush(batch)
+            if closing:
+                with self._cond:
+                    if not self._buffer or self._backoff:
+                        return  # drained, or the database is down and nobody will wait for a retry
+                continue
+            if self._backoff:
+                time.sleep(self._backoff)
+
+    def _flush(self, batch):
+        from pymongo.errors import BulkWriteError, ConnectionFailure
+
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+            self._backoff = 0
+        except BulkWriteError as e:
+            # Individual documents were rejected; the rest of the batch is stored
+            rejected = len(e.details.get("writeErrors", []))
+            self.written += e.details.get("nInserted", 0)
+            self.dropped += rejected
+            self.last_error = str(e)
+            logger.error(f"❌ MongoDB rejected {rejected} buffered documents: {e}")
+        except ConnectionFailure as e:
+            self.failed_flushes += 1
+            self.last_error = str(e)
+            self._backoff = min(self.max_backoff, max(self.flush_interval, self._backoff * 2))
+            with self._cond:
+                self._buffer.extendleft(reversed(batch))  # retry the same batch first
+            logger.warning(f"⚠️ MongoDB unavailable, {len(self._buffer)} documents buffered: {e}")
+        except Exception as e:
+            self.failed_flushes += 1
+            self.dropped += len(batch)
+            self.last_error = str(e)
+            logger.error(f"❌ MongoDB write failed, dropped {len(batch)} documents: {e}")
+
+    def stats(self):
+        with self._cond:
+            buffered = len(self._buffer)
+        return {
+            "buffered": buffered,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "backoff_seconds": self._backoff,
+            "last_error": self.last_error,
+        }
+
+
+def encode_cursor(doc):
+    """Opaque pagination cursor pointing just past ``doc`` in (created_at, _id) descending order"""
+    created_at = doc.get("created_at")
+    stamp = created_at.isoformat() if isinstance(created_at, datetime) else ""
+    return base64.urlsafe_b64encode(f"{stamp}|{doc['_id']}".encode()).decode()
+
+
+def cursor_filter(cursor):
+    """Query matching the documents after ``cursor`` (raises ValueError if it is malformed)"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+
+    stamp, _, oid = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+    try:
+        oid = ObjectId(oid)
+    except InvalidId as e:
+        raise ValueError(str(e))
+    if not stamp:
+        # Legacy documents without a timestamp sort last
+        return {"created_at": None, "_id": {"$lt": oid}}
+    created_at = datetime.fromisoformat(stamp)
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": oid}},
+        {"created_at": None},
+    ]}
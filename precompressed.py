@@ -0,0 +1,81 @@
+"""Response bodies compressed once, at build time, and picked per request.
+
+A ``PrecompressedAsset`` holds the identity bytes plus gzip and (when the
+optional ``brotli`` package is installed) brotli variants, each kept only
+if it is actually smaller. ``respond()`` negotiates Accept-Encoding and
+answers If-None-Match with 304, without touching a compressor per request.
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Server preference when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def accepted_encodings(header):
+    """Encodings a request's Accept-Encoding allows (q > 0), as a set of lowercase names"""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedAsset:
+    """An immutable body with precomputed encodings; ``etag`` defaults to a content hash"""
+
+    def __init__(self, body, content_type, etag=None, min_size=256):
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag or content_hash(body)
+        self.variants = {}
+        if len(body) >= min_size:
+            compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed["br"] = brotli.compress(body, quality=11)
+            self.variants = {name: data for name, data in compressed.items() if len(data) < len(body)}
+
+    def negotiate(self, accept_encoding):
+        """(encoding or None, bytes) best suited to an Accept-Encoding header"""
+        accepted = accepted_encodings(accept_encoding)
+        for name in ENCODINGS:
+            if name in self.variants and (name in accepted or "*" in accepted):
+                return name, self.variants[name]
+        return None, self.body
+
+    def not_modified(self, if_none_match):
+        tags = {tag.strip().removeprefix("W/").strip('"') for tag in (if_none_match or "").split(",")}
+        return self.etag in tags or "*" in tags
+
+    def respond(self, request_headers, cache_control):
+        """(status, body, headers) for a GET with these request headers"""
+        headers = {
+            "ETag": f'"{self.etag}"',
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self.not_modified(request_headers.get("If-None-Match")):
+            return 304, b"", headers
+        encoding, body = self.negotiate(request_headers.get("Accept-Encoding"))
+        headers["Content-Type"] = self.content_type
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return 200, body, headers
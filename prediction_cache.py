@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DiskBackend:
+    """Shared prediction store on the local filesystem (visible to every worker)"""
+
+    name = "disk"
+
+    def __init__(self, directory, ttl, prune_every=256):
+        self.directory = directory
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, probabilities):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, probabilities)
+        os.replace(tmp_path, path)  # atomic, so readers never see a partial file
+
+        self._puts += 1
+        if self.ttl and self._puts % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Remove entries older than the TTL"""
+        cutoff = time.time() - self.ttl
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+class RedisBackend:
+    """Shared prediction store in Redis (or any server speaking its protocol)"""
+
+    name = "redis"
+
+    def __init__(self, url, ttl, prefix="prediction:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.2)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        return np.frombuffer(raw, dtype=np.float32)
+
+    def put(self, key, probabilities):
+        try:
+            data = np.asarray(probabilities, dtype=np.float32).tobytes()
+            if self.ttl:
+                self.client.setex(self.prefix + key, int(self.ttl), data)
+            else:
+                self.client.set(self.prefix + key, data)
+        except Exception:
+            pass
+
+
+class PredictionCache:
+    """LRU/TTL cache of softmax vectors keyed by image content and model version.
+
+    The in-process LRU is always consulted first; an optional shared backend
+    (disk or Redis) lets the other gunicorn workers reuse each other's results.
+    """
+
+    def __init__(self, max_entries=2048, ttl=3600, backend=None, model_version=""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.model_version = model_version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, data):
+        """Content hash of the uploaded image bytes, scoped to the model version"""
+        digest = hashlib.sha256(data)
+        digest.update(self.model_version.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, probabilities = entry
+                if not self.ttl or now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return probabilities
+                del self._entries[key]
+
+        if self.backend is not None:
+            probabilities = self.backend.get(key)
+            if probabilities is not None:
+                self._store(key, probabilities)
+                with self._lock:
+                    self.shared_hits += 1
+                return probabilities
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, probabilities):
+        probabilities = np.asarray(probabilities, dtype=np.float32).reshape(-1)
+        self._store(key, probabilities)
+        if self.backend is not None:
+            self.backend.put(key, probabilities)
+
+    def _store(self, key, probabilities):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), probabilities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "backend": self.backend.name if self.backend else "memory",
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def model_version_for(model_path):
+    """Cheap version tag for a checkpoint file (size + mtime), or "" if missing"""
+    try:
+        st = os.stat(model_path)
+    except OSError:
+        return ""
+    return f"{st.st_size:x}-{int(st.st_mtime):x}"
+
+
+def create_prediction_cache(model_version):
+    """Build the cache from environment configuration (None when disabled)"""
+    max_entries = int(os.getenv("PREDICTION_CACHE_SIZE", "2048"))
+    if max_entries <= 0:
+        return None
+    ttl = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+    backend_name = os.getenv("PREDICTION_CACHE_BACKEND", "memory").lower()
+
+    backend = None
+    try:
+        if backend_name == "disk":
+            backend = DiskBackend(os.getenv("PREDICTION_CACHE_DIR", ".cache/predictions"), ttl)
+        elif backend_name == "redis":
+            backend = RedisBackend(os.getenv("PREDICTION_CACHE_REDIS_URL", "redis://localhost:6379/0"), ttl)
+    except Exception as e:
+        logger.warning(f"⚠️ Prediction cache backend '{backend_name}' unavailable, using memory only: {e}")
+
+    return PredictionCache(max_entries=max_entries, ttl=ttl, backend=backend, model_version=model_version)
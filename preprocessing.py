@@ -0,0 +1,63 @@
+"""Image bytes -> normalized float32 model input, written straight into a batch slot.
+
+Decoding lets the JPEG decoder downscale in the DCT domain first (never below
+the target size), then the image is resized with the model's filter and
+scaled to [0, 1] by one ufunc call whose output is the destination slot.
+There is no intermediate float array, and callers that build batches
+(micro-batcher, /predict/batch, score_images.py, the registry's golden
+check) pass their own preallocated buffer.
+
+The resize filter is part of the model: model.py resizes training images
+with the same filter (``tf.image.resize`` method names below) and records
+it in the label artifact, and serving reads it back from there.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+# tf.image.resize method -> the PIL filter that matches it (both antialiased when downscaling)
+RESIZE_FILTERS = {
+    "nearest": Image.NEAREST,
+    "bilinear": Image.BILINEAR,
+    "bicubic": Image.BICUBIC,
+    "lanczos3": Image.LANCZOS,
+    "area": Image.BOX,
+}
+DEFAULT_RESIZE_FILTER = "bilinear"
+# Models trained before the filter was recorded used keras load_img's nearest-neighbour resize
+LEGACY_RESIZE_FILTER = "nearest"
+
+
+def open_image(data, size=IMAGE_SIZE):
+    """Decode upload bytes to an RGB image, letting JPEG decode at a reduced scale close to ``size``"""
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", size)
+    img.load()
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def resize_into(img, out, resize_filter=DEFAULT_RESIZE_FILTER):
+    """Resize a decoded image to ``out``'s (H, W) and write it there as float32 in [0, 1]"""
+    height, width = out.shape[:2]
+    if img.size != (width, height):
+        # reducing_gap shrinks huge (non-JPEG) images by integer factors first; same result, far fewer taps
+        img = img.resize((width, height), RESIZE_FILTERS[resize_filter],
+                         reducing_gap=None if resize_filter == "nearest" else 3.0)
+    np.divide(np.asarray(img), 255, out=out, dtype=np.float32)
+    return out
+
+
+def preprocess_into(data, out, resize_filter=DEFAULT_RESIZE_FILTER):
+    """Decode, resize and normalize image bytes into ``out``, an (H, W, 3) float32 slot of a batch"""
+    return resize_into(open_image(data, out.shape[1::-1]), out, resize_filter)
+
+
+def preprocess(data, resize_filter=DEFAULT_RESIZE_FILTER, size=IMAGE_SIZE):
+    """A fresh (1, H, W, 3) batch holding one preprocessed image"""
+    out = np.empty((1, size[1], size[0], 3), dtype=np.float32)
+    preprocess_into(data, out[0], resize_filter)
+    return out
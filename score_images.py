@@ -0,0 +1,237 @@
+"""Score every image under a directory offline and write one row per image.
+
+Uses the same preprocessing, labels and inference backends as the web app.
+Decoding runs on a thread pool (PIL releases the GIL) and is prefetched
+while the previous batch is in the model, so all cores stay busy on a
+CPU-only box. Finished rows are appended as they are produced; rerunning
+the same command skips images already in the output, so an interrupted
+run resumes where it stopped.
+
+    python score_images.py static/uploads --output scores.csv
+    python score_images.py dataset/Skin_Disease_Dataset/test --output scores.jsonl --batch-size 128
+    python score_images.py dataset/Skin_Disease_Dataset/test --output scores.parquet  # needs pyarrow
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("STARTUP_MODE", "manual")  # load the model here, not at app import
+os.environ.setdefault("SAVE_UPLOADS", "false")
+
+import numpy as np
+
+from app import IMAGE_EXTENSIONS, MODEL_PATH, preprocess_image_bytes
+from inference_backends import create_backend_from_env
+from labels import load_labels, metadata_path_for
+
+# The upload store keeps files it cannot name by type as .img
+SCORED_EXTENSIONS = IMAGE_EXTENSIONS + (".img",)
+FIELDS = ["path", "class_id", "disease", "confidence", "error"]
+
+
+def list_images(root):
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(SCORED_EXTENSIONS):
+                paths.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return paths
+
+
+def output_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}.get(ext)
+
+
+class ResultWriter:
+    """Append-only result sink; also reports which images a previous run already scored"""
+
+    def __init__(self, path, fmt, rows_per_part=2048):
+        self.path = path
+        self.fmt = fmt
+        self.rows_per_part = rows_per_part
+        self._pending = []
+        if fmt == "parquet":
+            import pyarrow  # noqa: F401  (fail before scoring if it is missing)
+
+            os.makedirs(path, exist_ok=True)
+            self._parts = len([n for n in os.listdir(path) if n.endswith(".parquet")])
+            self._file = None
+        else:
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            self._file = open(path, "a", newline="")
+            if fmt == "csv":
+                self._csv = csv.DictWriter(self._file, fieldnames=FIELDS)
+                if new_file:
+                    self._csv.writeheader()
+
+    def done(self):
+        """Paths already present in the output"""
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            done = set()
+            for name in os.listdir(self.path):
+                if name.endswith(".parquet"):
+                    done.update(pq.read_table(os.path.join(self.path, name), columns=["path"]).column("path").to_pylist())
+            return done
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, newline="") as f:
+            if self.fmt == "csv":
+                return {row["path"] for row in csv.DictReader(f)}
+            done = set()
+            for line in f:
+                try:
+                    done.add(json.loads(line)["path"])
+                except (ValueError, KeyError):
+                    pass  # a line cut short by an interrupted run
+            return done
+
+    def write(self, rows):
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+        elif self.fmt == "jsonl":
+            self._file.writelines(json.dumps(row) + "\n" for row in rows)
+        else:
+            self._pending.extend(rows)
+            if len(self._pending) >= self.rows_per_part:
+                self._write_part()
+            return
+        self._file.flush()  # every finished batch is a checkpoint
+
+    def _write_part(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._pending:
+            return
+        table = pa.Table.from_pylist(self._pending)
+        part = os.path.join(self.path, f"part-{self._parts:05d}.parquet")
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self._parts += 1
+        self._pending = []
+
+    def close(self):
+        if self.fmt == "parquet":
+            self._write_part()
+        else:
+            self._file.close()
+
+
+def load_slot(root, relpath, batch, slot, resize_filter):
+    """Decode one image into its slot of the batch array; returns an error string or None"""
+    try:
+        with open(os.path.join(root, relpath), "rb") as f:
+            preprocess_image_bytes(f.read(), resize_filter, out=batch[slot])
+        return None
+    except Exception as e:
+        return str(e) or type(e).__name__
+
+
+def decode_batch(pool, root, paths, resize_filter):
+    batch = np.empty((len(paths), 224, 224, 3), dtype=np.float32)
+    errors = list(pool.map(lambda item: load_slot(root, item[1], batch, item[0], resize_filter), enumerate(paths)))
+    return paths, batch, errors
+
+
+def score(backend, label_set, batch, paths, errors):
+    ok = [i for i, error in enumerate(errors) if error is None]
+    rows = []
+    predictions = backend.predict(batch[ok] if len(ok) < len(paths) else batch) if ok else []
+    for row, i in enumerate(ok):
+        class_id = int(np.argmax(predictions[row]))
+        rows.append({
+            "path": paths[i],
+            "class_id": class_id,
+            "disease": label_set.names[class_id],
+            "confidence": round(float(predictions[row][class_id]) * 100, 2),
+            "error": None,
+        })
+    for i, error in enumerate(errors):
+        if error is not None:
+            rows.append({"path": paths[i], "class_id": None, "disease": None, "confidence": None, "error": error})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="directory scanned recursively for images")
+    parser.add_argument("--output", required=True, help="results file: .csv, .jsonl or .parquet (a directory of parts)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Keras checkpoint (INFERENCE_BACKEND selects tflite/onnx)")
+    parser.add_argument("--batch-size", type=int, default=64, help="images per forward pass")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="decode threads")
+    parser.add_argument("--prefetch", type=int, default=2, help="batches decoded ahead of the model")
+    parser.add_argument("--limit", type=int, default=0, help="score at most this many new images")
+    args = parser.parse_args()
+
+    fmt = output_format(args.output)
+    if fmt is None:
+        parser.error("--output must end in .csv, .jsonl or .parquet")
+
+    writer = ResultWriter(args.output, fmt)
+    done = writer.done()
+    paths = [p for p in list_images(args.input_dir) if p not in done]
+    if args.limit:
+        paths = paths[:args.limit]
+    print(f"🗂️ {len(paths)} images to score ({len(done)} already in {args.output})")
+    if not paths:
+        writer.close()
+        return
+
+    backend = create_backend_from_env(args.model)
+    if backend is None:
+        sys.exit("❌ No model could be loaded")
+    label_set = load_labels(os.getenv("LABELS_PATH") or metadata_path_for(args.model))
+    label_set.validate(backend.num_classes)
+
+    chunks = [paths[i:i + args.batch_size] for i in range(0, len(paths), args.batch_size)]
+    started = time.perf_counter()
+    scored = failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool, \
+            ThreadPoolExecutor(max_workers=max(1, args.prefetch)) as prefetcher:
+        def prefetch(chunk):
+            return prefetcher.submit(decode_batch, pool, args.input_dir, chunk, label_set.resize_filter)
+
+        pending = [prefetch(chunk) for chunk in chunks[:args.prefetch + 1]]
+        next_chunk = len(pending)
+        try:
+            while pending:
+                chunk_paths, batch, errors = pending.pop(0).result()
+                if next_chunk < len(chunks):
+                    pending.append(prefetch(chunks[next_chunk]))
+                    next_chunk += 1
+
+                rows = score(backend, label_set, batch, chunk_paths, errors)
+                writer.write(rows)
+                scored += len(rows)
+                failed += sum(1 for row in rows if row["error"])
+                elapsed = time.perf_counter() - started
+                print(f"⚡ {scored}/{len(paths)} images, {scored / elapsed:.1f} images/sec", flush=True)
+        except KeyboardInterrupt:
+            print("⏸️ Interrupted; rerun the same command to resume")
+            for future in pending:
+                future.cancel()
+        finally:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "images": scored,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(scored / elapsed, 1) if elapsed else None,
+        "backend": backend.name,
+        "batch_size": args.batch_size,
+        "workers": args.workers,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Twilio error codes that retrying cannot fix
+UNVERIFIED_CODES = {21608, 21614}
+CREDENTIAL_CODES = {20003, 20404}
+
+
+def normalize_phone(phone, default_country_code="+91"):
+    """Strip formatting and add a country code (+91 unless one is given)"""
+    phone = phone.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
+    if phone.startswith("+"):
+        return phone
+    if phone.startswith("91") and len(phone) == 12:
+        return "+" + phone
+    return default_country_code + phone
+
+
+class SmsError(Exception):
+    """A failed send; ``code`` is the app-level error name reported to clients"""
+
+    def __init__(self, code, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.code = code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class TwilioSender:
+    """Send messages through the Twilio REST API over one pooled HTTP session.
+
+    ``api_base`` can point at a local fake (benchmarks/fake_twilio.py) for testing.
+    """
+
+    def __init__(self, account_sid, auth_token, from_number,
+                 api_base="https://api.twilio.com", timeout=10, pool_size=4):
+        import requests  # installed with the twilio package
+
+        self.from_number = from_number
+        self.url = f"{api_base.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.timeout = timeout
+        self.demo = account_sid.startswith("YOUR_ACTUAL")
+        self._requests = requests
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def send(self, body, to):
+        """Return the message SID or raise SmsError"""
+        if self.demo:
+            logger.info("🧪 DEMO MODE: SMS would be sent with real Twilio credentials")
+            return "DEMO_SMS_SUCCESS"
+        try:
+            response = self.session.post(
+                self.url,
+                data={"Body": body, "From": self.from_number, "To": to},
+                timeout=self.timeout,
+            )
+        except self._requests.RequestException as e:
+            raise SmsError("SMS_FAILED", str(e), retryable=True)
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.status_code < 300:
+            return payload.get("sid")
+
+        message = payload.get("message") or f"HTTP {response.status_code}"
+        code = payload.get("code")
+        if code in UNVERIFIED_CODES or "unverified" in message.lower():
+            raise SmsError("UNVERIFIED_NUMBER", message)
+        if response.status_code == 401 or code in CREDENTIAL_CODES:
+            raise SmsError("INVALID_CREDENTIALS", message)
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise SmsError("SMS_FAILED", message, retryable=True,
+                           retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise SmsError("SMS_FAILED", message)
+
+
+class TokenBucket:
+    """Blocking rate limiter shared by all sender threads"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SmsQueue:
+    """Outbound SMS jobs sent by a background worker pool.
+
+    ``enqueue`` returns immediately with a job id; failed sends that may
+    succeed later (timeouts, 429, 5xx) are retried with exponential backoff
+    and jitter. Finished jobs are kept (up to ``max_jobs``) so clients can
+    poll their delivery status.
+
+    With ``status_dir``, every state change is also written to
+    ``<status_dir>/<job id>.json``, so any worker process sharing the
+    directory can answer a status poll for a job another worker queued.
+    """
+
+    def __init__(self, sender, workers=2, max_attempts=4, backoff_base=0.5, backoff_max=30,
+                 rate_per_sec=1.0, burst=5, max_jobs=1000, status_dir=None):
+        self.sender = sender
+        self.status_dir = status_dir
+        if status_dir:
+            os.makedirs(status_dir, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_jobs = max_jobs
+        self.limiter = TokenBucket(rate_per_sec, burst)
+        self._jobs = OrderedDict()
+        self._ready = []  # heap of (due time, seq, job id)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"sms-sender-{i}", daemon=True).start()
+
+    def enqueue(self, body, to):
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "to": to,
+                "body": body,
+                "state": "queued",
+                "attempts": 0,
+                "sid": None,
+                "error": None,
+                "message": None,
+                "created_at": time.time(),
+                "updated_at": time.time(),
+            }
+            evicted = []
+            while len(self._jobs) > self.max_jobs:
+                oldest = next(iter(self._jobs))
+                if self._jobs[oldest]["state"] not in ("sent", "failed"):
+                    break
+                evicted.append(self._jobs.popitem(last=False)[0])
+            heapq.heappush(self._ready, (time.monotonic(), next(self._seq), job_id))
+            self._persist(self._jobs[job_id])
+            self._cond.notify_all()
+        for old_id in evicted:
+            self._forget(old_id)
+        return job_id
+
+    @staticmethod
+    def _public(job):
+        return {k: v for k, v in job.items() if k != "body"}
+
+    def status(self, job_id):
+        """Public view of a job (without the message body), or None if unknown"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._public(job)
+        return self._load(job_id)
+
+    def _status_path(self, job_id):
+        # Job ids are uuid4 hex; anything else cannot have been issued here
+        if not self.status_dir or len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        return os.path.join(self.status_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        """Write a job's public state; called with ``_cond`` held, so files change in state order"""
+        path = self._status_path(job["job_id"])
+        if path is None:
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._public(job), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("⚠️ Could not record SMS job %s status: %s", job["job_id"], e)
+
+    def _load(self, job_id):
+        path = self._status_path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _forget(self, job_id):
+        path = self._status_path(job_id)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def wait(self, job_id, timeout=30):
+        """Block until the job is sent or has failed; returns its status"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["state"] in ("sent", "failed") or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return self.status(job_id)
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._ready:
+                    due, _, job_id = self._ready[0]
+                    delay = due - time.monotonic()
+                    if delay <= 0:
+                        heapq.heappop(self._ready)
+                        job = self._jobs.get(job_id)
+                        if job is None:
+                            continue
+                        job["state"] = "sending"
+                        job["attempts"] += 1
+                        self._persist(job)
+                        return job
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            self.limiter.acquire()
+            try:
+                sid = self.sender.send(job["body"], job["to"])
+            except SmsError as e:
+                self._failed(job, e)
+            except Exception as e:
+                self._failed(job, SmsError("SMS_FAILED", str(e)))
+            else:
+                with self._cond:
+                    job.update(state="sent", sid=sid, error=None, message=None, updated_at=time.time())
+                    self.sent += 1
+                    self._persist(job)
+                    self._cond.notify_all()
+                logger.info("✅ SMS job %s sent, SID: %s", job["job_id"], sid)
+
+    def _failed(self, job, error):
+        with self._cond:
+            job.update(error=error.code, message=str(error), updated_at=time.time())
+            if error.retryable and job["attempts"] < self.max_attempts:
+                delay = error.retry_after
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (job["attempts"] - 1)))
+                job["state"] = "retrying"
+                self.retries += 1
+                heapq.heappush(self._ready, (time.monotonic() + delay, next(self._seq), job["job_id"]))
+            else:
+                job["state"] = "failed"
+                self.failed += 1
+            self._persist(job)
+            self._cond.notify_all()
+        logger.warning("⚠️ SMS job %s attempt %d failed (%s): %s",
+                       job["job_id"], job["attempts"], error.code, error)
+
+    def stats(self):
+        with self._cond:
+            states = {}
+            for job in self._jobs.values():
+                states[job["state"]] = states.get(job["state"], 0) + 1
+            return {
+                "pending": states.get("queued", 0) + states.get("retrying", 0) + states.get("sending", 0),
+                "states": states,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "rate_per_sec": self.limiter.rate,
+                "max_attempts": self.max_attempts,
+            }
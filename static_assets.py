@@ -0,0 +1,73 @@
+"""Serving side of build_static.py: the fingerprinted asset manifest.
+
+The manifest maps logical paths (``images/D.png``) to content-hashed files
+in the build directory. Pages get their ``static/...`` references rewritten
+to ``/assets/<fingerprinted path>`` once, when they are rendered into the
+page cache; without a build the pages keep their original URLs and Flask's
+/static route serves them as before.
+"""
+import json
+import logging
+import os
+import re
+
+from precompressed import ENCODINGS, accepted_encodings
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_SCHEMA = 1
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+ASSET_URL_PREFIX = "/assets/"
+# src="../static/x.png", href='/static/x.css', url(static/x.png) - relative or absolute
+STATIC_URL = re.compile(r"""(?<=["'(])(?:\.\./)*/?static/([^"'()?#\s]+)""")
+
+logger = logging.getLogger("dermasense")
+
+
+class AssetManifest:
+    """Lookup from logical and fingerprinted paths to build entries"""
+
+    def __init__(self, directory, assets=None):
+        self.directory = directory
+        self.assets = assets or {}
+        self.by_path = {entry["path"]: entry for entry in self.assets.values()}
+
+    @classmethod
+    def load(cls, directory):
+        """The manifest in ``directory``; empty (nothing fingerprinted) when there is no build"""
+        path = os.path.join(directory, MANIFEST_NAME)
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logger.info(f"ℹ️ No static build at {directory}; run build_static.py to fingerprint assets")
+            return cls(directory)
+        if manifest.get("schema") != MANIFEST_SCHEMA:
+            raise ValueError(f"Unsupported static manifest schema: {manifest.get('schema')}")
+        logger.info(f"✅ Loaded {len(manifest['assets'])} fingerprinted static assets from {directory}")
+        return cls(directory, manifest["assets"])
+
+    def __len__(self):
+        return len(self.assets)
+
+    def url_for(self, logical):
+        """/assets/ URL of a logical path, or None if it was not built"""
+        entry = self.assets.get(logical)
+        return ASSET_URL_PREFIX + entry["path"] if entry else None
+
+    def rewrite_urls(self, html):
+        """Point every built static/... reference in a page at its fingerprinted URL"""
+        if not self.assets:
+            return html
+        return STATIC_URL.sub(lambda m: self.url_for(m.group(1)) or m.group(0), html)
+
+    def lookup(self, path):
+        """Build entry for a fingerprinted path, or None"""
+        return self.by_path.get(path)
+
+    def negotiate(self, entry, accept_encoding):
+        """(encoding or None, file path relative to the build directory) for a request"""
+        accepted = accepted_encodings(accept_encoding)
+        for name in ENCODINGS:
+            if name in entry["encodings"] and (name in accepted or "*" in accepted):
+                return name, entry["path"] + VARIANT_SUFFIXES[name]
+        return None, entry["path"]
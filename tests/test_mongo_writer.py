@@ -0,0 +1,171 @@
+"""BufferedWriter batching/backoff and the /messages cursor pagination (mongomock)."""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from mongo_writer import BufferedWriter, cursor_filter, encode_cursor
+
+
+class RecordingCollection:
+    """insert_many sink that can be switched to 'database down'"""
+
+    def __init__(self):
+        self.batches = []
+        self.down = False
+        self.lock = threading.Lock()
+
+    def insert_many(self, docs, ordered=True):
+        if self.down:
+            raise ServerSelectionTimeoutError("fake mongod is down")
+        with self.lock:
+            self.batches.append(list(docs))
+
+    @property
+    def docs(self):
+        with self.lock:
+            return [doc for batch in self.batches for doc in batch]
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_flushes_when_batch_is_full():
+    collection = RecordingCollection()
+    writer = BufferedWriter(collection, batch_size=5, flush_interval=60)
+    for i in range(5):
+        assert writer.submit({"n": i})
+    assert wait_until(lambda: len(collection.docs) == 5)
+    assert [len(batch) for batch in collection.batches] == [5]
+    assert writer.stats()["written"] == 5
+
+
+def test_flushes_partial_batch_after_interval():
+    collection = RecordingCollection()
+    writer = BufferedWriter(collection, batch_size=100, flush_interval=0.1)
+    writer.submit({"n": 1})
+    writer.submit({"n": 2})
+    assert wait_until(lambda: len(collection.docs) == 2, timeout=2)
+    assert writer.stats()["buffered"] == 0
+
+
+def test_close_flushes_everything_buffered():
+    collection = RecordingCollection()
+    writer = BufferedWriter(collection, batch_size=4, flush_interval=60)
+    for i in range(10):
+        writer.submit({"n": i})
+    writer.close()
+    assert [doc["n"] for doc in collection.docs] == list(range(10))
+    assert writer.stats()["buffered"] == 0
+
+
+def test_buffer_is_bounded_while_database_is_down():
+    collection = RecordingCollection()
+    collection.down = True
+    writer = BufferedWriter(collection, batch_size=2, flush_interval=0.05, max_buffer=5, max_backoff=0.1)
+    accepted = [writer.submit({"n": i}) for i in range(8)]
+    assert accepted == [True] * 5 + [False] * 3
+    assert wait_until(lambda: writer.stats()["failed_flushes"] >= 1)
+    stats = writer.stats()
+    assert stats["dropped"] == 3
+    assert stats["buffered"] == 5  # the failed batch went back to the front of the buffer
+    assert stats["backoff_seconds"] > 0
+
+    collection.down = False
+    assert wait_until(lambda: len(collection.docs) == 5)
+    assert [doc["n"] for doc in collection.docs] == [0, 1, 2, 3, 4]
+    assert writer.stats()["backoff_seconds"] == 0
+
+
+def test_close_gives_up_when_database_is_down():
+    collection = RecordingCollection()
+    collection.down = True
+    writer = BufferedWriter(collection, batch_size=10, flush_interval=60)
+    writer.submit({"n": 1})
+    started = time.monotonic()
+    writer.close(timeout=5)
+    assert time.monotonic() - started < 2
+    assert collection.docs == []
+
+
+def test_cursor_round_trip_and_malformed_cursors():
+    from bson import ObjectId
+
+    doc = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30)}
+    query = cursor_filter(encode_cursor(doc))
+    assert query["$or"][1] == {"created_at": doc["created_at"], "_id": {"$lt": doc["_id"]}}
+    legacy = cursor_filter(encode_cursor({"_id": doc["_id"]}))
+    assert legacy == {"created_at": None, "_id": {"$lt": doc["_id"]}}
+    for bad in ("not-a-cursor", "!!!", encode_cursor({"_id": "nope", "created_at": None})):
+        with pytest.raises(ValueError):
+            cursor_filter(bad)
+
+
+@pytest.fixture
+def messages_client(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    os.environ.setdefault("STARTUP_MODE", "manual")
+    os.environ.setdefault("SAVE_UPLOADS", "false")
+    import app
+
+    db = mongomock.MongoClient().contactDB
+
+    class FakePyMongo:
+        pass
+
+    fake = FakePyMongo()
+    fake.db = db
+    monkeypatch.setattr(app, "mongo", fake)
+    return app.app.test_client(), db.contacts
+
+
+def test_messages_pages_through_every_document_once(messages_client):
+    client, contacts = messages_client
+    base = datetime(2024, 1, 1)
+    # Two documents share each timestamp, so pages must break ties by _id
+    for i in range(7):
+        contacts.insert_one({"name": f"n{i}", "email": "e", "message": "m",
+                             "created_at": base + timedelta(minutes=i // 2)})
+    contacts.insert_one({"name": "legacy", "email": "e", "message": "m"})
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        query = {"limit": 3} | ({"cursor": cursor} if cursor else {})
+        response = client.get("/messages", query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [doc["name"] for doc in body["messages"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+        assert pages < 10
+
+    assert sorted(seen) == sorted([f"n{i}" for i in range(7)] + ["legacy"])
+    assert len(seen) == len(set(seen))
+    assert seen[-1] == "legacy"  # documents without a timestamp sort last
+
+
+def test_messages_rejects_invalid_cursor(messages_client):
+    client, _ = messages_client
+    response = client.get("/messages", query_string={"cursor": "garbage"})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+def test_messages_without_database_is_503(monkeypatch):
+    os.environ.setdefault("STARTUP_MODE", "manual")
+    os.environ.setdefault("SAVE_UPLOADS", "false")
+    import app
+
+    monkeypatch.setattr(app, "mongo", None)
+    assert app.app.test_client().get("/messages").status_code == 503
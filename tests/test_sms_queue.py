@@ -0,0 +1,113 @@
+"""SmsQueue + TwilioSender against the local fake Twilio server (benchmarks/fake_twilio.py)."""
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_twilio import make_server
+from sms_queue import SmsQueue, TwilioSender
+
+
+@pytest.fixture
+def twilio():
+    server = make_server(port=0, latency_ms=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_queue(server, **kwargs):
+    host, port = server.server_address
+    sender = TwilioSender("ACtest", "token", "+15550000000", api_base=f"http://{host}:{port}", timeout=5)
+    kwargs.setdefault("rate_per_sec", 0)
+    kwargs.setdefault("backoff_base", 0.01)
+    return SmsQueue(sender, **kwargs)
+
+
+def test_sends_and_reports_sid(twilio):
+    queue = make_queue(twilio)
+    status = queue.wait(queue.enqueue("hello", "+15551234567"), timeout=10)
+    assert status["state"] == "sent"
+    assert status["sid"].startswith("SM")
+    assert status["attempts"] == 1
+    assert "body" not in status
+
+
+def test_429_waits_for_retry_after(twilio):
+    twilio.scripted.append((429, {"code": 20429, "message": "Too Many Requests"}, {"Retry-After": "1"}))
+    queue = make_queue(twilio)
+    started = time.monotonic()
+    status = queue.wait(queue.enqueue("hello", "+15551234567"), timeout=10)
+    assert status["state"] == "sent"
+    assert status["attempts"] == 2
+    assert time.monotonic() - started >= 1.0
+    assert queue.stats()["retries"] == 1
+
+
+def test_5xx_is_retried_with_backoff(twilio):
+    for _ in range(2):
+        twilio.scripted.append((503, {"message": "Service Unavailable"}, None))
+    queue = make_queue(twilio, max_attempts=4)
+    status = queue.wait(queue.enqueue("hello", "+15551234567"), timeout=10)
+    assert status["state"] == "sent"
+    assert status["attempts"] == 3
+
+
+def test_5xx_gives_up_after_max_attempts(twilio):
+    for _ in range(3):
+        twilio.scripted.append((500, {"message": "Internal Server Error"}, None))
+    queue = make_queue(twilio, max_attempts=3)
+    status = queue.wait(queue.enqueue("hello", "+15551234567"), timeout=10)
+    assert status["state"] == "failed"
+    assert status["error"] == "SMS_FAILED"
+    assert status["attempts"] == 3
+
+
+def test_permanent_4xx_is_not_retried(twilio):
+    queue = make_queue(twilio)
+    status = queue.wait(queue.enqueue("hello", "+9995551234"), timeout=10)
+    assert status["state"] == "failed"
+    assert status["error"] == "UNVERIFIED_NUMBER"
+    assert status["attempts"] == 1
+    assert twilio.stats["rejected"] == 1
+
+
+def test_invalid_credentials_fail_without_retry(twilio):
+    twilio.scripted.append((401, {"code": 20003, "message": "Authenticate"}, None))
+    queue = make_queue(twilio)
+    status = queue.wait(queue.enqueue("hello", "+15551234567"), timeout=10)
+    assert status["state"] == "failed"
+    assert status["error"] == "INVALID_CREDENTIALS"
+    assert status["attempts"] == 1
+
+
+def test_rate_limit_spaces_sends(twilio):
+    queue = make_queue(twilio, rate_per_sec=10, burst=1, workers=2)
+    started = time.monotonic()
+    job_ids = [queue.enqueue("hello", "+15551234567") for _ in range(4)]
+    assert all(queue.wait(job_id, timeout=10)["state"] == "sent" for job_id in job_ids)
+    # One token up front, then one every 100 ms
+    assert time.monotonic() - started >= 0.3
+
+
+def test_status_is_visible_to_another_worker(twilio, tmp_path):
+    twilio.scripted.append((429, {"message": "Too Many Requests"}, {"Retry-After": "1"}))
+    owner = make_queue(twilio, status_dir=str(tmp_path))
+    other = make_queue(twilio, workers=0, status_dir=str(tmp_path))
+
+    job_id = owner.enqueue("hello", "+15551234567")
+    assert other.status(job_id)["state"] in ("queued", "sending", "retrying")
+    owner.wait(job_id, timeout=10)
+    status = other.status(job_id)
+    assert status["state"] == "sent"
+    assert status["attempts"] == 2
+    assert status == owner.status(job_id)
+
+
+def test_unknown_job_ids_are_not_read_from_disk(tmp_path):
+    (tmp_path / "secret.json").write_text("{}")
+    queue = SmsQueue(sender=None, workers=0, status_dir=str(tmp_path))
+    assert queue.status("0" * 32) is None
+    assert queue.status("../secret") is None
@@ -0,0 +1,55 @@
+"""UploadStore dedup and eviction when several workers share one directory."""
+import os
+import time
+
+from upload_store import UploadStore
+
+
+def make_store(root, **kwargs):
+    kwargs.setdefault("writer_threads", 1)
+    kwargs.setdefault("rescan_interval", 3600)
+    return UploadStore(str(root), **kwargs)
+
+
+def saved(store, data, filename="x.png"):
+    relpath = store.save(data, filename)
+    store.wait(relpath)
+    return relpath
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    store = make_store(tmp_path)
+    first = saved(store, b"a" * 10)
+    assert saved(store, b"a" * 10) == first
+    assert store.stats()["files"] == 1
+    assert store.stats()["dedup_hits"] == 1
+
+
+def test_dedup_hit_rewrites_a_file_another_worker_evicted(tmp_path):
+    ours = make_store(tmp_path)
+    theirs = make_store(tmp_path, max_bytes=15)
+    relpath = saved(ours, b"a" * 10)
+    theirs._load_index()
+
+    saved(theirs, b"b" * 10)  # over budget: their oldest file (ours) is evicted
+    assert not os.path.exists(tmp_path / relpath)
+
+    assert saved(ours, b"a" * 10) == relpath
+    assert (tmp_path / relpath).read_bytes() == b"a" * 10
+    assert ours.stats()["dedup_hits"] == 0
+
+
+def test_dedup_hit_protects_the_file_from_another_workers_eviction(tmp_path):
+    ours = make_store(tmp_path)
+    theirs = make_store(tmp_path, max_bytes=25)
+    old = saved(theirs, b"a" * 10)
+    newer = saved(theirs, b"b" * 10)
+    for relpath, age in ((old, 60), (newer, 30)):
+        os.utime(tmp_path / relpath, (time.time() - age,) * 2)
+    theirs._load_index()
+
+    assert saved(ours, b"a" * 10) == old  # dedup hit in another worker touches the file
+    saved(theirs, b"c" * 10)
+
+    assert os.path.exists(tmp_path / old)
+    assert not os.path.exists(tmp_path / newer)
@@ -0,0 +1,66 @@
+"""Test-time augmentation: several views of one image scored in a single forward pass.
+
+Every view is a nearest-neighbour resampling of the preprocessed image, so
+it is a precomputed map of source pixel indices applied with one ``np.take``
+gather straight into its slot of the batch. The views stay inside the range
+model.py augments with during training (horizontal flip, rotation up to 30
+degrees, zoom up to 20 %), and out-of-frame pixels repeat the nearest edge
+like its ``fill_mode="nearest"``.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# (horizontal flip, zoom factor, rotation in degrees); the first n are used for n views
+VIEWS = (
+    (False, 1.0, 0),
+    (True, 1.0, 0),
+    (False, 1.15, 0),
+    (True, 1.15, 0),
+    (False, 1.0, 15),
+    (False, 1.0, -15),
+    (True, 1.0, 15),
+    (True, 1.0, -15),
+)
+MAX_VIEWS = len(VIEWS)
+
+
+@lru_cache(maxsize=64)
+def view_indices(height, width, flip, zoom, angle):
+    """Flat source pixel index for every output pixel of one view, clipped to the image"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    cy, cx = (height - 1) / 2, (width - 1) / 2
+    if flip:
+        x = (width - 1) - x
+    theta = np.deg2rad(angle)
+    dy, dx = (y - cy) / zoom, (x - cx) / zoom
+    rows = cy + dy * np.cos(theta) - dx * np.sin(theta)
+    cols = cx + dy * np.sin(theta) + dx * np.cos(theta)
+    rows = np.clip(np.rint(rows), 0, height - 1).astype(np.intp)
+    cols = np.clip(np.rint(cols), 0, width - 1).astype(np.intp)
+    return (rows * width + cols).ravel()
+
+
+def make_views(image, views, out=None):
+    """Stack the first ``views`` augmentations of an (H, W, C) image into an (n, H, W, C) batch"""
+    views = max(1, min(int(views), MAX_VIEWS))
+    height, width, channels = image.shape
+    pixels = image.reshape(-1, channels)
+    if out is None:
+        out = np.empty((views,) + image.shape, dtype=image.dtype)
+    for slot, (flip, zoom, angle) in enumerate(VIEWS[:views]):
+        if not flip and zoom == 1.0 and angle == 0:
+            if not np.shares_memory(out[slot], image):  # the image may already be decoded into slot 0
+                out[slot] = image
+        else:
+            np.take(pixels, view_indices(height, width, flip, zoom, angle), axis=0,
+                    out=out[slot].reshape(-1, channels))
+    return out
+
+
+def average_views(probabilities, views):
+    """Mean softmax per image from a (batch * views, num_classes) matrix grouped by image"""
+    probabilities = np.asarray(probabilities)
+    if views <= 1:
+        return probabilities
+    return probabilities.reshape(-1, views, probabilities.shape[-1]).mean(axis=1)
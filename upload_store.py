@@ -0,0 +1,213 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Extensions kept for stored originals; anything else is stored under .img
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+
+class UploadStore:
+    """Content-addressed, size-capped upload storage written off the request thread.
+
+    Files live at ``<root>/<h[:2]>/<h[2:4]>/<h>.<ext>`` where ``h`` is the
+    SHA-256 of the uploaded bytes, so names never collide and identical
+    uploads are stored once. When the byte budget is exceeded the least
+    recently stored files are evicted first.
+
+    Several worker processes may share ``root``. Each keeps its own index, but
+    re-reads the directory at most every ``rescan_interval`` seconds before
+    enforcing the budget, so the budget covers every worker's files (it can
+    be overshot by what the other workers wrote since the last rescan). Files
+    another worker stored are picked up from disk on a miss. A dedup hit
+    touches the file (storing it again if it is gone), and eviction spares
+    files touched since the last rescan, so a returned path stays servable.
+    """
+
+    def __init__(self, root, max_bytes=800 * 2**20, thumbnail_size=0, writer_threads=2, rescan_interval=30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.rescan_interval = rescan_interval
+        self._executor = ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="upload-writer")
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._index = OrderedDict()  # relative path -> size, oldest first
+        self._total_bytes = 0
+        self.evictions = 0
+        self.dedup_hits = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """(Re)index what is on disk (including legacy flat uploads and other workers' files) by mtime"""
+        scanned_at = time.monotonic()
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith(".") or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, os.path.relpath(path, self.root), st.st_size))
+        index = OrderedDict((relpath, size) for _, relpath, size in sorted(entries))
+        with self._lock:
+            self._index = index
+            self._total_bytes = sum(index.values())
+            self._indexed_at = scanned_at
+            self._indexed_wall = time.time() - (time.monotonic() - scanned_at)
+
+    def _on_disk(self, relpath):
+        """Size of a file another worker stored (adding it to this index), or None"""
+        try:
+            size = os.stat(os.path.join(self.root, relpath)).st_size
+        except OSError:
+            return None
+        with self._lock:
+            if relpath not in self._index:
+                self._index[relpath] = size
+                self._total_bytes += size
+        return size
+
+    def relative_path(self, digest, filename):
+        if self.thumbnail_size:
+            ext = ".jpg"
+        else:
+            ext = os.path.splitext(filename or "")[1].lower()
+            if ext not in STORED_EXTENSIONS:
+                ext = ".img"
+        return os.path.join(digest[:2], digest[2:4], digest + ext)
+
+    def save(self, data, filename=None):
+        """Schedule a background write and return the file's path relative to the store root"""
+        digest = hashlib.sha256(data).hexdigest()
+        relpath = self.relative_path(digest, filename)
+        with self._lock:
+            known = relpath in self._index or relpath in self._pending
+        if not known:
+            self._on_disk(relpath)
+
+        with self._lock:
+            if relpath in self._index and relpath not in self._pending:
+                # Identical upload already stored: mark it as recently used. Touching the
+                # file also tells other workers' eviction it is in use; if one of them
+                # already evicted it, store it again below.
+                try:
+                    os.utime(os.path.join(self.root, relpath))
+                except FileNotFoundError:
+                    self._total_bytes -= self._index.pop(relpath)
+                except OSError:
+                    pass
+                else:
+                    self._index.move_to_end(relpath)
+                    self.dedup_hits += 1
+                    return relpath
+            elif relpath in self._pending:
+                self.dedup_hits += 1
+                return relpath
+            self._pending[relpath] = self._executor.submit(self._write, relpath, data)
+        return relpath
+
+    def _write(self, relpath, data):
+        path = os.path.join(self.root, relpath)
+        try:
+            if self.thumbnail_size:
+                data = self._thumbnail(data)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._index[relpath] = len(data)
+                self._total_bytes += len(data)
+                stale = time.monotonic() - self._indexed_at > self.rescan_interval
+            if stale:
+                self._load_index()
+            self._enforce_budget()
+        except Exception as e:
+            logger.error(f"❌ Failed to store upload {relpath}: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(relpath, None)
+
+    def _thumbnail(self, data):
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (self.thumbnail_size, self.thumbnail_size))
+        img = img.convert("RGB")
+        img.thumbnail((self.thumbnail_size, self.thumbnail_size))
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=85, optimize=True)
+        return out.getvalue()
+
+    def _enforce_budget(self):
+        reprieved = set()
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or len(self._index) <= 1:
+                    return
+                relpath, size = self._index.popitem(last=False)
+                self._total_bytes -= size
+                path = os.path.join(self.root, relpath)
+                if relpath not in reprieved and self._touched_since_scan(path):
+                    # Another worker served it as a dedup hit since our last rescan
+                    reprieved.add(relpath)
+                    self._index[relpath] = size
+                    self._total_bytes += size
+                    continue
+                self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already removed (e.g. by another worker)
+
+    def _touched_since_scan(self, path):
+        try:
+            return os.stat(path).st_mtime > self._indexed_wall
+        except OSError:
+            return False
+
+    def wait(self, relpath, timeout=5, other_worker_timeout=1.0):
+        """Wait for an in-flight write of ``relpath`` (no-op if it is already on disk).
+
+        A write queued by another worker process is not visible here, so a
+        file that is not on disk yet is polled for up to ``other_worker_timeout``.
+        """
+        with self._lock:
+            future = self._pending.get(relpath)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+            return
+        digest = os.path.splitext(os.path.basename(relpath))[0]
+        if len(digest) != 64 or relpath != self.relative_path(digest, relpath):
+            return  # not a name this store hands out (legacy upload or a bad URL): nothing to wait for
+        path = os.path.join(self.root, relpath)
+        deadline = time.monotonic() + other_worker_timeout
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "pending_writes": len(self._pending),
+                "dedup_hits": self.dedup_hits,
+                "evictions": self.evictions,
+                "thumbnail_size": self.thumbnail_size or None,
+            }
@@ -0,0 +1,79 @@
+import io
+import threading
+
+from PIL import Image
+
+# Leading bytes of the formats the model pipeline accepts
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+)
+
+
+class UploadRejected(Exception):
+    """An upload refused before it is decoded; ``reason`` is a stable counter key"""
+
+    def __init__(self, reason, message, status=400):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+        self.status = status
+
+
+class RejectionCounter:
+    """Thread-safe counts of rejected uploads by reason"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def add(self, reason):
+        with self._lock:
+            self._counts[reason] = self._counts.get(reason, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def sniff_format(data):
+    """Identify the image format from its magic bytes (None if unsupported)"""
+    for magic, fmt in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return fmt
+    return None
+
+
+def probe_image(data, max_bytes, max_pixels):
+    """Validate size, format and dimensions by reading only the image header.
+
+    Returns ``(format, (width, height))`` or raises UploadRejected.
+    """
+    if not data:
+        raise UploadRejected("empty_file", "Uploaded file is empty!")
+    if len(data) > max_bytes:
+        raise UploadRejected("file_too_large", f"Image is too large (max {max_bytes // 2**20} MB)", 413)
+
+    fmt = sniff_format(data)
+    if fmt is None:
+        raise UploadRejected("unsupported_format", "Invalid file type. Please upload an image.")
+
+    try:
+        # Image.open only parses the header; pixel data is not decoded here. Sizes between
+        # max_pixels and Pillow's own bomb limit are refused by the explicit check below
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            header_format = img.format
+    except Image.DecompressionBombError:
+        raise UploadRejected("too_many_pixels", "Image dimensions are too large.", 413)
+    except Exception:
+        raise UploadRejected("corrupt_image", "Could not read the image header.")
+
+    if header_format != fmt:
+        raise UploadRejected("format_mismatch", "Image content does not match a supported format.")
+    if width * height > max_pixels:
+        raise UploadRejected("too_many_pixels", f"Image dimensions are too large ({width}x{height}).", 413)
+    return fmt, (width, height)